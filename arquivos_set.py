@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Leitura de arquivos .set do MT5 (inputs do EA).
+
+Uma linha `nome=valor` por input; inputs de otimização usam
+`valor||início||passo||fim||Y` (Y/N = otimizar ou não). O MT5 grava em UTF-16
+(com BOM); arquivos editados à mão costumam estar em UTF-8. Linhas iniciadas
+por ';' são comentários.
+
+`tester_inputs` devolve os inputs no formato da seção [TesterInputs] do INI do
+tester, que tem a mesma sintaxe do .set: com ela no INI o terminal já abre com
+os parâmetros do EA, sem carregar o .set pela interface.
+"""
+from __future__ import annotations
+
+import codecs
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+
+@dataclass
+class InputSet:
+    nome: str
+    valor: str
+    inicio: Optional[str] = None
+    passo: Optional[str] = None
+    fim: Optional[str] = None
+    otimizar: bool = False
+
+    @property
+    def tem_faixa(self) -> bool:
+        return self.inicio is not None
+
+    def texto(self) -> str:
+        """Valor no formato do .set / [TesterInputs]."""
+        if not self.tem_faixa:
+            return self.valor
+        return '||'.join((self.valor, self.inicio, self.passo or '', self.fim or '', 'Y' if self.otimizar else 'N'))
+
+
+def decodificar(dados: bytes) -> str:
+    """Texto do .set: UTF-16 pelo BOM (ou por bytes nulos, sem BOM), senão UTF-8."""
+    if dados.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return dados.decode('utf-16')
+    if b'\x00' in dados[:64]:
+        return dados.decode('utf-16-le', errors='replace')
+    return dados.decode('utf-8-sig', errors='replace')
+
+
+def ler_set(caminho: Path) -> List[InputSet]:
+    """Inputs do .set na ordem do arquivo (grafia original dos nomes)."""
+    inputs = []
+    for linha in decodificar(Path(caminho).read_bytes()).splitlines():
+        linha = linha.strip()
+        if not linha or linha.startswith(';'):
+            continue
+        nome, igual, valor = linha.partition('=')
+        if not igual:
+            continue
+        partes = valor.split('||')
+        entrada = InputSet(nome.strip(), partes[0].strip())
+        if len(partes) > 1:
+            partes += [''] * (5 - len(partes))
+            entrada.inicio, entrada.passo, entrada.fim = (p.strip() for p in partes[1:4])
+            entrada.otimizar = partes[4].strip().upper() == 'Y'
+        inputs.append(entrada)
+    return inputs
+
+
+def tester_inputs(caminho: Path) -> Dict[str, str]:
+    """Inputs do .set prontos para a seção [TesterInputs] (nome -> valor||início||passo||fim||Y/N)."""
+    return {entrada.nome: entrada.texto() for entrada in ler_set(caminho)}
@@ -4,19 +4,39 @@ MT5 Automação - Sistema Otimizado
 Automação completa para backtests MetaTrader 5
 """
 
+import atexit
 import os
 import time
 import configparser
 import subprocess
-import pyautogui
 import psutil
 from pathlib import Path
 import json
-import pyperclip  # Para colar texto com caracteres especiais
+try:
+    import pyautogui
+    import pyperclip  # Para colar texto com caracteres especiais
+except (ImportError, KeyError):  # KeyError: Linux sem DISPLAY - só drivers sem GUI
+    pyautogui = None
+    pyperclip = None
 import logging
-from datetime import datetime
 # threading/queue removidos após migração para BacktestMonitor
 from backtest_core import BacktestMonitor
+from perfil_delays import PerfilDelays
+from janelas_mt5 import RegistroJanelasMT5, chave_perfil_tela
+from sentinela_dialogos import SentinelaDialogos
+from fila_jobs import FilaJobs
+from cache_resultados import CacheResultados, localizar_ea
+from ordenacao_jobs import MedidorInicializacao, ordenar_por_localidade
+from drivers_mt5 import MT5Driver, criar_driver
+import perfilamento
+import rastreamento
+from log_estruturado import LogAssincrono
+from status_console import console
+from historico_execucoes import HistoricoExecucoes, RegistroJob, metricas_curva
+try:
+    from deteccao_ui import DetectorEstadoUI
+except ImportError:  # numpy ausente: automação segue apenas com esperas adaptativas
+    DetectorEstadoUI = None
 
 # Base do projeto (pasta deste arquivo)
 BASE_DIR = Path(__file__).resolve().parent
@@ -26,7 +46,12 @@ BASE_DIR = Path(__file__).resolve().parent
 # ═══════════════════════════════════════════════════════════════════════════════
 
 class LoggerMT5:
-    """Sistema de log estruturado para automação MT5"""
+    """Sistema de log estruturado para automação MT5
+
+    Registros JSON enfileirados e gravados por uma thread (log_estruturado), um
+    arquivo por processo com rotação gzip; config [Log]: max_mb, backups, pasta.
+    O arquivo só é aberto no primeiro registro: importar o módulo não cria logs.
+    """
     
     _instance = None
     
@@ -40,61 +65,65 @@ class LoggerMT5:
         if self._initialized:
             return
         
-        # Criar pasta de logs
-        self.logs_folder = BASE_DIR / 'logs'
-        self.logs_folder.mkdir(exist_ok=True)
-        
-        # Nome do arquivo de log com timestamp
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        log_filename = f'automacao_{timestamp}.log'
-        self.log_path = self.logs_folder / log_filename
-        
-        # Configurar logger
-        self.logger = logging.getLogger('MT5Automacao')
-        self.logger.setLevel(logging.DEBUG)
-        
-        # Handler para arquivo
-        file_handler = logging.FileHandler(self.log_path, encoding='utf-8')
-        file_handler.setLevel(logging.DEBUG)
-        
-        # Handler para console (apenas INFO+)
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.INFO)
-        
-        # Formato do log
-        formatter = logging.Formatter(
-            '%(asctime)s | %(levelname)-8s | %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
-        )
-        file_handler.setFormatter(formatter)
-        console_handler.setFormatter(formatter)
-        
-        # Adicionar handlers
-        if not self.logger.handlers:
-            self.logger.addHandler(file_handler)
-            # console_handler não adicionado para não duplicar prints
+        config = configparser.ConfigParser()
+        config.read(BASE_DIR / 'config.ini', encoding='utf-8')
+        secao = config['Log'] if config.has_section('Log') else {}
         
+        self.logs_folder = Path(secao.get('pasta') or BASE_DIR / 'logs')
+        self._max_mb = float(secao.get('max_mb', 10))
+        self._backups = int(secao.get('backups', 5))
+        self._log = None
         self._initialized = True
-        self.logger.info(f"═══ SESSÃO INICIADA ═══")
-        self.logger.info(f"Log: {self.log_path}")
     
-    def info(self, msg):
-        self.logger.info(msg)
+    def configurar(self, pasta):
+        """Troca a pasta dos logs (benchmark/testes: pasta temporária); fecha o arquivo atual"""
+        self.parar()
+        self.logs_folder = Path(pasta)
     
-    def debug(self, msg):
-        self.logger.debug(msg)
+    def parar(self):
+        if self._log is not None:
+            self._log.parar()
+            self._log = None
     
-    def warning(self, msg):
-        self.logger.warning(msg)
+    def iniciar(self):
+        """Abre o arquivo da sessão (na criação da automação ou no primeiro registro)"""
+        if self._log is None:
+            self._log = LogAssincrono('MT5Automacao', self.logs_folder,
+                                      max_mb=self._max_mb, backups=self._backups)
+            atexit.register(self._log.parar)
+            self._log.logger.info(f"═══ SESSÃO INICIADA ═══")
+            self._log.logger.info(f"Log: {self._log.caminho}")
+        return self._log
     
-    def error(self, msg):
-        self.logger.error(msg)
+    @property
+    def logger(self):
+        return self.iniciar().logger
+    
+    @property
+    def log_path(self):
+        return self.iniciar().caminho
+    
+    def _registrar(self, nivel, msg, campos):
+        self.logger.log(nivel, msg, extra={'campos': campos} if campos else None)
+    
+    def info(self, msg, **campos):
+        self._registrar(logging.INFO, msg, campos)
+    
+    def debug(self, msg, **campos):
+        self._registrar(logging.DEBUG, msg, campos)
+    
+    def warning(self, msg, **campos):
+        self._registrar(logging.WARNING, msg, campos)
+    
+    def error(self, msg, **campos):
+        self._registrar(logging.ERROR, msg, campos)
     
     def success(self, set_name, duracao):
-        self.logger.info(f"✅ SUCESSO | {set_name} | {duracao:.1f}s")
+        self.info(f"✅ SUCESSO | {set_name} | {duracao:.1f}s", set=set_name, duracao=round(duracao, 3),
+                  resultado='sucesso')
     
     def failure(self, set_name, erro):
-        self.logger.error(f"❌ FALHA | {set_name} | {erro}")
+        self.error(f"❌ FALHA | {set_name} | {erro}", set=set_name, erro=str(erro), resultado='falha')
     
     def resumo(self, total, sucessos, falhas, duracao_total):
         self.logger.info(f"═══ RESUMO FINAL ═══")
@@ -106,16 +135,69 @@ class LoggerMT5:
 # Instância global do logger
 logger = LoggerMT5()
 
+# ═══════════════════════════════════════════════════════════════════════════════
+# 🔁 FALHAS POR FASE
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Orçamento por fase: tentativas e backoff base (exponencial: base * 2^(n-1))
+# Sobrescrevível em config.ini, seção [Retry]: exportar_tentativas = 3, exportar_backoff = 0.5
+ORCAMENTO_FASES = {
+    'carregar': {'tentativas': 2, 'backoff': 1.0},
+    'iniciar': {'tentativas': 2, 'backoff': 1.0},
+    'aguardar': {'tentativas': 1, 'backoff': 0.0},
+    'exportar': {'tentativas': 3, 'backoff': 0.5},
+}
+
+# Causas em que repetir a fase não resolve
+CAUSAS_NAO_RECUPERAVEIS = {'janela_ausente', 'coordenada', 'interrompido'}
+
+
+class FalhaFase(Exception):
+    """Falha classificada por fase (carregar/iniciar/aguardar/exportar) e causa"""
+    
+    def __init__(self, fase, causa, mensagem=''):
+        super().__init__(mensagem or causa)
+        self.fase = fase
+        self.causa = causa
+    
+    @property
+    def recuperavel(self):
+        return self.causa not in CAUSAS_NAO_RECUPERAVEIS
+
+
+def classificar_causa(erro):
+    """Causa provável de uma exceção genérica levantada durante uma fase"""
+    if isinstance(erro, KeyError):
+        return 'coordenada'
+    if pyautogui is not None and isinstance(erro, pyautogui.FailSafeException):
+        return 'interrompido'
+    msg = str(erro).lower()
+    if 'não está aberto' in msg or 'não encontrada' in msg:
+        return 'janela_ausente'
+    if 'focar' in msg or 'foco' in msg:
+        return 'foco'
+    return 'erro'
+
+
+# Passos da GUI penalizados quando o CSV não aparece após a exportação
+PASSOS_EXPORT = (
+    'export_aba_grafico', 'export_menu', 'export_dialogo', 'export_navegar',
+    'export_nome', 'export_salvar', 'export_confirmar'
+)
+
 class MT5Automacao:
     """Automação MT5 - Versão Final Otimizada"""
 
-    def __init__(self, curvas_folder=None):
+    def __init__(self, curvas_folder=None, terminal_pid=None, driver=None, cache=None, historico=None,
+                 delays=None):
         self.config = configparser.ConfigParser()
         self.config_path = BASE_DIR / 'config.ini'
         self.config.read(self.config_path, encoding='utf-8')
 
         if 'MT5' not in self.config:
             raise KeyError("Seção 'MT5' não encontrada em config.ini. Edite " + str(self.config_path))
+        # Sessão de log aberta já aqui: registros de outros módulos no logger 'MT5Automacao' têm destino
+        logger.iniciar()
 
         self.sets_folder = Path(self.config['MT5'].get('sets_folder', str(BASE_DIR / 'sets')))
         self.mt5_path = self.config['MT5'].get('mt5_path', r"C:\\Program Files\\MetaTrader 5")
@@ -127,19 +209,174 @@ class MT5Automacao:
             self.curves_folder = self.sets_folder / 'curvas'
         
         self.curves_folder.mkdir(exist_ok=True)
+        
+        # Backend do MT5: instância de MT5Driver ou nome ('gui', 'ini', 'fake'; padrão em [MT5] driver)
+        if not isinstance(driver, MT5Driver):
+            driver = criar_driver(driver or self.config['MT5'].get('driver', 'gui'), self)
+        if driver.usa_gui and pyautogui is None:
+            raise ImportError("pyautogui/pyperclip indisponíveis: use o driver 'ini' ou 'fake'")
+        self.driver = driver
+        # Fila persistente de jobs (checkpoint para retomar após queda/reinício)
+        self.fila_path = self.curves_folder / 'fila_jobs.sqlite'
+        # Job em execução: o lease é renovado a cada fase e durante o backtest
+        self._fila = None
+        self._job = None
+        self._ultima_renovacao = 0.0
 
-        self.coords = self._carregar_coordenadas()
+        # Registro PID -> janela (None = primeiro terminal encontrado)
+        self.terminal_pid = terminal_pid
+        self._janelas = RegistroJanelasMT5()
+        # Sentinela de diálogos modais inesperados (histórico, conexão, arquivo existe...)
+        self._sentinela = SentinelaDialogos(lambda: self._janelas.hwnd(self.terminal_pid))
+        self._ultima_sentinela = 0.0
+        # Estado da UI em que acreditamos estar (None = desconhecido)
+        self._estado_ui = {}
+        self.invalidar_estado_ui()
+        self.navegacoes_evitadas = 0
+        
+        # Retry por fase: orçamento (config [Retry]) e estatísticas "fase/causa" -> ocorrências
+        self.orcamento_fases = {fase: dict(v) for fase, v in ORCAMENTO_FASES.items()}
+        if 'Retry' in self.config:
+            for fase, orc in self.orcamento_fases.items():
+                orc['tentativas'] = self.config['Retry'].getint(f'{fase}_tentativas', fallback=orc['tentativas'])
+                orc['backoff'] = self.config['Retry'].getfloat(f'{fase}_backoff', fallback=orc['backoff'])
+        self.estatisticas_retry = {}
+        self._causa_export = None
+
+        # Cache de resultados por conteúdo (.set + [Tester] + .ex5 + datas) - config [Cache]
+        # (cache, historico e delays injetáveis: benchmark e testes usam pastas temporárias)
+        self._cache = cache if cache is not None else CacheResultados.do_config(self.config)
+        self._ea_path = None
+
+        # Histórico de jobs (tempos por fase, resultado, métricas) - config [Historico]
+        self._historico = historico if historico is not None else HistoricoExecucoes.do_config(self.config)
+        self._execucao_id = None
+        self._tempos_job = {}
+        self._retries_job = 0
+
+        # Spans por fase em logs/spans_*.jsonl (config [Rastreamento]); um rastreador por processo
+        if rastreamento.ativo() is None:
+            rastreamento.ativar(rastreamento.Rastreador.do_config(self.config))
 
-        pyautogui.FAILSAFE = True
-        pyautogui.PAUSE = 0.3
+        # Ordem dos jobs agrupada por (símbolo, período, modelo, datas) e medição da inicialização
+        self.ordenar_localidade = self.config['MT5'].getboolean('ordenar_localidade', fallback=True)
+        self._localidades = {}
+        self._medidor_inicio = MedidorInicializacao()
+
+        # Coordenadas relativas à área cliente da janela (chaves em _coords_absolutas: legado)
+        self._coords_absolutas = set()
+        self.perfil_coords = None
+        self.coords = self._carregar_coordenadas() if self.driver.usa_gui else {}
+
+        if pyautogui is not None:
+            pyautogui.FAILSAFE = True
+            pyautogui.PAUSE = 0.3
 
         print(f"📁 Sets: {self.sets_folder}")
         print(f"📊 CSVs: {self.curves_folder}")
         # Instanciar monitor reutilizável
         self._monitor = BacktestMonitor(port=3000, poll_interval=0.5, verbose=True)
+        # Perfil adaptativo de esperas (aprendido e persistido por host)
+        self._delays = delays if delays is not None else PerfilDelays()
+        self.csv_timeout = self.config['MT5'].getfloat('csv_timeout', fallback=5.0)
+        # Detecção de estados da UI por template (templates_ui/<resolução>/*.png)
+        self._detector = None
+        if DetectorEstadoUI is not None and self.driver.usa_gui:
+            self._detector = DetectorEstadoUI(origem=lambda: self._janelas.origem_cliente(self.terminal_pid))
+            if self._detector.conhece('tester_concluido'):
+                self._monitor.verificador_fim = lambda: self._detector.detectar('tester_concluido') is not None
+
+    def _aguardar(self, passo, padrao):
+        """Espera adaptativa para passos sem pós-condição observável"""
+        self._delays.aguardar(passo, padrao)
+    
+    def invalidar_estado_ui(self, *chaves):
+        """Esquece o estado da UI (todas as chaves se nenhuma for informada)"""
+        for chave in chaves or ('aba', 'set_carregado', 'tester_aberto'):
+            self._estado_ui[chave] = None
+    
+    def _estado_confirmado(self, chave, valor, template=None):
+        """Confere de forma barata se a UI está no estado em cache
+        
+        Com template conhecido, uma única detecção (sem espera) confirma; sem template,
+        confiamos no cache, que é invalidado em perda de foco, diálogos e erros.
+        """
+        if self._estado_ui.get(chave) != valor:
+            return False
+        if template and self._detector is not None and self._detector.conhece(template):
+            if self._detector.detectar(template) is None:
+                self._estado_ui[chave] = None
+                return False
+        return True
+    
+    def _ir_para_aba(self, aba):
+        """Navega para a aba do Strategy Tester ('parametros' ou 'grafico') se necessário"""
+        coord, template, passo, padrao = {
+            'parametros': ('parameters_tab', 'aba_parametros', 'parametros_aba', 1.0),
+            'grafico': ('graph_tab', 'aba_grafico', 'export_aba_grafico', 1.5),
+        }[aba]
+        if self._estado_confirmado('aba', aba, template):
+            self.navegacoes_evitadas += 1
+            logger.debug(f"Navegação evitada: já na aba {aba}")
+            return True
+        pyautogui.click(self.ponto(coord))
+        ok = self._aguardar_estado(template, passo, padrao)
+        self._estado_ui['aba'] = aba if ok else None
+        return ok
+    
+    def _garantir_tester_aberto(self):
+        """Abre o Strategy Tester (Ctrl+R) apenas se o template indicar que está fechado"""
+        if self._estado_confirmado('tester_aberto', True, 'tester_aberto'):
+            return
+        if self._detector is not None and self._detector.conhece('tester_aberto'):
+            if self._detector.detectar('tester_aberto') is None:
+                print("🧪 Abrindo Strategy Tester...")
+                pyautogui.hotkey('ctrl', 'r')
+                self._detector.aguardar('tester_aberto', timeout=3.0)
+                self.invalidar_estado_ui('aba')
+        # Sem template: o usuário confirmou que o Tester está aberto antes de iniciar
+        self._estado_ui['tester_aberto'] = True
+    
+    def _checar_dialogos(self, contexto, ignorar=('salvar_como',), esperar=True, fechar_desconhecidos=True):
+        """Trata diálogos modais do terminal entre passos da GUI. Retorna nº de diálogos tratados
+        
+        esperar=False no loop de poll (download de histórico é conferido no próximo tick);
+        fechar_desconhecidos=False quando o próprio passo abriu um diálogo (Salvar como).
+        """
+        try:
+            tratados = self._sentinela.verificar(ignorar=ignorar, esperar=esperar,
+                                                 fechar_desconhecidos=fechar_desconhecidos)
+        except Exception as e:
+            logger.debug(f"Sentinela de diálogos falhou ({contexto}): {e}")
+            return 0
+        if tratados:
+            # Um modal pode ter roubado foco ou cliques: não confiar no estado em cache
+            self.invalidar_estado_ui('aba')
+        for classe, acao, ok in tratados:
+            status = "✅" if ok else "⚠️"
+            console.escrever(f"{status} Diálogo '{classe}' tratado ({acao}) em {contexto}")
+            logger.warning(f"Diálogo {classe} | ação={acao} | ok={ok} | contexto={contexto}")
+        return len(tratados)
+    
+    def _aguardar_estado(self, estado, passo, padrao, timeout=5.0):
+        """Aguarda estado da UI via template; sem template, cai para a espera adaptativa"""
+        if self._detector is not None and self._detector.conhece(estado):
+            if self._detector.aguardar(estado, timeout=timeout):
+                return True
+            logger.warning(f"Estado '{estado}' não detectado em {timeout:.1f}s")
+            return False
+        self._aguardar(passo, padrao)
+        return True
     
     def _carregar_coordenadas(self):
-        """Carrega coordenadas do arquivo JSON"""
+        """Carrega coordenadas do arquivo JSON
+        
+        Formato atual: {"_referencia": "cliente", "nome": [dx, dy], ...} com posições
+        relativas à área cliente da janela do terminal. Arquivos antigos (absolutos)
+        são convertidos usando a posição atual da janela; sem janela (ou com ela
+        minimizada, origem em -32000) ficam absolutos até a próxima carga.
+        `_coords_absolutas` é refeito a cada carga (a calibração recarrega).
+        """
         default_coords = {
             'parameters_tab': (240, 681),
             'parameters_area': (600, 400),
@@ -150,19 +387,89 @@ class MT5Automacao:
             'export_csv': (600, 500)
         }
         
+        relativas = {}
+        self.perfil_coords = None
         try:
             coord_path = BASE_DIR / "coordenadas.json"
             if coord_path.exists():
                 with open(coord_path, 'r', encoding='utf-8') as f:
                     coords = json.load(f)
+                # Perfil da calibração automática para a resolução/DPI atual
+                perfis = coords.get('perfis') or {}
+                if perfis:
+                    try:
+                        chave = chave_perfil_tela()
+                    except Exception:
+                        chave = None
+                    if chave in perfis:
+                        self.perfil_coords = chave
+                        coords = {**perfis[chave], '_referencia': 'cliente'}
+                        print(f"🖥️ Perfil de coordenadas: {chave}")
+                destino = relativas if coords.get('_referencia') == 'cliente' else default_coords
                 for key, value in coords.items():
+                    if key.startswith('_') or key == 'perfis':
+                        continue
                     if hasattr(value, '__len__') and len(value) >= 2:
-                        default_coords[key] = (value[0], value[1])
+                        destino[key] = (value[0], value[1])
                 print(f"✅ Coordenadas carregadas")
         except:
             print("📍 Usando coordenadas padrão")
         
-        return default_coords
+        # Converter absolutas (padrão/legado) para relativas com a geometria atual
+        absolutas = {k: v for k, v in default_coords.items() if k not in relativas}
+        origem = None
+        try:
+            if not self._janelas.minimizada(self.terminal_pid):
+                origem = self._janelas.origem_cliente(self.terminal_pid)
+        except Exception:
+            pass
+        if origem:
+            ox, oy = origem
+            for key, (x, y) in absolutas.items():
+                relativas[key] = (x - ox, y - oy)
+            self._coords_absolutas = set()
+        else:
+            relativas.update(absolutas)
+            self._coords_absolutas = set(absolutas)
+        
+        return relativas
+    
+    def calibracao_pendente(self):
+        """Há templates de calibração mas nenhum perfil de coordenadas para a tela atual"""
+        return self.perfil_coords is None and (BASE_DIR / 'templates_ui' / 'alvos').is_dir()
+    
+    def garantir_perfil_coordenadas(self):
+        """Roda a calibração automática se existem templates mas não há perfil para a tela atual
+        
+        A calibração clica nas abas e abre menus do terminal: chamar só depois da confirmação.
+        """
+        if self.perfil_coords is not None:
+            return True
+        if not self.calibracao_pendente():
+            return False
+        try:
+            from calibrar import CalibradorAutomatico
+            print("🤖 Nenhum perfil de coordenadas para esta tela - calibrando automaticamente...")
+            chave, coords = CalibradorAutomatico().calibrar()
+        except Exception as e:
+            print(f"⚠️ Calibração automática falhou: {e}")
+            logger.warning(f"Calibração automática falhou: {e}")
+            return False
+        if not coords:
+            return False
+        self.coords = self._carregar_coordenadas()
+        logger.info(f"Perfil de coordenadas criado: {chave}")
+        return True
+    
+    def ponto(self, nome):
+        """Traduz a coordenada `nome` para posição de tela usando a geometria atual da janela"""
+        x, y = self.coords[nome]
+        if nome in self._coords_absolutas:
+            return (x, y)
+        origem = self._janelas.origem_cliente(self.terminal_pid)
+        if origem is None:
+            raise Exception("❌ Janela do MT5 não encontrada para traduzir coordenadas")
+        return (origem[0] + x, origem[1] + y)
     
     def obter_arquivos_set(self):
         """Lista arquivos .set"""
@@ -186,19 +493,37 @@ class MT5Automacao:
         subprocess.Popen([terminal_path])
         time.sleep(8)
 
-    def encerrar_mt5(self, silent: bool = False):
-        """Encerra todos os processos terminal64.exe para garantir reinício limpo.
+    @rastreamento.rastreado('encerrar')
+    def encerrar_mt5(self, silent: bool = False, pid=None):
+        """Encerra os processos terminal64.exe para garantir reinício limpo.
 
         silent: não imprimir mensagens se True.
+        pid: encerra apenas esse terminal (e seus filhos), preservando os demais.
         """
         killed = 0
-        for proc in psutil.process_iter(['pid', 'name']):
+        self.invalidar_estado_ui()
+        if pid is not None:
             try:
-                if proc.info['name'] and 'terminal64.exe' in proc.info['name'].lower():
-                    proc.kill()
-                    killed += 1
-            except Exception:
-                continue
+                proc = psutil.Process(pid)
+                for filho in proc.children(recursive=True):
+                    try:
+                        filho.kill()
+                    except psutil.Error:
+                        pass
+                proc.kill()
+                killed = 1
+            except psutil.Error:
+                pass
+            self._janelas.invalidar(pid)
+        else:
+            for proc in psutil.process_iter(['pid', 'name']):
+                try:
+                    if proc.info['name'] and 'terminal64.exe' in proc.info['name'].lower():
+                        proc.kill()
+                        killed += 1
+                except Exception:
+                    continue
+            self._janelas.invalidar()
         if not silent:
             if killed:
                 print(f"🛑 MT5 finalizado(s): {killed} processo(s)")
@@ -206,30 +531,13 @@ class MT5Automacao:
                 print("ℹ️ Nenhum processo MT5 ativo para encerrar")
     
     def _encontrar_janela_mt5(self):
-        """Encontra a janela do MT5 independente do título da corretora"""
-        # Padrões específicos do MT5 (título contém corretora + netting/hedging ou XPMT5)
-        # Exemplos: "12656329 - XPMT5-PRD - Netting - XP Investimentos"
-        #           "123456 - MetaTrader 5 - Hedging - Clear"
-        
-        todas_janelas = pyautogui.getAllWindows()
-        for janela in todas_janelas:
-            titulo = janela.title
-            titulo_lower = titulo.lower()
-            
-            # Padrão 1: Contém "Netting" ou "Hedging" (modo de conta MT5)
-            if 'netting' in titulo_lower or 'hedging' in titulo_lower:
-                return janela
-            
-            # Padrão 2: Contém "XPMT5" ou similar
-            if 'xpmt5' in titulo_lower or 'mt5-' in titulo_lower:
-                return janela
-            
-            # Padrão 3: Título começa com número (conta) e tem MetaTrader
-            if titulo and titulo[0].isdigit() and 'metatrader' in titulo_lower:
-                return janela
+        """Encontra a janela do MT5 independente do título da corretora
         
-        return None
+        Usa o registro PID -> janela (varredura só quando a janela some ou muda de título).
+        """
+        return self._janelas.janela(self.terminal_pid)
     
+    @rastreamento.rastreado('foco')
     def focar_mt5(self, forcar=True):
         """Foca janela MT5 com verificação robusta
         
@@ -246,6 +554,13 @@ class MT5Automacao:
                 raise Exception("❌ MetaTrader 5 não está aberto! Abra o MT5 primeiro.")
             return False
         
+        # Caminho rápido: já em primeiro plano (verificação O(1) pelo registro de janelas)
+        if not janela.isMinimized and self.verificar_mt5_em_foco():
+            return True
+        
+        # Foco foi perdido: outra janela pode ter mexido na UI
+        self.invalidar_estado_ui('aba')
+        
         # Verificar se está minimizada
         if janela.isMinimized:
             print("📌 MT5 estava minimizado, restaurando...")
@@ -284,9 +599,7 @@ class MT5Automacao:
     def verificar_mt5_em_foco(self):
         """Verifica se o MT5 está em primeiro plano"""
         try:
-            janela = self._encontrar_janela_mt5()
-            if janela and janela.isActive:
-                return True
+            return self._janelas.em_foco(self.terminal_pid)
         except:
             pass
         return False
@@ -294,62 +607,131 @@ class MT5Automacao:
     def carregar_set_file(self, set_path):
         """Carrega arquivo .set usando pyperclip para suportar caracteres especiais"""
         # Garantir foco no MT5 antes de interagir
+        self._checar_dialogos('carregar_set')
         self.focar_mt5(forcar=True)
         
+        # Mesmo .set (e mesma versão do arquivo) já carregado: nada a fazer
+        chave_set = (str(set_path), Path(set_path).stat().st_mtime)
+        if self._estado_ui.get('set_carregado') == chave_set:
+            self.navegacoes_evitadas += 1
+            print(f"♻️ {Path(set_path).stem} já carregado - pulando")
+            return True
+        
         print(f"📂 Carregando {Path(set_path).stem}...")
+        self._garantir_tester_aberto()
         
         # Ir para aba Parâmetros
-        pyautogui.click(self.coords['parameters_tab'])
-        time.sleep(1)
+        self._ir_para_aba('parametros')
         
         # Verificar foco novamente
         if not self.verificar_mt5_em_foco():
+            self._delays.registrar_falha(['parametros_aba'])
             self.focar_mt5(forcar=True)
         
         # Clique direito na área
-        pyautogui.rightClick(self.coords['parameters_area'])
-        time.sleep(1)
+        pyautogui.rightClick(self.ponto('parameters_area'))
+        self._aguardar('parametros_menu', 1.0)
         
         # Abrir diálogo de arquivo: prioriza item 'Abrir'; fallback em 'load_button' ou atalho
         try:
             if 'menu_abrir' in self.coords:
-                pyautogui.click(self.coords['menu_abrir'])
+                pyautogui.click(self.ponto('menu_abrir'))
             elif 'load_button' in self.coords:
-                pyautogui.click(self.coords['load_button'])
+                pyautogui.click(self.ponto('load_button'))
             else:
                 # Fallback heurístico: item logo abaixo do clique direito
-                x, y = self.coords['parameters_area']
+                x, y = self.ponto('parameters_area')
                 pyautogui.click(x, y + 25)
         except Exception:
             # Último recurso: tentar atalho comum
             pyautogui.hotkey('ctrl', 'o')
         
-        time.sleep(1)
+        self._aguardar('parametros_dialogo', 1.0)
         
         # Usar pyperclip para colar caminho (suporta espaços e acentos)
         set_path_str = str(set_path)
         pyperclip.copy(set_path_str)
         pyautogui.hotkey('ctrl', 'v')
-        time.sleep(0.5)
+        self._aguardar('parametros_colar', 0.5)
         pyautogui.press('enter')
-        time.sleep(2)
+        self._aguardar('parametros_carregar', 2.0)
         
+        self._estado_ui['set_carregado'] = chave_set
         return True
     
     def iniciar_backtest(self):
         """Inicia backtest"""
         # Garantir foco no MT5
+        self._checar_dialogos('iniciar')
         self.focar_mt5(forcar=True)
         
         print("⚡ Iniciando backtest...")
-        pyautogui.click(self.coords['start_button'])
-        time.sleep(2)
+        pyautogui.click(self.ponto('start_button'))
+        self._aguardar('iniciar', 2.0)
     
     # Métodos de monitoramento legado removidos (substituídos por BacktestMonitor em backtest_core.py)
     
+    def _preencher_dialogo_salvar(self, pasta, nome_arquivo):
+        """Preenche o diálogo 'Salvar Como' já aberto: navega até `pasta`, digita o nome e salva"""
+        # ═══════════════════════════════════════════════════════════════
+        # PASSO 1: Navegar para a pasta de destino
+        # ═══════════════════════════════════════════════════════════════
+        
+        # Usar Ctrl+L para focar na barra de endereço
+        pyautogui.hotkey('ctrl', 'l')
+        time.sleep(0.8)
+        
+        # Limpar e colar caminho usando pyperclip (suporta espaços e acentos)
+        folder_path = str(pasta).replace('/', '\\')
+        print(f"📂 Navegando para: {folder_path}")
+        
+        pyperclip.copy(folder_path)
+        pyautogui.hotkey('ctrl', 'a')  # Selecionar tudo
+        time.sleep(0.2)
+        pyautogui.hotkey('ctrl', 'v')  # Colar caminho
+        time.sleep(0.5)
+        pyautogui.press('enter')  # Navegar
+        self._aguardar('export_navegar', 2.0)  # Aguardar navegação completar
+        
+        # ═══════════════════════════════════════════════════════════════
+        # PASSO 2: Focar no campo "Nome do arquivo" e digitar nome
+        # ═══════════════════════════════════════════════════════════════
+        
+        # Alt+N foca diretamente no campo "Nome do arquivo"
+        pyautogui.hotkey('alt', 'n')
+        time.sleep(0.5)
+        
+        # Selecionar todo o texto existente no campo
+        pyautogui.hotkey('ctrl', 'a')
+        time.sleep(0.2)
+        
+        # Colar nome do arquivo usando pyperclip
+        print(f"📝 Nome do arquivo: {nome_arquivo}")
+        pyperclip.copy(nome_arquivo)
+        pyautogui.hotkey('ctrl', 'v')
+        self._aguardar('export_nome', 0.5)
+        
+        # ═══════════════════════════════════════════════════════════════
+        # PASSO 3: Salvar (pressionar Enter ou clicar Salvar)
+        # ═══════════════════════════════════════════════════════════════
+        
+        pyautogui.press('enter')
+        self._aguardar('export_salvar', 2.0)
+        
+        # Verificar se apareceu diálogo de substituição (arquivo já existe)
+        if self._sentinela.disponivel:
+            # Sentinela confirma apenas se o diálogo realmente existir; o "Salvar como" ainda
+            # pode estar aberto (idioma fora da tabela): modais desconhecidos não são fechados
+            self._checar_dialogos('exportar_salvar', fechar_desconhecidos=False)
+        else:
+            # Sem Win32: confirmar com Enter novamente (comportamento legado)
+            pyautogui.press('enter')
+            self._aguardar('export_confirmar', 1.0)
+    
     def exportar_csv(self, set_name):
         """Exporta resultado para CSV usando pyperclip para suportar caracteres especiais"""
         # Garantir foco no MT5
+        self._checar_dialogos('exportar')
         self.focar_mt5(forcar=True)
         
         # Preparar nome do arquivo
@@ -361,90 +743,107 @@ class MT5Automacao:
         print(f"💾 Exportando {set_name}...")
         
         # Ir para aba Gráfico
-        pyautogui.click(self.coords['graph_tab'])
-        time.sleep(1.5)
+        self._ir_para_aba('grafico')
         
         # Clique direito e exportar
-        pyautogui.rightClick(self.coords['graph_area'])
-        time.sleep(1)
+        pyautogui.rightClick(self.ponto('graph_area'))
+        self._aguardar('export_menu', 1.0)
         
         if 'export_csv' in self.coords:
-            pyautogui.click(self.coords['export_csv'])
+            pyautogui.click(self.ponto('export_csv'))
         else:
             pyautogui.press('e')
         
         # Aguardar janela "Salvar Como" aparecer
-        time.sleep(1.5)
+        if not self._aguardar_estado('dialogo_salvar', 'export_dialogo', 1.5):
+            print("⚠️ Diálogo 'Salvar Como' não apareceu")
+            self._delays.registrar_falha(PASSOS_EXPORT)
+            self._causa_export = 'dialogo_salvar'
+            pyautogui.press('escape')
+            return False
         
         try:
-            # ═══════════════════════════════════════════════════════════════
-            # PASSO 1: Navegar para a pasta de destino
-            # ═══════════════════════════════════════════════════════════════
-            
-            # Usar Ctrl+L para focar na barra de endereço
-            pyautogui.hotkey('ctrl', 'l')
-            time.sleep(0.8)
-            
-            # Limpar e colar caminho usando pyperclip (suporta espaços e acentos)
-            folder_path = str(self.curves_folder).replace('/', '\\')
-            print(f"📂 Navegando para: {folder_path}")
-            
-            pyperclip.copy(folder_path)
-            pyautogui.hotkey('ctrl', 'a')  # Selecionar tudo
-            time.sleep(0.2)
-            pyautogui.hotkey('ctrl', 'v')  # Colar caminho
-            time.sleep(0.5)
-            pyautogui.press('enter')  # Navegar
-            time.sleep(2)  # Aguardar navegação completar
-            
-            # ═══════════════════════════════════════════════════════════════
-            # PASSO 2: Focar no campo "Nome do arquivo" e digitar nome
-            # ═══════════════════════════════════════════════════════════════
-            
-            # Alt+N foca diretamente no campo "Nome do arquivo"
-            pyautogui.hotkey('alt', 'n')
-            time.sleep(0.5)
-            
-            # Selecionar todo o texto existente no campo
-            pyautogui.hotkey('ctrl', 'a')
-            time.sleep(0.2)
-            
-            # Colar nome do arquivo usando pyperclip
-            print(f"📝 Nome do arquivo: {csv_filename}")
-            pyperclip.copy(csv_filename)
-            pyautogui.hotkey('ctrl', 'v')
-            time.sleep(0.5)
-            
-            # ═══════════════════════════════════════════════════════════════
-            # PASSO 3: Salvar (pressionar Enter ou clicar Salvar)
-            # ═══════════════════════════════════════════════════════════════
-            
-            pyautogui.press('enter')
-            time.sleep(2)
-            
-            # Verificar se apareceu diálogo de substituição (arquivo já existe)
-            # Se sim, confirmar com Enter novamente
-            pyautogui.press('enter')
-            time.sleep(1)
-            
+            self._preencher_dialogo_salvar(self.curves_folder, csv_filename)
         except Exception as e:
             print(f"⚠️ Erro na exportação: {e}")
+            self._causa_export = classificar_causa(e)
             # Tentar fechar qualquer diálogo aberto
             pyautogui.press('escape')
             time.sleep(0.5)
             return False
         
-        # Verificar se arquivo foi criado
+        # Verificar se arquivo foi criado (pós-condição observável: polling em vez de espera fixa)
         csv_path = self.curves_folder / csv_filename
-        time.sleep(1)  # Aguardar escrita em disco
+        limite = time.time() + self.csv_timeout
+        while not csv_path.exists() and time.time() < limite:
+            time.sleep(0.1)
         
         if csv_path.exists():
             size = csv_path.stat().st_size
             print(f"✅ CSV salvo: {csv_filename} ({size:,} bytes)")
             return True
         else:
-            print(f"⚠️ Arquivo pode ter sido salvo com outro nome ou local")
-            return True  # Não falhar a automação por isso
+            print(f"⚠️ CSV não encontrado em {self.curves_folder}")
+            # Perfil de delays: passos de exportação foram curtos demais
+            self._delays.registrar_falha(PASSOS_EXPORT)
+            self._causa_export = 'csv_ausente'
+            return False
+    
+    def aplicar_datas_tester(self, de_br, ate_br):
+        """Digita as datas (dd/mm/aaaa) nos campos da aba Configurações do tester (formato aaaa.mm.dd)"""
+        self.focar_mt5()
+        self.invalidar_estado_ui('aba')
+        pyautogui.click(self.ponto('settings_tab'))
+        self._aguardar('oos_aba_config', 0.5)
+        for campo, data_br in (('tester_data_inicio', de_br), ('tester_data_fim', ate_br)):
+            dia, mes, ano = data_br.split('/')
+            pyautogui.click(self.ponto(campo))
+            pyautogui.press('home')
+            for segmento in (ano, mes, dia):
+                pyautogui.typewrite(segmento)
+                pyautogui.press('right')
+            pyautogui.press('tab')
+            self._aguardar('oos_data', 0.3)
+        print(f"📅 Datas aplicadas no terminal: {de_br} -> {ate_br}")
+    
+    def salvar_relatorio(self, destino):
+        """Salva o relatório do último teste (aba Backtest, menu de contexto) em `destino`
+        
+        Usado quando o terminal é reaproveitado: o Report= do INI só vale para o teste
+        lançado por ele, então cada step grava o próprio relatório pela interface.
+        """
+        destino = Path(destino)
+        self._checar_dialogos('relatorio')
+        self.focar_mt5(forcar=True)
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        # Pós-condição observável: o arquivo tem de aparecer de novo
+        destino.unlink(missing_ok=True)
+        
+        self.invalidar_estado_ui('aba')
+        pyautogui.click(self.ponto('backtest_tab'))
+        self._aguardar('relatorio_aba', 1.0)
+        pyautogui.rightClick(self.ponto('backtest_area'))
+        self._aguardar('relatorio_menu', 1.0)
+        pyautogui.click(self.ponto('salvar_relatorio'))
+        if not self._aguardar_estado('dialogo_salvar', 'relatorio_dialogo', 1.5):
+            print("⚠️ Diálogo 'Salvar Como' do relatório não apareceu")
+            pyautogui.press('escape')
+            return False
+        try:
+            self._preencher_dialogo_salvar(destino.parent, destino.name)
+        except Exception as e:
+            print(f"⚠️ Erro ao salvar relatório: {e}")
+            pyautogui.press('escape')
+            return False
+        
+        limite = time.time() + self.csv_timeout
+        while not destino.exists() and time.time() < limite:
+            time.sleep(0.1)
+        if not destino.exists():
+            print(f"⚠️ Relatório não encontrado: {destino}")
+            return False
+        print(f"📄 Relatório salvo: {destino.name}")
+        return True
     
     def _calcular_timeout(self, set_path):
         """Calcula timeout dinâmico baseado no tamanho do arquivo .set"""
@@ -458,130 +857,398 @@ class MT5Automacao:
         except:
             return 240  # Fallback para 4 minutos
     
-    def processar_set(self, set_path, index, total, tentativa=1, max_tentativas=2):
-        """Processamento principal com retry automático e logging"""
+    def _registrar_retry(self, falha):
+        chave = f"{falha.fase}/{falha.causa}"
+        self.estatisticas_retry[chave] = self.estatisticas_retry.get(chave, 0) + 1
+        self._retries_job += 1
+    
+    def _executar_fase(self, fase, acao):
+        """Executa uma fase com orçamento próprio de tentativas e backoff exponencial
+        
+        Só a fase que falhou é repetida: um export perdido não refaz o backtest.
+        Levanta FalhaFase quando o orçamento se esgota ou a causa não é recuperável.
+        """
+        orcamento = self.orcamento_fases[fase]
+        tentativas = max(1, orcamento['tentativas'])
+        for tentativa in range(1, tentativas + 1):
+            self._renovar_lease()
+            inicio_tentativa = time.perf_counter()
+            try:
+                with rastreamento.span(fase, tentativa=tentativa), perfilamento.fase(fase):
+                    return acao()
+            except FalhaFase as e:
+                falha = e
+            except Exception as e:
+                falha = FalhaFase(fase, classificar_causa(e), str(e))
+            finally:
+                self._tempos_job[fase] = self._tempos_job.get(fase, 0.0) + time.perf_counter() - inicio_tentativa
+            
+            self._registrar_retry(falha)
+            logger.warning(f"Falha na fase {fase} | causa={falha.causa} | "
+                           f"tentativa {tentativa}/{tentativas} | {falha}")
+            if tentativa >= tentativas or not falha.recuperavel:
+                raise falha
+            
+            # Recuperação antes de repetir a fase
+            self._delays.registrar_falha()
+            tratou = self.driver.recuperar()
+            espera = 0.2 if tratou else orcamento['backoff'] * 2 ** (tentativa - 1)
+            console.escrever(f"🔄 Fase '{fase}' falhou ({falha.causa}) - "
+                             f"tentativa {tentativa + 1}/{tentativas} em {espera:.1f}s")
+            time.sleep(espera)
+            self.driver.focar()
+    
+    def _fase_driver(self, fase, acao):
+        """Executa a fase no driver; em falha levanta FalhaFase com a causa informada por ele"""
+        self.driver.causa = None
+        if not acao():
+            raise FalhaFase(fase, self.driver.causa or 'erro', f"Fase {fase} falhou (driver {self.driver.nome})")
+        return True
+    
+    def _fase_carregar(self, set_path):
+        return self._fase_driver('carregar', lambda: self.driver.carregar(set_path))
+    
+    def _fase_iniciar(self):
+        return self._fase_driver('iniciar', self.driver.iniciar)
+    
+    def _fase_aguardar(self, set_name, timeout):
+        inicio, t0 = time.time(), time.perf_counter()
+        terminou = self.driver.aguardar(set_name, timeout)
+        duracao = time.perf_counter() - t0
+        # Espera dividida no instante em que o tester começou de fato (startup_time do driver)
+        if self.driver.startup_time is not None:
+            partida = min(self.driver.startup_time, duracao)
+            rastreamento.registrar('aguardar_inicio', inicio, partida)
+            rastreamento.registrar('aguardar_fim', inicio + partida, duracao - partida)
+        if not terminou:
+            # Timeout não é fatal: o resultado parcial ainda é exportado
+            console.escrever("⚠️ Timeout aguardando backtest - prosseguindo com export")
+            logger.warning(f"Timeout em {set_name}")
+        return terminou
+    
+    def _fase_exportar(self, nome_csv):
+        self.driver.causa = None
+        if not self.driver.exportar(nome_csv, self.curves_folder):
+            raise FalhaFase('exportar', self.driver.causa or 'erro', f"Exportação de {nome_csv} falhou")
+        return True
+    
+    def caminho_saida(self, nome):
+        """Arquivo de resultado gerado pelo driver para `nome` (CSV na GUI, relatório no INI)"""
+        return self.curves_folder / f"{nome}{self.driver.extensao_saida}"
+    
+    def exportar_csv_com_retry(self, nome_csv):
+        """Exporta o CSV repetindo apenas a fase de exportação (usado também pelo fluxo OOS)"""
+        return self._executar_fase('exportar', lambda: self._fase_exportar(nome_csv))
+    
+    def chave_cache(self, set_path, tester=None, de='', ate=''):
+        """Chave do cache de resultados (None se o cache está desabilitado ou indisponível)
+        
+        Sem `tester`, usa a seção [Tester] do config.ini - só quando o driver a aplica de fato.
+        Na GUI o tester roda com o que estiver no terminal: a chave não saberia que símbolo,
+        período ou datas mudaram, então não há cache (o OOS passa o [Tester] do INI que lançou).
+        """
+        if self._cache is None:
+            return None
+        if tester is None:
+            if not self.driver.aplica_tester:
+                return None
+            tester = dict(self.config['Tester']) if 'Tester' in self.config else {}
+        ea_name = self.config['MT5'].get('ea_name', '') or tester.get('expert', '')
+        try:
+            if self._ea_path is None or not self._ea_path.exists():
+                self._ea_path = localizar_ea(self.mt5_path, ea_name)
+                if self._ea_path is None:
+                    logger.warning(f"EA '{ea_name}' não encontrado: cache usa só o nome (recompilações não invalidam)")
+            return self._cache.chave(Path(set_path), tester, self._ea_path, ea_name, de, ate)
+        except Exception as e:
+            logger.warning(f"Cache indisponível para {Path(set_path).name}: {e}")
+            return None
+    
+    def _registrar_historico(self, set_path, resultado, inicio, chave=None, causa=None, saida=None, set_nome=None):
+        """Grava o job no histórico de execuções (falhas do banco não interrompem o lote)
+        
+        set_nome distingue jobs do mesmo .set (steps OOS); padrão: nome do arquivo.
+        """
+        if self._historico is None:
+            return
+        localidade = self._localidades.get(Path(set_path)) or ('', '')
+        tempos = dict(self._tempos_job)
+        if self.driver.startup_time is not None and resultado == 'sucesso':
+            tempos['inicializacao'] = self.driver.startup_time
+        metricas = metricas_curva(saida) if saida is not None and saida.suffix == '.csv' else {}
+        registro = RegistroJob(
+            set_nome=set_nome or Path(set_path).stem, caminho=str(set_path), inicio=inicio, duracao=time.time() - inicio,
+            resultado=resultado, chave=chave, simbolo=localidade[0] or None, periodo=localidade[1] or None,
+            causa=causa, retries=self._retries_job, saida=str(saida) if saida else None, tempos=tempos,
+            **metricas)
+        try:
+            self._historico.registrar_job(registro, self._execucao_id)
+        except Exception as e:
+            logger.warning(f"Histórico: falha ao registrar {registro.set_nome}: {e}")
+    
+    def processar_set(self, set_path, index, total):
+        """Processamento principal com retry por fase e logging"""
         set_name = Path(set_path).stem
-        tentativa_str = f" (tentativa {tentativa}/{max_tentativas})" if tentativa > 1 else ""
-        print(f"\n🎯 [{index}/{total}] {set_name}{tentativa_str}")
-        logger.info(f"Processando: {set_name}{tentativa_str}")
+        print(f"\n🎯 [{index}/{total}] {set_name}")
+        logger.info(f"Processando: {set_name}")
         
         inicio_set = time.time()
+        self._tempos_job = {}
+        self._retries_job = 0
+        self.driver.startup_time = None
+        
+        # Entradas idênticas já testadas: restaurar o CSV em vez de rodar o backtest
+        chave = self.chave_cache(set_path)
+        csv_path = self.caminho_saida(set_name)
+        if chave and self._cache.restaurar(chave, csv_path):
+            console.escrever(f"♻️ {set_name}: resultado restaurado do cache")
+            logger.info(f"Cache: {set_name} restaurado ({chave[:12]})")
+            self._registrar_historico(set_path, 'cache', inicio_set, chave, saida=csv_path)
+            return True
         
         try:
-            # Verificar foco antes de cada set
-            if not self.verificar_mt5_em_foco():
-                print("📌 Refocando MT5...")
-                self.focar_mt5(forcar=True)
-                time.sleep(0.5)
-            
-            self.carregar_set_file(set_path)
+            self._executar_fase('carregar', lambda: self._fase_carregar(set_path))
             
             # Iniciar backtest
-            self.iniciar_backtest()
+            self._executar_fase('iniciar', self._fase_iniciar)
             
             # Calcular timeout dinâmico
             timeout = self._calcular_timeout(set_path)
             print(f"⏱️ Timeout configurado: {timeout}s")
             logger.debug(f"Timeout para {set_name}: {timeout}s")
             
-            # Monitorar via BacktestMonitor (reinicia estado cada set)
-            self._monitor.start()
-            terminou = self._monitor.wait(timeout=timeout)
-            if not terminou:
-                print("⚠️ Timeout aguardando backtest - prosseguindo com export")
-                logger.warning(f"Timeout em {set_name}")
+            self._executar_fase('aguardar', lambda: self._fase_aguardar(set_name, timeout))
+            self._medidor_inicio.registrar(set_path, self._localidades.get(Path(set_path)),
+                                           self.driver.startup_time)
             
-            self.exportar_csv(set_name)
+            self.exportar_csv_com_retry(set_name)
+            if chave:
+                self._cache.armazenar(chave, csv_path, descricao=set_name)
+            
+            # Passos restantes do ciclo foram suficientes: confirmar/sondar valores menores
+            self._delays.registrar_sucesso()
             
             duracao_set = time.time() - inicio_set
             print(f"✅ {set_name} concluído")
             logger.success(set_name, duracao_set)
+            self._registrar_historico(set_path, 'sucesso', inicio_set, chave, saida=csv_path)
             return True
             
+        except FalhaFase as falha:
+            self._ultima_falha = f"{falha.fase}/{falha.causa}: {falha}"
+            console.escrever(f"❌ Falha na fase '{falha.fase}' ({falha.causa}): {falha}")
+            logger.failure(set_name, f"{falha.fase}/{falha.causa} | {falha}")
+            self._delays.registrar_falha()
+            self._registrar_historico(set_path, 'falha', inicio_set, chave, causa=f"{falha.fase}/{falha.causa}")
+            self.driver.recuperar()
+            if falha.causa == 'interrompido':
+                raise
+            return False
+
         except Exception as e:
-            print(f"❌ Erro: {e}")
-            logger.failure(set_name, str(e))
-            
-            # Retry automático
-            if tentativa < max_tentativas:
-                print(f"🔄 Tentando novamente em 5 segundos...")
-                logger.info(f"Retry para {set_name}")
-                time.sleep(5)
-                # Tentar refocar MT5 antes de retry
-                try:
-                    self.focar_mt5(forcar=True)
-                except:
-                    pass
-                return self.processar_set(set_path, index, total, tentativa + 1, max_tentativas)
-            
+            # Erro fora das fases (cópia do CSV, config, GUI): falha só este set, o lote continua
+            self._ultima_falha = f"inesperado: {e}"
+            console.escrever(f"❌ Erro inesperado em {set_name}: {e}")
+            logger.failure(set_name, f"inesperado | {e}")
+            logger.logger.exception(f"Erro inesperado em {set_name}")
+            self._delays.registrar_falha()
+            self._registrar_historico(set_path, 'falha', inicio_set, chave, causa='inesperado')
+            if classificar_causa(e) == 'interrompido':
+                raise
+            try:
+                self.driver.recuperar()
+            except Exception as erro_recuperar:
+                logger.warning(f"Recuperação após erro inesperado falhou: {erro_recuperar}")
+            return False
+
+    def _sentinela_durante_backtest(self):
+        """Callback do monitor: trata diálogos no máximo uma vez por segundo"""
+        agora = time.time()
+        if agora - self._ultima_sentinela >= 1.0:
+            self._ultima_sentinela = agora
+            self._checar_dialogos('backtest', esperar=False)
+        if agora - self._ultima_renovacao >= 60.0:
+            self._renovar_lease()
+    
+    def _renovar_lease(self):
+        """Estende o lease do job atual: backtests longos não são assumidos por outro processo"""
+        if self._fila is None or self._job is None:
+            return
+        self._ultima_renovacao = time.time()
+        try:
+            self._fila.renovar(self._job)
+        except Exception as e:
+            logger.warning(f"Fila: falha ao renovar lease do job {self._job.id}: {e}")
+    
+    def execucao_pendente(self):
+        """Contagem da fila anterior se houver jobs não concluídos (None se não há o que retomar)"""
+        if not self.fila_path.exists():
+            return None
+        fila = FilaJobs(self.fila_path)
+        try:
+            contagem = fila.contagem()
+        finally:
+            fila.fechar()
+        if contagem['pendente'] + contagem['em_execucao'] + contagem['falha'] == 0:
+            return None
+        return contagem
+    
+    def _montar_fila(self, retomar):
+        """Abre a fila persistente; sem retomar, recomeça a partir dos .set atuais"""
+        fila = FilaJobs(self.fila_path)
+        arquivos = self.obter_arquivos_set()
+        tester = dict(self.config['Tester']) if 'Tester' in self.config else {}
+        ordenados, self._localidades = ordenar_por_localidade(arquivos, tester)
+        if self.ordenar_localidade:
+            grupos = len(set(self._localidades.values()))
+            print(f"🗂️ {len(ordenados)} sets em {grupos} grupos (símbolo/período/modelo/datas)")
+            arquivos = ordenados
+        if retomar:
+            recuperados = fila.recuperar_leases()
+            novos = fila.enfileirar(arquivos)
+            print(f"♻️ Retomando fila: {recuperados} jobs em execução devolvidos, {novos} novos .set")
+            logger.info(f"Retomada: {recuperados} leases recuperados, {novos} novos jobs")
+        else:
+            fila.limpar()
+            fila.enfileirar(arquivos)
+        return fila
+    
+    def _preparar_gui(self, interativo=True):
+        """Checagens do terminal na GUI antes do lote (MT5 aberto, foco, perfil de coordenadas)"""
+        # Verificar se MT5 está rodando e em foco
+        self.garantir_mt5_rodando()
+        
+        # Verificar se consegue focar o MT5
+        print("\n🔍 Verificando janela do MT5...")
+        if not self.focar_mt5(forcar=False):
+            print("❌ MT5 não está visível ou acessível!")
+            print("💡 Por favor, abra o MetaTrader 5 e deixe visível.")
+            logger.error("MT5 não acessível")
+            if interativo:
+                input("\nPressione ENTER para voltar ao menu...")
+            return False
+        
+        print("✅ MT5 está em foco")
+        logger.info("MT5 em foco")
+        calibrar = self.calibracao_pendente()
+        
+        # Confirmação de segurança
+        print("\n" + "="*50)
+        print("⚠️  ATENÇÃO: A automação vai começar!")
+        print("="*50)
+        print("📌 Certifique-se que:")
+        print("   1. O MT5 está aberto e visível")
+        print("   2. O Strategy Tester está aberto")
+        print("   3. Não mexa no mouse/teclado durante a execução")
+        if calibrar:
+            print("   4. Sem perfil de coordenadas para esta tela: a calibração automática")
+            print("      vai clicar nas abas e menus do Strategy Tester antes do lote")
+        print("="*50)
+        
+        confirma = input("\n🚀 Iniciar automação? (S/n): ").strip().lower() if interativo else 's'
+        if confirma == 'n':
+            print("❌ Automação cancelada pelo usuário")
+            logger.info("Automação cancelada pelo usuário")
             return False
+        
+        # Focar MT5 novamente após confirmação
+        print("\n🎯 Focando MT5...")
+        self.focar_mt5(forcar=True)
+        time.sleep(1)
+        # Calibração só com o consentimento acima (ou --nao-interativo): ela clica no terminal
+        if calibrar:
+            self.garantir_perfil_coordenadas()
+            self.focar_mt5(forcar=True)
+        return True
+    
+    def iniciar_perfilamento(self):
+        """Liga o modo de perfilamento; capturas vão para logs/perfil_* ao lado do log do lote"""
+        pasta = logger.log_path.with_name(logger.log_path.stem.replace('automacao', 'perfil', 1))
+        perfilamento.ativar(perfilamento.Perfilador.do_config(self.config, pasta))
+        print(f"🔬 Perfilamento ativo (cProfile + tracemalloc por fase): {pasta}")
+        logger.info(f"Perfilamento ativo: {pasta}")
+    
+    def encerrar_perfilamento(self):
+        perfilador = perfilamento.desativar()
+        if perfilador is not None:
+            perfilamento.imprimir_resumo(perfilador)
+            logger.info(f"Perfil por fase: {perfilador.resumo()}")
     
-    def executar_automacao_completa(self):
-        """Engine principal com logging completo"""
+    def executar_automacao_completa(self, retomar=False, interativo=True, perfilar=False):
+        """Engine principal com logging completo (retomar=True pula jobs já concluídos,
+        perfilar=True grava cProfile/tracemalloc por fase e capturas dos outliers)"""
         print("=" * 40)
         print("🤖 MT5 AUTOMAÇÃO OTIMIZADA")
         print("=" * 40)
         
         logger.info("═══ AUTOMAÇÃO INICIADA ═══")
+        if perfilar:
+            self.iniciar_perfilamento()
         
         try:
-            # Verificar se MT5 está rodando e em foco
-            self.garantir_mt5_rodando()
-            
-            # Verificar se consegue focar o MT5
-            print("\n🔍 Verificando janela do MT5...")
-            if not self.focar_mt5(forcar=False):
-                print("❌ MT5 não está visível ou acessível!")
-                print("💡 Por favor, abra o MetaTrader 5 e deixe visível.")
-                logger.error("MT5 não acessível")
-                input("\nPressione ENTER para voltar ao menu...")
-                return
-            
-            print("✅ MT5 está em foco")
-            logger.info("MT5 em foco")
-            
-            # Confirmação de segurança
-            print("\n" + "="*50)
-            print("⚠️  ATENÇÃO: A automação vai começar!")
-            print("="*50)
-            print("📌 Certifique-se que:")
-            print("   1. O MT5 está aberto e visível")
-            print("   2. O Strategy Tester está aberto")
-            print("   3. Não mexa no mouse/teclado durante a execução")
-            print("="*50)
-            
-            confirma = input("\n🚀 Iniciar automação? (S/n): ").strip().lower()
-            if confirma == 'n':
-                print("❌ Automação cancelada pelo usuário")
-                logger.info("Automação cancelada pelo usuário")
-                return
-            
-            # Focar MT5 novamente após confirmação
-            print("\n🎯 Focando MT5...")
-            self.focar_mt5(forcar=True)
-            time.sleep(1)
+            if self.driver.usa_gui:
+                if not self._preparar_gui(interativo):
+                    return
+            else:
+                print(f"🔌 Driver: {self.driver.nome}")
+                logger.info(f"Driver: {self.driver.nome}")
+                self.driver.abrir()
+            if self._cache is not None and not self.driver.aplica_tester:
+                print(f"ℹ️ Cache de resultados inativo no driver {self.driver.nome} "
+                      f"(o tester usa as configurações do terminal, não o [Tester])")
+                logger.info(f"Cache de resultados inativo: driver {self.driver.nome} não aplica [Tester]")
             
-            arquivos_set = self.obter_arquivos_set()
-            total = len(arquivos_set)
-            print(f"\n📋 {total} arquivos encontrados")
-            logger.info(f"Arquivos .set encontrados: {total}")
+            fila = self._montar_fila(retomar)
+            contagem = fila.contagem()
+            total = fila.total()
+            ja_concluidos = contagem['concluido']
+            print(f"\n📋 {total} arquivos na fila ({ja_concluidos} já concluídos)")
+            logger.info(f"Fila: {total} jobs | {contagem}")
+            if self._historico is not None:
+                self._execucao_id = self._historico.iniciar_execucao(self.driver.nome, total)
             
-            sucessos = 0
             falhas_lista = []
             inicio = time.time()
+            index = ja_concluidos
             
-            for i, set_file in enumerate(arquivos_set, 1):
-                if self.processar_set(set_file, i, total):
-                    sucessos += 1
-                else:
-                    falhas_lista.append(Path(set_file).stem)
+            try:
+                while True:
+                    job = fila.proximo()
+                    if job is None:
+                        break
+                    index += 1
+                    try:
+                        if not job.caminho.exists():
+                            fila.falhar(job, 'arquivo .set ausente')
+                            falhas_lista.append(job.caminho.stem)
+                            continue
+                        self._ultima_falha = 'falha'
+                        self._fila, self._job = fila, job
+                        with rastreamento.contexto(job=job.caminho.stem, job_id=job.id), rastreamento.span('set'):
+                            sucesso = self.processar_set(job.caminho, index, total)
+                        if sucesso:
+                            fila.concluir(job, self.caminho_saida(job.caminho.stem))
+                        else:
+                            fila.falhar(job, self._ultima_falha)
+                            falhas_lista.append(job.caminho.stem)
+                    finally:
+                        # Interrupção no meio do job: devolve à fila para a próxima retomada
+                        self._job = None
+                        fila.devolver(job)
+                    
+                    if fila.contagem()['pendente'] and self.driver.usa_gui:
+                        self._aguardar('entre_sets', 3.0)
+                        self._delays.registrar_sucesso(['entre_sets'])
                 
-                if i < total:
-                    time.sleep(3)
+                contagem = fila.contagem()
+            finally:
+                self._fila = None
+                fila.fechar()
             
             # Resumo
             duracao = time.time() - inicio
-            falhas = total - sucessos
+            sucessos = contagem['concluido']
+            falhas = contagem['falha']
             
             print(f"\n{'=' * 40}")
             print("📊 RESUMO FINAL")
@@ -591,30 +1258,74 @@ class MT5Automacao:
             print(f"⏱️ Tempo: {duracao:.1f}s")
             print(f"📁 Local: {self.curves_folder}")
             print(f"📋 Log: {logger.log_path}")
+            if rastreamento.ativo() is not None:
+                print(f"📈 Spans: {rastreamento.ativo().caminho} (python rastreamento.py -o trace.json)")
             
             if falhas_lista:
                 print(f"\n⚠️ Arquivos com falha:")
                 for f in falhas_lista:
                     print(f"   - {f}")
+            if falhas:
+                print("💡 Use 'retomar' para reprocessar apenas os jobs com falha")
             
             # Log resumo final
             logger.resumo(total, sucessos, falhas, duracao)
+            if self._historico is not None and self._execucao_id is not None:
+                self._historico.finalizar_execucao(self._execucao_id, sucessos, falhas)
+            logger.info(f"Navegações evitadas pelo cache de estado da UI: {self.navegacoes_evitadas}")
+            inicializacao = self._medidor_inicio.resumo()
+            if inicializacao:
+                print(f"⏱️ Inicialização: fria {inicializacao['frio_medio']:.1f}s | quente "
+                      f"{inicializacao['quente_medio']:.1f}s | trocas de grupo "
+                      f"{inicializacao['trocas_alfabetica']} (alfabética) -> {inicializacao['trocas_executadas']} | "
+                      f"economia estimada {inicializacao['economia_estimada']:.0f}s")
+                logger.info(f"Inicialização por localidade: {inicializacao}")
+            if self._cache is not None and self._cache.acertos:
+                print(f"♻️ Restaurados do cache: {self._cache.acertos}")
+            if self._cache is not None:
+                logger.info(f"Cache de resultados: {self._cache.acertos} acertos, {self._cache.faltas} faltas, "
+                            f"{self._cache.tamanho_total() / 1024 / 1024:.1f} MB")
+            if self.estatisticas_retry:
+                print(f"🔁 Retries por fase/causa: {self.estatisticas_retry}")
+            logger.info(f"Retries por fase/causa: {self.estatisticas_retry}")
+            logger.info(f"Perfil de delays ({self._delays.host}): "
+                        f"{self._delays.overhead_total():.2f}s/set | {self._delays.resumo()}")
             
         except Exception as e:
             print(f"❌ Erro: {e}")
             logger.error(f"Erro crítico: {e}")
             import traceback
             traceback.print_exc()
+        finally:
+            if not self.driver.usa_gui:
+                with rastreamento.span('encerrar'):
+                    self.driver.encerrar()
+            # Persistir delays aprendidos mesmo em caso de erro/interrupção
+            self._delays.salvar()
+            if perfilar:
+                self.encerrar_perfilamento()
         
         # Sempre pausar no final para ver resultados
-        input("\nPressione ENTER para voltar ao menu...")
+        if interativo:
+            input("\nPressione ENTER para voltar ao menu...")
 
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Automação de backtests MT5")
+    parser.add_argument('--retomar', action='store_true', help="retoma a fila anterior (pula os concluídos)")
+    parser.add_argument('--driver', choices=('gui', 'ini', 'fake'), help="backend do MT5 (padrão: [MT5] driver)")
+    parser.add_argument('--nao-interativo', action='store_true', help="não pede confirmação nem ENTER")
+    parser.add_argument('--perfilar', '--profile', action='store_true',
+                        help="cProfile/tracemalloc por fase e captura de pilhas das fases acima do p99")
+    args = parser.parse_args()
     try:
-        automacao = MT5Automacao()
-        automacao.executar_automacao_completa()
+        automacao = MT5Automacao(driver=args.driver)
+        automacao.executar_automacao_completa(retomar=args.retomar, interativo=not args.nao_interativo,
+                                              perfilar=args.perfilar)
     except Exception as e:
         print(f"❌ Erro: {e}")
     finally:
-        input("\nPressione ENTER para sair...")
+        if not args.nao_interativo:
+            input("\nPressione ENTER para sair...")
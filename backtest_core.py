@@ -2,93 +2,214 @@
 """Núcleo de componentes OOP para automação de backtests MT5.
 
 Classes:
-- INIGenerator: Geração de arquivos .ini a partir de template com substituição de datas.
+- INIGenerator: Geração de arquivos .ini a partir de template com substituição de datas
+  (template compilado uma vez; `build_many` gera lotes com chaves do [Tester] por job).
 - BacktestMonitor: Monitoramento da porta 3000 para detectar início/fim do backtest.
 
 Foco: reutilização por diferentes fluxos (batch de .set, OOS, etc.)
 """
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-import configparser
-import re
+import codecs
+import os
+import logging
 import time
 import psutil
-from typing import Optional, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from arquivos_set import tester_inputs
+from status_console import console
+
+@dataclass
+class JobINI:
+    """Um INI a gerar em `INIGenerator.build_many` (datas, .set e chaves do [Tester] sobrescritas)."""
+    from_mt5: str
+    to_mt5: str
+    from_slug: str
+    to_slug: str
+    set_file: Optional[Path] = None
+    tester: Dict[str, str] = field(default_factory=dict)
+    destino: Optional[Path] = None  # padrão: <pasta>/OOS_<de>_<ate>.ini
+
+
+class _SecaoINI:
+    """Linhas de uma seção e a posição de cada chave (para trocar valores sem reparsear)."""
+    __slots__ = ('nome', 'linhas', 'chaves', 'fim')
+
+    def __init__(self, nome: str, cabecalho: str):
+        self.nome = nome
+        self.linhas: List[str] = [cabecalho]
+        self.chaves: Dict[str, List[Tuple[int, str]]] = {}  # chave minúscula -> [(linha, grafia original)]
+        self.fim = 1  # onde entram chaves novas: após a última linha não vazia
+
+
+class TemplateINI:
+    """Template INI compilado uma vez: seções, chaves e linhas originais (comentários preservados)."""
+
+    def __init__(self, texto: str):
+        self.preambulo: List[str] = []
+        self.secoes: List[_SecaoINI] = []
+        self._por_nome: Dict[str, _SecaoINI] = {}
+        atual = None
+        for linha in texto.split('\n'):
+            limpa = linha.strip()
+            if limpa.startswith('[') and limpa.endswith(']'):
+                atual = _SecaoINI(limpa[1:-1].strip(), linha)
+                self.secoes.append(atual)
+                self._por_nome.setdefault(atual.nome.lower(), atual)
+                continue
+            if atual is None:
+                self.preambulo.append(linha)
+                continue
+            atual.linhas.append(linha)
+            if limpa:
+                atual.fim = len(atual.linhas)
+            if '=' in limpa and not limpa.startswith((';', '#')):
+                chave = linha.split('=', 1)[0].strip()
+                atual.chaves.setdefault(chave.lower(), []).append((len(atual.linhas) - 1, chave))
+
+    def valor(self, secao: str, chave: str, padrao: str = None) -> Optional[str]:
+        s = self._por_nome.get(secao.lower())
+        ocorrencias = s.chaves.get(chave.lower()) if s else None
+        if not ocorrencias:
+            return padrao
+        return s.linhas[ocorrencias[-1][0]].split('=', 1)[1].strip()
+
+    def tem_chave(self, secao: str, chave: str) -> bool:
+        s = self._por_nome.get(secao.lower())
+        return bool(s and chave.lower() in s.chaves)
+
+    def renderizar(self, valores: Dict[str, Dict[str, str]], nova_linha: str = '\n') -> str:
+        """Texto com `valores` (seção -> {chave: valor}) aplicados.
+
+        Chaves existentes têm o valor trocado no lugar (todas as ocorrências); chaves novas
+        entram no fim da seção e seções novas no fim do arquivo.
+        """
+        pendentes = {nome.lower(): (nome, chaves) for nome, chaves in valores.items() if chaves}
+        partes = list(self.preambulo)
+        for secao in self.secoes:
+            alvo = pendentes.pop(secao.nome.lower(), None) if self._por_nome[secao.nome.lower()] is secao else None
+            if alvo is None:
+                partes.extend(secao.linhas)
+                continue
+            linhas = list(secao.linhas)
+            novas = []
+            for chave, valor in alvo[1].items():
+                ocorrencias = secao.chaves.get(chave.lower())
+                if ocorrencias:
+                    for indice, grafia in ocorrencias:
+                        linhas[indice] = f"{grafia}={valor}"
+                else:
+                    novas.append(f"{chave}={valor}")
+            linhas[secao.fim:secao.fim] = novas
+            partes.extend(linhas)
+        for nome, chaves in pendentes.values():
+            partes.append(f"[{nome}]")
+            partes.extend(f"{chave}={valor}" for chave, valor in chaves.items())
+            partes.append('')
+        return nova_linha.join(partes)
+
 
 @dataclass
 class INIGenerator:
     template_path: Path
     reports_dir: Path
+    injetar_inputs: bool = True  # inputs do .set em [TesterInputs] (dispensa carregar o .set na GUI)
 
     def __post_init__(self):
         if not self.template_path.exists():
             raise FileNotFoundError(f"Template INI não encontrado: {self.template_path}")
         self.reports_dir.mkdir(parents=True, exist_ok=True)
         self._encoding: Optional[str] = None
-        self._raw_cache: Optional[str] = None
-
-    def _detect_encoding(self):
-        if self._encoding:
-            return self._encoding
-        encodings = ["utf-8", "utf-8-sig", "utf-16", "utf-16-le", "latin-1"]
-        last_err = None
-        for enc in encodings:
-            try:
-                data = self.template_path.read_text(encoding=enc)
-                self._encoding = enc
-                self._raw_cache = data
-                return enc
-            except UnicodeDecodeError as e:
-                last_err = e
-        raise UnicodeDecodeError("Falha", b"", 0, 0, f"Não foi possível decodificar {self.template_path}. Último erro: {last_err}")
-
-    def _ensure_loaded(self):
-        if self._raw_cache is None:
-            self._detect_encoding()
-
-    def build(self, from_mt5: str, to_mt5: str, from_slug: str, to_slug: str, set_file: Path = None) -> Tuple[str, str]:
-        """Retorna (conteudo_modificado, encoding)."""
-        self._ensure_loaded()
-        content = self._raw_cache
-        # Substituir linhas
-        content = re.sub(r'^FromDate=.*$', f'FromDate={from_mt5}', content, flags=re.MULTILINE)
-        content = re.sub(r'^ToDate=.*$', f'ToDate={to_mt5}', content, flags=re.MULTILINE)
-        
-        # Adicionar relatório se não existir
-        if 'Report=' not in content:
-            report_path = self.reports_dir / f"OOS_{from_slug}_{to_slug}.html"
-            report_norm = str(report_path).replace('\\', '/')
-            # Inserir dentro da seção [Tester] ou criar
-            if '[Tester]' in content:
-                def repl(m):
-                    block = m.group(0)
-                    if 'Report=' in block:
-                        return block
-                    additions = f"\nReport={report_norm}\nReplaceReport=1"
-                    # Adicionar referência ao .set se fornecido
-                    if set_file and set_file.exists():
-                        set_norm = str(set_file).replace('\\', '/')
-                        additions += f"\nSet={set_norm}"
-                    return block + additions
-                content = re.sub(r'\[Tester\][^\[]*', repl, content, flags=re.MULTILINE)
-            else:
-                addition = f"\n[Tester]\nReport={report_norm}\nReplaceReport=1"
-                if set_file and set_file.exists():
-                    set_norm = str(set_file).replace('\\', '/')
-                    addition += f"\nSet={set_norm}"
-                content += addition
-        return content, self._encoding or 'utf-8'
+        self._nova_linha = '\n'
+        self._template: Optional[TemplateINI] = None
+        self._inputs_cache: Dict[Path, Tuple[Tuple[int, int], Dict[str, str]]] = {}
+
+    def _detect_encoding(self, dados: bytes) -> str:
+        """Encoding pelo BOM; sem BOM, UTF-16LE se houver bytes nulos, senão UTF-8 ou latin-1."""
+        if dados.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        if dados.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            return 'utf-16'
+        if b'\x00' in dados:
+            return 'utf-16-le'
+        try:
+            dados.decode('utf-8')
+            return 'utf-8'
+        except UnicodeDecodeError:
+            return 'latin-1'
+
+    def _ensure_loaded(self) -> TemplateINI:
+        """Lê e compila o template uma única vez (encoding, BOM e quebra de linha preservados)."""
+        if self._template is None:
+            dados = self.template_path.read_bytes()
+            self._encoding = self._detect_encoding(dados)
+            texto = dados.decode(self._encoding)
+            self._nova_linha = '\r\n' if '\r\n' in texto else '\n'
+            self._template = TemplateINI(texto.replace('\r\n', '\n'))
+        return self._template
+
+    def inputs_do_set(self, set_file: Path) -> Optional[Dict[str, str]]:
+        """[TesterInputs] do .set (lido uma vez por versão do arquivo); None se não existe."""
+        set_file = Path(set_file)
+        try:
+            info = os.stat(set_file)
+        except OSError:
+            return None
+        versao = (info.st_mtime_ns, info.st_size)
+        cache = self._inputs_cache.get(set_file)
+        if cache is None or cache[0] != versao:
+            cache = (versao, tester_inputs(set_file))
+            self._inputs_cache[set_file] = cache
+        return cache[1]
+
+    def _valores(self, job: JobINI) -> Dict[str, Dict[str, str]]:
+        template = self._ensure_loaded()
+        tester = {'FromDate': job.from_mt5, 'ToDate': job.to_mt5}
+        inputs = self.inputs_do_set(job.set_file) if job.set_file else None
+        # Relatório dedicado ao step (e o .set) só se o template não define o próprio
+        if not template.tem_chave('Tester', 'Report'):
+            report_path = self.reports_dir / f"OOS_{job.from_slug}_{job.to_slug}.html"
+            tester['Report'] = str(report_path).replace('\\', '/')
+            tester['ReplaceReport'] = '1'
+            if inputs is not None:
+                tester['Set'] = str(job.set_file).replace('\\', '/')
+        tester.update(job.tester)
+        valores = {'Tester': tester}
+        if inputs and self.injetar_inputs:
+            valores['TesterInputs'] = inputs
+        return valores
+
+    def build(self, from_mt5: str, to_mt5: str, from_slug: str, to_slug: str, set_file: Path = None,
+              tester: Dict[str, str] = None) -> Tuple[str, str]:
+        """Retorna (conteudo_modificado, encoding); `tester` sobrescreve chaves do [Tester]."""
+        job = JobINI(from_mt5, to_mt5, from_slug, to_slug, set_file, tester or {})
+        return self._ensure_loaded().renderizar(self._valores(job)), self._encoding
+
+    def build_many(self, jobs: Iterable[JobINI], pasta: Path = None) -> List[Path]:
+        """Gera e grava os INIs de vários jobs com o template já compilado.
+
+        Cada arquivo sai com o encoding/BOM e a quebra de linha do template; `pasta` é usada
+        para os jobs sem `destino` (OOS_<de>_<ate>.ini).
+        """
+        template = self._ensure_loaded()
+        pastas_criadas = set()
+        caminhos = []
+        for job in jobs:
+            destino = Path(job.destino) if job.destino else Path(pasta) / f"OOS_{job.from_slug}_{job.to_slug}.ini"
+            if destino.parent not in pastas_criadas:
+                destino.parent.mkdir(parents=True, exist_ok=True)
+                pastas_criadas.add(destino.parent)
+            conteudo = template.renderizar(self._valores(job), self._nova_linha)
+            destino.write_bytes(conteudo.encode(self._encoding))
+            caminhos.append(destino)
+        return caminhos
 
     def extract_symbol_period(self) -> Tuple[str, str]:
-        self._ensure_loaded()
-        cfg = configparser.ConfigParser()
-        cfg.optionxform = str
-        cfg.read_string(self._raw_cache)
-        sym = cfg.get('Tester', 'Symbol', fallback='SYMBOL')
-        per = cfg.get('Tester', 'Period', fallback='TF')
-        return sym, per
+        template = self._ensure_loaded()
+        return template.valor('Tester', 'Symbol', 'SYMBOL'), template.valor('Tester', 'Period', 'TF')
 
 
 class BacktestMonitor:
@@ -101,10 +222,17 @@ class BacktestMonitor:
     então usamos ela apenas para detectar INÍCIO, não o fim.
     """
     
-    def __init__(self, port: int = 3000, poll_interval: float = 0.1, verbose: bool = True):
+    def __init__(self, port: int = 3000, poll_interval: float = 0.1, verbose: bool = True,
+                 verificador_fim: Optional[Callable[[], bool]] = None, isolar_pid: bool = False):
         self.port = port
         self.poll_interval = poll_interval
         self.verbose = verbose
+        # Verificação extra de conclusão (ex.: template "tester concluído" na tela)
+        self.verificador_fim = verificador_fim
+        # Vários terminais simultâneos (porta própria cada): CPU e saída só do metatester
+        # dono da conexão na porta; sem o fallback por CPU, que pegaria o de outro terminal
+        self.isolar_pid = isolar_pid
+        self._rotulo: Optional[str] = None
         self._start_time: float | None = None
         self._run_start: float | None = None
         self._active = False
@@ -175,12 +303,15 @@ class BacktestMonitor:
                         })
         except Exception as e:
             if self.verbose:
-                print(f"⚠️ Erro ao verificar porta: {e}")
+                console.detalhe(f"Erro ao verificar porta: {e}", nivel=logging.WARNING)
         
         return has_established, has_any, details
 
-    def wait(self, timeout: float = 300) -> bool:
-        """Aguarda conclusão do backtest com timeout"""
+    def wait(self, timeout: float = 300, ao_poll: Optional[Callable[[], None]] = None) -> bool:
+        """Aguarda conclusão do backtest com timeout
+
+        ao_poll: chamado a cada iteração (ex.: sentinela de diálogos modais).
+        """
         if not self._active:
             self.start()
         
@@ -188,11 +319,15 @@ class BacktestMonitor:
         while time.time() - self._start_time < timeout:
             finished, last_log = self.poll(log_interval_ref={'last_log': last_log})
             if finished:
+                console.remover(self.rotulo)
                 return True
+            if ao_poll is not None:
+                ao_poll()
             time.sleep(self.poll_interval)
         
         if self.verbose:
-            print("⏰ Timeout no monitoramento")
+            console.remover(self.rotulo)
+            console.escrever("⏰ Timeout no monitoramento")
         self._active = False
         self._state = 'IDLE'
         return False
@@ -228,6 +363,8 @@ class BacktestMonitor:
         # Obter estado atual
         has_established, has_any, conn_details = self._check_port_activity()
         metatester_procs = self._get_metatester_processes()
+        if self.isolar_pid and self._backtest_pid is not None:
+            metatester_procs = [p for p in metatester_procs if p['pid'] == self._backtest_pid]
         
         # ============ ESTADO: WAITING ============
         if self._state == 'WAITING':
@@ -240,15 +377,17 @@ class BacktestMonitor:
                 # Tentar identificar o PID do backtest
                 if conn_details:
                     self._backtest_pid = conn_details[0].get('pid')
+                if self.isolar_pid and self._backtest_pid not in {p['pid'] for p in metatester_procs}:
+                    self._backtest_pid = None  # conexão sem PID de metatester: sem isolamento
                 
                 if self.verbose:
-                    print(f"🚀 Backtest INICIADO! (conexão porta {self.port})")
+                    console.escrever(f"🚀 Backtest INICIADO! (conexão porta {self.port})")
                     if metatester_procs:
                         cpus = [f"PID {p['pid']}: {p['cpu']:.1f}%" for p in metatester_procs]
-                        print(f"   MetaTesters ativos: {', '.join(cpus)}")
+                        console.detalhe(f"MetaTesters ativos: {', '.join(cpus)}")
             
             # Método 2: Detectar aumento de CPU nos metatesters (fallback)
-            elif metatester_procs:
+            elif metatester_procs and not self.isolar_pid:
                 high_cpu_procs = [p for p in metatester_procs if p['cpu'] > 20]
                 if high_cpu_procs:
                     self._connection_seen = True
@@ -256,10 +395,18 @@ class BacktestMonitor:
                     self._state = 'RUNNING'
                     self._backtest_pid = high_cpu_procs[0]['pid']
                     if self.verbose:
-                        print(f"🚀 Backtest INICIADO! (CPU alta detectada: PID {self._backtest_pid})")
+                        console.escrever(f"🚀 Backtest INICIADO! (CPU alta detectada: PID {self._backtest_pid})")
         
         # ============ ESTADO: RUNNING ============
         elif self._state == 'RUNNING':
+            if self.verificador_fim is not None and self.verificador_fim():
+                total_time = now - (self._run_start or now)
+                if self.verbose:
+                    console.escrever(f"✅ Backtest FINALIZADO! (estado da UI) Duração: {total_time:.1f}s")
+                self._finished = True
+                self._active = False
+                self._state = 'IDLE'
+                return (True, now)
             if metatester_procs:
                 # Calcular CPU máxima entre metatesters
                 max_cpu = max(p['cpu'] for p in metatester_procs)
@@ -269,14 +416,14 @@ class BacktestMonitor:
                     if self._low_cpu_start is None:
                         self._low_cpu_start = now
                         if self.verbose:
-                            print(f"📉 CPU baixa detectada ({max_cpu:.1f}%) - verificando...")
+                            console.detalhe(f"CPU baixa detectada ({max_cpu:.1f}%) - verificando fim")
                     else:
                         low_duration = now - self._low_cpu_start
                         if low_duration >= self._low_cpu_duration:
                             # Confirmado: backtest terminou
                             total_time = now - (self._run_start or now)
                             if self.verbose:
-                                print(f"✅ Backtest FINALIZADO! Duração: {total_time:.1f}s")
+                                console.escrever(f"✅ Backtest FINALIZADO! Duração: {total_time:.1f}s")
                             self._finished = True
                             self._active = False
                             self._state = 'IDLE'
@@ -289,27 +436,49 @@ class BacktestMonitor:
                 if self._run_start:
                     total_time = now - self._run_start
                     if self.verbose:
-                        print(f"✅ Backtest FINALIZADO! (processo encerrado) Duração: {total_time:.1f}s")
+                        console.escrever(f"✅ Backtest FINALIZADO! (processo encerrado) Duração: {total_time:.1f}s")
                     self._finished = True
                     self._active = False
                     self._state = 'IDLE'
                     return (True, now)
         
-        # Logs periódicos
-        if self.verbose and now - last_log > 10:
+        # Status a cada poll (o console limita a taxa de redesenho); detalhe no log a cada 10s
+        if self.verbose and self._state in ('WAITING', 'RUNNING'):
             if self._state == 'WAITING':
-                print(f"⏳ Aguardando início do backtest...")
-            elif self._state == 'RUNNING':
+                texto = f"⏳ Aguardando início do backtest... {now - self._start_time:.0f}s"
+            else:
                 elapsed = now - (self._run_start or now)
-                if metatester_procs:
-                    max_cpu = max(p['cpu'] for p in metatester_procs)
-                    print(f"⏳ Executando... {elapsed:.0f}s | CPU: {max_cpu:.1f}%")
-                else:
-                    print(f"⏳ Executando... {elapsed:.0f}s | MetaTester não encontrado")
-            last_log = now
+                cpu = (f"CPU: {max(p['cpu'] for p in metatester_procs):.1f}%" if metatester_procs
+                       else "MetaTester não encontrado")
+                texto = f"⏳ Executando... {elapsed:.0f}s | {cpu}"
+            console.atualizar(self.rotulo, texto)
+            if now - last_log > 10:
+                console.detalhe(texto, estado=self._state, porta=self.port)
+                last_log = now
         
         return (self._finished, last_log)
 
+    @property
+    def startup_time(self) -> Optional[float]:
+        """Segundos entre start() e a detecção do início real (carga de histórico/cache do tester)"""
+        if self._start_time is None or self._run_start is None:
+            return None
+        return self._run_start - self._start_time
+
+    @property
+    def rotulo(self) -> str:
+        """Nome do worker na linha de status (padrão: a porta monitorada)"""
+        return self._rotulo or f"porta {self.port}"
+
+    @rotulo.setter
+    def rotulo(self, valor: Optional[str]):
+        self._rotulo = valor
+
+    @property
+    def run_start_time(self) -> Optional[float]:
+        """Instante (epoch) em que o início real do backtest foi detectado"""
+        return self._run_start
+
     @property
     def state(self):
         return self._state
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""Benchmark ponta a ponta da orquestração com o driver simulado (DriverFake).
+
+Roda N sets sintéticos pelo mesmo caminho do lote real (fila SQLite, ordenação
+por localidade, retry por fase, export) e mede:
+
+- sets/hora;
+- p50/p95/p99 de cada fase (carregar, iniciar, aguardar, exportar) e do set;
+- overhead de orquestração por set = tempo real do set - latência simulada
+  pelo driver (o que sobra é custo nosso: fila, cache, logs, retries).
+
+O resultado vai para JSON e é comparado com um baseline salvo; uma piora além
+da tolerância encerra com código 1 (útil em CI/pre-commit).
+
+Uso:
+    python benchmark_e2e.py --jobs 200                 # roda e compara com o baseline
+    python benchmark_e2e.py --jobs 200 --salvar-baseline
+    python benchmark_e2e.py --escala 0 --tolerancia 0.2
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import io
+import json
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import rastreamento
+from automacao import MT5Automacao, logger
+from cache_resultados import CacheResultados
+from drivers_mt5 import LATENCIAS_FAKE, DriverFake
+from historico_execucoes import HistoricoExecucoes
+from perfil_delays import PerfilDelays
+from perfilamento import percentil
+
+BASE_DIR = Path(__file__).resolve().parent
+PASTA_BENCHMARKS = BASE_DIR / 'benchmarks'
+SAIDA_PADRAO = PASTA_BENCHMARKS / 'e2e_ultimo.json'
+BASELINE_PADRAO = PASTA_BENCHMARKS / 'e2e_baseline.json'
+
+SIMBOLOS = ('WIN$N', 'WDO$N', 'PETR4', 'VALE3')
+PERIODOS = ('M5', 'M15', 'H1')
+
+# Métricas comparadas com o baseline: (caminho no JSON, maior_melhor)
+METRICAS_REGRESSAO = (
+    (('sets_por_hora',), True),
+    (('overhead_por_set_ms', 'p50'), False),
+    (('overhead_por_set_ms', 'p95'), False),
+)
+
+
+def resumo_ms(valores: List[float]) -> Dict[str, float]:
+    return {
+        'n': len(valores),
+        'p50': round(percentil(valores, 50) * 1000, 3),
+        'p95': round(percentil(valores, 95) * 1000, 3),
+        'p99': round(percentil(valores, 99) * 1000, 3),
+    }
+
+
+def gerar_sets(pasta: Path, n: int) -> List[Path]:
+    """Sets sintéticos em UTF-16 com símbolos/períodos variados (exercita a ordenação)."""
+    pasta.mkdir(parents=True, exist_ok=True)
+    caminhos = []
+    for i in range(n):
+        caminho = pasta / f"bench_{i:05d}.set"
+        linhas = [
+            f"SYMBOL_CODE={SIMBOLOS[i % len(SIMBOLOS)]}",
+            f"TIMEFRAME={PERIODOS[(i // len(SIMBOLOS)) % len(PERIODOS)]}",
+            f"Lote={1 + i % 5}||1||1||5||N",
+            f"StopLoss={100 + i}||50||10||500||Y",
+        ]
+        caminho.write_text('\n'.join(linhas) + '\n', encoding='utf-16')
+        caminhos.append(caminho)
+    return caminhos
+
+
+class _AutomacaoMedida(MT5Automacao):
+    """MT5Automacao cronometrando cada fase e cada set."""
+
+    def __init__(self, *args, **kwargs):
+        self.tempos_fase: Dict[str, List[float]] = {}
+        self.tempos_set: List[float] = []
+        self.simulado_set: List[float] = []
+        super().__init__(*args, **kwargs)
+
+    def _executar_fase(self, fase, acao):
+        inicio = time.perf_counter()
+        try:
+            return super()._executar_fase(fase, acao)
+        finally:
+            self.tempos_fase.setdefault(fase, []).append(time.perf_counter() - inicio)
+
+    def processar_set(self, set_path, index, total):
+        simulado_antes = self.driver.simulado
+        inicio = time.perf_counter()
+        try:
+            return super().processar_set(set_path, index, total)
+        finally:
+            self.tempos_set.append(time.perf_counter() - inicio)
+            self.simulado_set.append(self.driver.simulado - simulado_antes)
+
+
+class _DriverCronometrado(DriverFake):
+    """DriverFake que soma a latência simulada (descontada do overhead)."""
+
+    def __init__(self, *args, **kwargs):
+        self.simulado = 0.0
+        super().__init__(*args, dormir=self._dormir_somando, **kwargs)
+
+    def _dormir_somando(self, segundos: float):
+        self.simulado += segundos
+        time.sleep(segundos)
+
+
+def commit_atual() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def executar_benchmark(jobs: int = 100, escala: float = 0.001, falhas: float = 0.0,
+                       semente: int = 42, verbose: bool = False) -> dict:
+    """Roda `jobs` sets sintéticos pela orquestração e devolve as métricas."""
+    temp = Path(tempfile.mkdtemp(prefix='bench_e2e_'))
+    try:
+        gerar_sets(temp / 'sets', jobs)
+        latencias = {etapa: valor * escala for etapa, valor in LATENCIAS_FAKE.items()}
+        probabilidades = {fase: falhas for fase in ('carregar', 'iniciar', 'exportar')} if falhas else {}
+        driver = _DriverCronometrado(latencias=latencias, falhas=probabilidades, semente=semente)
+
+        # Logs, spans, cache, histórico e delays na pasta temporária: nada é gravado no projeto
+        logger.configurar(temp / 'logs')
+        rastreamento.ativar(rastreamento.Rastreador(temp / 'logs'))
+        saida = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(sys.stdout if verbose else saida):
+                auto = _AutomacaoMedida(curvas_folder=temp / 'curvas', driver=driver,
+                                        cache=CacheResultados(temp / 'cache'),  # vazio: todo set roda de fato
+                                        historico=HistoricoExecucoes(temp / 'historico.sqlite'),
+                                        delays=PerfilDelays(caminho=temp / 'delays.json'))
+                auto.sets_folder = temp / 'sets'
+                for orc in auto.orcamento_fases.values():
+                    orc['backoff'] = 0.0
+                inicio = time.perf_counter()
+                auto.executar_automacao_completa(retomar=False, interativo=False)
+                duracao = time.perf_counter() - inicio
+                auto._historico.fechar()
+                auto._cache.fechar()
+        finally:
+            logger.parar()
+            rastreamento.ativar(None)
+
+        overhead = [max(real - simulado, 0.0) for real, simulado in zip(auto.tempos_set, auto.simulado_set)]
+        return {
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'commit': commit_atual(),
+            'host': platform.node(),
+            'python': platform.python_version(),
+            'parametros': {'jobs': jobs, 'escala': escala, 'falhas': falhas, 'semente': semente},
+            'duracao_s': round(duracao, 3),
+            'sets_por_hora': round(len(auto.tempos_set) / duracao * 3600, 1) if duracao else 0.0,
+            'fases_ms': {fase: resumo_ms(tempos) for fase, tempos in sorted(auto.tempos_fase.items())},
+            'set_ms': resumo_ms(auto.tempos_set),
+            'overhead_por_set_ms': {**resumo_ms(overhead),
+                                    'medio': round(sum(overhead) / len(overhead) * 1000, 3) if overhead else 0.0},
+            'retries': auto.estatisticas_retry,
+        }
+    finally:
+        shutil.rmtree(temp, ignore_errors=True)
+
+
+def _valor(dados: dict, caminho: tuple) -> Optional[float]:
+    for chave in caminho:
+        if not isinstance(dados, dict) or chave not in dados:
+            return None
+        dados = dados[chave]
+    return dados
+
+
+def comparar(atual: dict, baseline: dict, tolerancia: float) -> List[str]:
+    """Regressões além da tolerância (fração, ex.: 0.10 = 10%)."""
+    regressoes = []
+    for caminho, maior_melhor in METRICAS_REGRESSAO:
+        novo, antigo = _valor(atual, caminho), _valor(baseline, caminho)
+        if novo is None or not antigo:
+            continue
+        variacao = (novo - antigo) / antigo
+        piorou = -variacao if maior_melhor else variacao
+        if piorou > tolerancia:
+            regressoes.append(f"{'.'.join(caminho)}: {antigo} -> {novo} ({variacao:+.1%})")
+    return regressoes
+
+
+def imprimir(resultado: dict):
+    print(f"📊 {resultado['parametros']['jobs']} sets em {resultado['duracao_s']:.2f}s | "
+          f"{resultado['sets_por_hora']:.0f} sets/hora")
+    print(f"{'fase':<12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    linhas = dict(resultado['fases_ms'], set=resultado['set_ms'], overhead=resultado['overhead_por_set_ms'])
+    for nome, r in linhas.items():
+        print(f"{nome:<12}{r['p50']:>10.2f}{r['p95']:>10.2f}{r['p99']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ponta a ponta da orquestração (driver fake)")
+    parser.add_argument('--jobs', type=int, default=100, help="número de sets sintéticos")
+    parser.add_argument('--escala', type=float, default=0.001,
+                        help="fator sobre as latências do DriverFake (0 = só overhead)")
+    parser.add_argument('--falhas', type=float, default=0.0, help="probabilidade de falha por fase")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', type=Path, default=SAIDA_PADRAO)
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PADRAO)
+    parser.add_argument('--tolerancia', type=float, default=0.10, help="piora aceita (fração)")
+    parser.add_argument('--salvar-baseline', action='store_true')
+    parser.add_argument('--verbose', action='store_true', help="mostra a saída da automação")
+    args = parser.parse_args()
+
+    resultado = executar_benchmark(args.jobs, args.escala, args.falhas, args.semente, args.verbose)
+    imprimir(resultado)
+
+    args.saida.parent.mkdir(parents=True, exist_ok=True)
+    args.saida.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding='utf-8')
+    print(f"💾 Resultado: {args.saida}")
+
+    if args.salvar_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(args.saida, args.baseline)
+        print(f"📌 Baseline atualizado: {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print("⚠️ Sem baseline para comparar - use --salvar-baseline")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text(encoding='utf-8'))
+    if baseline.get('parametros') != resultado['parametros']:
+        print(f"⚠️ Parâmetros diferentes do baseline ({baseline.get('parametros')}) - comparação aproximada")
+    regressoes = comparar(resultado, baseline, args.tolerancia)
+    if regressoes:
+        print(f"❌ Regressão além de {args.tolerancia:.0%} (baseline {baseline.get('commit')}):")
+        for r in regressoes:
+            print(f"   - {r}")
+        return 1
+    print(f"✅ Dentro da tolerância de {args.tolerancia:.0%} frente ao baseline {baseline.get('commit')}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,321 @@
+# -*- coding: utf-8 -*-
+"""Micro-benchmarks das funções quentes, guardados por commit.
+
+Casos:
+- INIGenerator.build / build_many (100 INIs gravados) / extract_symbol_period (template típico);
+- parse_oos_from_html em relatórios sintéticos de 10 KB a 50 MB;
+- parse_oos_from_text (texto com centenas de ranges);
+- BacktestMonitor.poll contra uma tabela sintética de processos/conexões
+  (psutil substituído: mede só o custo da varredura, sem o sleep do cpu_percent);
+- MT5Automacao._encontrar_janela_mt5 contra uma lista fictícia de janelas
+  (registro válido e varredura completa).
+
+Cada execução grava benchmarks/micro/<commit>.json e compara com a execução
+anterior mais recente; variações acima da tolerância são destacadas.
+
+Uso:
+    python benchmark_micro.py                  # todos os casos
+    python benchmark_micro.py --rapido         # sem os relatórios de 10/50 MB
+    python benchmark_micro.py --filtro parse --falhar
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, ContextManager, Dict, List, Optional
+from unittest import mock
+
+import backtest_core
+from backtest_core import BacktestMonitor, INIGenerator, JobINI
+from benchmark_e2e import PASTA_BENCHMARKS, commit_atual
+from extracao_oos import parse_oos_from_html, parse_oos_from_text
+from janelas_mt5 import RegistroJanelasMT5
+from perfilamento import percentil
+
+PASTA_MICRO = PASTA_BENCHMARKS / 'micro'
+
+TEMPLATE_INI = """[Common]
+Login=12656329
+ProxyEnable=0
+CertInstall=0
+NewsEnable=0
+
+[Tester]
+Expert=DQ_SDK_v2.6.ex5
+Symbol=WIN$N
+Period=M5
+Optimization=0
+Model=1
+FromDate=2023.01.01
+ToDate=2023.06.30
+ForwardMode=0
+Deposit=400000
+Currency=BRL
+ProfitInPips=0
+Leverage=100
+ExecutionMode=0
+OptimizationCriterion=4
+Visual=0
+ShutdownTerminal=1
+"""
+
+TAMANHOS_HTML = {'10KB': 10 * 1024, '1MB': 1024 ** 2, '10MB': 10 * 1024 ** 2, '50MB': 50 * 1024 ** 2}
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Dados sintéticos
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def gerar_relatorio_wfa(tamanho: int) -> str:
+    """HTML com a tabela de steps (Step | IS | OOS) diluída entre linhas de negócios."""
+    partes = ["<html><body><table>"]
+    total, i = 0, 0
+    while total < tamanho:
+        if i % 50 == 0:
+            ano = 2000 + (i // 50) % 25
+            mes = 1 + (i // 50) % 12
+            linha = (f"<tr><td>{i // 50 + 1}</td><td>01/{mes:02d}/{ano} - 28/{mes:02d}/{ano + 1}</td>"
+                     f"<td>01/{mes:02d}/{ano + 1} - 28/{mes:02d}/{ano + 2}</td></tr>\n")
+        else:
+            linha = (f"<tr><td>{i}</td><td>2023.03.{1 + i % 28:02d} 10:{i % 60:02d}</td><td>buy</td>"
+                     f"<td>{(i * 37) % 1000 - 500:.2f}</td><td>{400000 + i * 3:.2f}</td></tr>\n")
+        partes.append(linha)
+        total += len(linha)
+        i += 1
+    partes.append("</table></body></html>")
+    return ''.join(partes)
+
+
+def gerar_texto_oos(n: int = 500) -> str:
+    return ', '.join(f"{1 + i % 28:02d}/{1 + i % 12:02d}/{2010 + i % 15} - "
+                     f"{1 + i % 28:02d}/{1 + (i + 6) % 12:02d}/{2011 + i % 15}" for i in range(n))
+
+
+class _ProcFalso:
+    def __init__(self, pid: int, nome: str, cpu: float):
+        self.info = {'pid': pid, 'name': nome, 'cpu_percent': cpu}
+        self._cpu = cpu
+
+    def cpu_percent(self, interval=None):
+        return self._cpu
+
+
+def tabela_processos(n_processos: int = 300, n_metatesters: int = 8) -> List[_ProcFalso]:
+    procs = [_ProcFalso(1000 + i, f"processo_{i}.exe", 0.5) for i in range(n_processos)]
+    procs += [_ProcFalso(5000 + i, 'metatester64.exe', 95.0) for i in range(n_metatesters)]
+    return procs
+
+
+def tabela_conexoes(n: int = 500, porta: int = 3000) -> list:
+    conexoes = []
+    for i in range(n):
+        laddr = SimpleNamespace(ip='127.0.0.1', port=porta if i == n - 1 else 40000 + i)
+        raddr = SimpleNamespace(ip='127.0.0.1', port=50000 + i)
+        conexoes.append(SimpleNamespace(laddr=laddr, raddr=raddr, status='ESTABLISHED', pid=5000))
+    return conexoes
+
+
+def janelas_fake(n: int = 200) -> list:
+    janelas = [SimpleNamespace(title=f"Janela {i} - Editor", _hWnd=None, left=0, top=0, width=800, height=600)
+               for i in range(n - 1)]
+    janelas.append(SimpleNamespace(title="12656329 - XPMT5-PRD - Netting - XP Investimentos", _hWnd=None,
+                                   left=0, top=0, width=1920, height=1080))
+    return janelas
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Medição
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def medir(funcao: Callable[[], object], repeticoes: int = 5, alvo_s: float = 0.05) -> Dict[str, float]:
+    """Tempo por chamada (µs): calibra o nº de chamadas por repetição para ~alvo_s."""
+    inicio = time.perf_counter()
+    funcao()
+    unitario = time.perf_counter() - inicio
+    chamadas = max(1, int(alvo_s / unitario)) if unitario > 0 else 1000
+    amostras = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        for _ in range(chamadas):
+            funcao()
+        amostras.append((time.perf_counter() - inicio) / chamadas)
+    return {
+        'mediana_us': round(percentil(amostras, 50) * 1e6, 3),
+        'min_us': round(min(amostras) * 1e6, 3),
+        'chamadas': chamadas,
+        'repeticoes': repeticoes,
+    }
+
+
+def casos(rapido: bool = False) -> Dict[str, Callable[[], ContextManager[Callable[[], object]]]]:
+    """Nome -> preparação (context manager que entrega a função medida; fora da medição)."""
+
+    @contextmanager
+    def _gerador():
+        with tempfile.TemporaryDirectory(prefix='bench_micro_') as temp:
+            template = Path(temp) / 'template.ini'
+            template.write_text(TEMPLATE_INI, encoding='utf-16')
+            yield INIGenerator(template, Path(temp) / 'reports')
+
+    @contextmanager
+    def _ini_build():
+        with _gerador() as gen:
+            yield lambda: gen.build('2023.01.01', '2023.06.30', '01012023', '30062023')
+
+    @contextmanager
+    def _ini_build_many():
+        with _gerador() as gen:
+            jobs = [JobINI('2023.01.01', '2023.06.30', f'{i:03d}', '30062023', tester={'Deposit': str(1000 + i)})
+                    for i in range(100)]
+            pasta = gen.reports_dir.parent / 'ini'
+            yield lambda: gen.build_many(jobs, pasta)
+
+    @contextmanager
+    def _ini_symbol():
+        with _gerador() as gen:
+            yield gen.extract_symbol_period
+
+    def _html(tamanho):
+        @contextmanager
+        def preparar():
+            html = gerar_relatorio_wfa(tamanho)
+            yield lambda: parse_oos_from_html(html)
+        return preparar
+
+    @contextmanager
+    def _texto():
+        texto = gerar_texto_oos()
+        yield lambda: parse_oos_from_text(texto)
+
+    @contextmanager
+    def _poll():
+        processos, conexoes = tabela_processos(), tabela_conexoes()
+        monitor = BacktestMonitor(poll_interval=0.0, verbose=False)
+
+        def poll():
+            monitor.start()
+            monitor.poll()  # WAITING -> RUNNING (conexão na porta)
+            monitor.poll()  # RUNNING: CPU alta
+        with mock.patch.object(backtest_core.psutil, 'process_iter', lambda *a, **k: iter(processos)), \
+                mock.patch.object(backtest_core.psutil, 'net_connections', lambda *a, **k: conexoes):
+            yield poll
+
+    def _janela(valida: bool):
+        @contextmanager
+        def preparar():
+            from automacao import MT5Automacao
+            lista = janelas_fake()
+            auto = MT5Automacao.__new__(MT5Automacao)
+            auto.terminal_pid = None
+            auto._janelas = RegistroJanelasMT5(listar_janelas=lambda: lista)
+            if valida:
+                yield auto._encontrar_janela_mt5
+                return
+
+            def varredura():
+                auto._janelas.invalidar()
+                return auto._encontrar_janela_mt5()
+            yield varredura
+        return preparar
+
+    todos = {
+        'ini_build': _ini_build,
+        'ini_build_many_100': _ini_build_many,
+        'ini_extract_symbol_period': _ini_symbol,
+        'parse_oos_text_500': _texto,
+        'monitor_poll_300proc_500conn': _poll,
+        'encontrar_janela_registro': _janela(True),
+        'encontrar_janela_varredura_200': _janela(False),
+    }
+    for rotulo, tamanho in TAMANHOS_HTML.items():
+        if rapido and tamanho > TAMANHOS_HTML['1MB']:
+            continue
+        todos[f'parse_oos_html_{rotulo}'] = _html(tamanho)
+    return todos
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Persistência e comparação
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def identificador_commit() -> str:
+    """Hash curto do HEAD (+ '-dirty' com alterações locais)."""
+    commit = commit_atual() or 'sem-git'
+    try:
+        sujo = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=PASTA_BENCHMARKS.parent,
+                              capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        sujo = ''
+    return f"{commit}-dirty" if sujo else commit
+
+
+def anterior(pasta: Path, atual: str) -> Optional[dict]:
+    """Execução mais recente gravada para outro commit."""
+    resultados = []
+    for arquivo in pasta.glob('*.json'):
+        if arquivo.stem == atual:
+            continue
+        try:
+            resultados.append(json.loads(arquivo.read_text(encoding='utf-8')))
+        except (OSError, ValueError):
+            continue
+    return max(resultados, key=lambda r: r.get('data', ''), default=None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks das funções quentes")
+    parser.add_argument('--rapido', action='store_true', help="pula os relatórios HTML de 10/50 MB")
+    parser.add_argument('--filtro', default='', help="só casos cujo nome contém o texto")
+    parser.add_argument('--repeticoes', type=int, default=5)
+    parser.add_argument('--tolerancia', type=float, default=0.20, help="variação destacada (fração)")
+    parser.add_argument('--falhar', action='store_true', help="código 1 se algum caso piorar além da tolerância")
+    parser.add_argument('--pasta', type=Path, default=PASTA_MICRO)
+    args = parser.parse_args()
+
+    commit = identificador_commit()
+    resultados = {}
+    for nome, preparar in casos(args.rapido).items():
+        if args.filtro not in nome:
+            continue
+        with preparar() as funcao:
+            resultados[nome] = medir(funcao, args.repeticoes)
+        print(f"⏱️ {nome:<34}{resultados[nome]['mediana_us']:>14.2f} µs")
+
+    args.pasta.mkdir(parents=True, exist_ok=True)
+    destino = args.pasta / f"{commit}.json"
+    base = anterior(args.pasta, commit)
+    destino.write_text(json.dumps({
+        'commit': commit,
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'host': platform.node(),
+        'python': platform.python_version(),
+        'casos': resultados,
+    }, indent=2, ensure_ascii=False), encoding='utf-8')
+    print(f"💾 {destino}")
+
+    if base is None:
+        return 0
+    print(f"\n📊 Comparação com {base['commit']} ({base.get('data')}):")
+    regressoes = 0
+    for nome, r in resultados.items():
+        antes = base.get('casos', {}).get(nome)
+        if not antes or not antes.get('mediana_us'):
+            continue
+        variacao = (r['mediana_us'] - antes['mediana_us']) / antes['mediana_us']
+        marca = '⚠️' if variacao > args.tolerancia else ('🚀' if variacao < -args.tolerancia else '  ')
+        regressoes += variacao > args.tolerancia
+        print(f"{marca} {nome:<34}{antes['mediana_us']:>12.2f} -> {r['mediana_us']:>12.2f} µs ({variacao:+.1%})")
+    return 1 if args.falhar and regressoes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
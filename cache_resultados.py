@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+"""Cache de resultados endereçado por conteúdo (evita repetir backtests idênticos).
+
+A chave é um SHA-256 sobre tudo que determina o resultado de um backtest:
+
+- bytes do arquivo .set;
+- configurações efetivas da seção [Tester] (sem caminhos de relatório/set,
+  que mudam a cada execução sem alterar o resultado);
+- binário .ex5 do EA (`ea_name`), localizado em MQL5/Experts; se não for
+  encontrado, apenas o nome entra na chave (recompilações não invalidam);
+- símbolo, período, modelo e intervalo de datas.
+
+Estrutura em disco:
+
+    cache_resultados/
+      indice.sqlite               # chave, tamanho, último acesso, fixado
+      ab/abcdef.../resultado.csv
+      ab/abcdef.../relatorio.html
+
+O tamanho total respeita um orçamento (`[Cache] limite_mb`) com despejo LRU;
+entradas fixadas nunca são despejadas.
+"""
+from __future__ import annotations
+
+import configparser
+import hashlib
+import os
+import shutil
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# Chaves do [Tester] que não afetam o resultado (caminhos de saída/controle)
+CHAVES_IGNORADAS = {'report', 'replacereport', 'shutdownterminal', 'set', 'visual'}
+
+ARQUIVOS = {'csv': 'resultado.csv', 'relatorio': 'relatorio.html'}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entradas (
+    chave TEXT PRIMARY KEY,
+    tamanho INTEGER NOT NULL,
+    criado REAL NOT NULL,
+    ultimo_acesso REAL NOT NULL,
+    fixado INTEGER NOT NULL DEFAULT 0,
+    descricao TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_entradas_lru ON entradas (fixado, ultimo_acesso);
+"""
+
+
+def tester_de_ini(conteudo: str) -> Dict[str, str]:
+    """Seção [Tester] de um INI do MT5 como dicionário (chaves em minúsculas)."""
+    cfg = configparser.ConfigParser(strict=False, interpolation=None)
+    cfg.read_string(conteudo)
+    return dict(cfg['Tester']) if cfg.has_section('Tester') else {}
+
+
+def localizar_ea(mt5_path: str | Path, ea_name: str) -> Optional[Path]:
+    """Procura o .ex5 em <mt5_path>/MQL5/Experts e nas pastas de dados do terminal."""
+    if not ea_name:
+        return None
+    relativo = Path(ea_name.replace('\\', '/'))
+    if relativo.suffix.lower() != '.ex5':
+        relativo = relativo.with_suffix('.ex5')
+    candidatos = [Path(mt5_path) / 'MQL5' / 'Experts' / relativo]
+    appdata = os.environ.get('APPDATA')
+    if appdata:
+        candidatos += sorted((Path(appdata) / 'MetaQuotes' / 'Terminal').glob(f'*/MQL5/Experts/{relativo.as_posix()}'))
+    for caminho in candidatos:
+        if caminho.is_file():
+            return caminho
+    return None
+
+
+def _hash_arquivo(caminho: Path) -> str:
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def chave_backtest(set_path: Path, tester: Mapping[str, str], ea: Optional[Path], ea_name: str = '',
+                   de: str = '', ate: str = '') -> str:
+    """Chave SHA-256 do backtest. `de`/`ate` sobrepõem FromDate/ToDate do [Tester]."""
+    tester = {k.lower(): str(v).strip() for k, v in tester.items() if k.lower() not in CHAVES_IGNORADAS}
+    h = hashlib.sha256()
+    h.update(b'set\0' + Path(set_path).read_bytes())
+    h.update(b'ea\0' + (_hash_arquivo(ea) if ea else f'nome:{ea_name or tester.get("expert", "")}').encode())
+    for campo in ('symbol', 'period', 'model'):
+        h.update(f'{campo}\0{tester.get(campo, "")}\n'.encode())
+    h.update(f'datas\0{de or tester.get("fromdate", "")}\0{ate or tester.get("todate", "")}\n'.encode())
+    for k in sorted(tester):
+        h.update(f'{k}={tester[k]}\n'.encode())
+    return h.hexdigest()
+
+
+class CacheResultados:
+    """Armazena CSV/relatório por chave de conteúdo com orçamento de disco LRU."""
+
+    def __init__(self, pasta: Path = None, limite_mb: float = 2048):
+        self.pasta = Path(pasta) if pasta else BASE_DIR / 'cache_resultados'
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        self.limite_bytes = int(limite_mb * 1024 * 1024)
+        self._con = sqlite3.connect(str(self.pasta / 'indice.sqlite'), timeout=30, isolation_level=None)
+        self._con.execute('PRAGMA journal_mode=WAL')
+        self._con.executescript(_SCHEMA)
+        self._hash_ea: Dict[Tuple[str, int, float], str] = {}
+        self.acertos = 0
+        self.faltas = 0
+
+    @classmethod
+    def do_config(cls, config: configparser.ConfigParser) -> Optional['CacheResultados']:
+        """Instancia a partir de [Cache] (habilitado, pasta, limite_mb); None se desabilitado."""
+        secao = config['Cache'] if config.has_section('Cache') else {}
+        if config.has_section('Cache') and not secao.getboolean('habilitado', fallback=True):
+            return None
+        pasta = secao.get('pasta') or None
+        limite = float(secao.get('limite_mb', 2048))
+        return cls(Path(pasta) if pasta else None, limite)
+
+    def fechar(self):
+        self._con.close()
+
+    def _dir(self, chave: str) -> Path:
+        return self.pasta / chave[:2] / chave
+
+    # ------------------------------- Consulta ------------------------------ #
+    def obter(self, chave: str) -> Optional[Dict[str, Path]]:
+        """Arquivos da entrada ({'csv': ..., 'relatorio': ...}) e marca o acesso (LRU)."""
+        if self._con.execute('SELECT 1 FROM entradas WHERE chave = ?', (chave,)).fetchone() is None:
+            self.faltas += 1
+            return None
+        pasta = self._dir(chave)
+        arquivos = {tipo: pasta / nome for tipo, nome in ARQUIVOS.items() if (pasta / nome).exists()}
+        if 'csv' not in arquivos:
+            # Entrada corrompida (arquivos apagados à mão)
+            self.remover(chave)
+            self.faltas += 1
+            return None
+        self._con.execute('UPDATE entradas SET ultimo_acesso = ? WHERE chave = ?', (time.time(), chave))
+        self.acertos += 1
+        return arquivos
+
+    def restaurar(self, chave: str, destino_csv: Path, destino_relatorio: Path = None) -> bool:
+        """Copia o resultado em cache para os destinos. False se não houver entrada."""
+        arquivos = self.obter(chave)
+        if arquivos is None:
+            return False
+        Path(destino_csv).parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(arquivos['csv'], destino_csv)
+        if destino_relatorio and 'relatorio' in arquivos:
+            Path(destino_relatorio).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(arquivos['relatorio'], destino_relatorio)
+        return True
+
+    # ----------------------------- Armazenamento --------------------------- #
+    def armazenar(self, chave: str, csv: Path, relatorio: Path = None, descricao: str = '') -> bool:
+        """Guarda o resultado e aplica o orçamento de disco. False se o CSV não existe."""
+        if not csv or not Path(csv).exists():
+            return False
+        pasta = self._dir(chave)
+        pasta.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(csv, pasta / ARQUIVOS['csv'])
+        if relatorio and Path(relatorio).exists():
+            shutil.copyfile(relatorio, pasta / ARQUIVOS['relatorio'])
+        tamanho = sum(p.stat().st_size for p in pasta.iterdir() if p.is_file())
+        agora = time.time()
+        self._con.execute(
+            'INSERT INTO entradas (chave, tamanho, criado, ultimo_acesso, descricao) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT(chave) DO UPDATE SET tamanho = excluded.tamanho, ultimo_acesso = excluded.ultimo_acesso',
+            (chave, tamanho, agora, agora, descricao))
+        self.despejar()
+        return True
+
+    def remover(self, chave: str):
+        shutil.rmtree(self._dir(chave), ignore_errors=True)
+        self._con.execute('DELETE FROM entradas WHERE chave = ?', (chave,))
+
+    def fixar(self, chave: str, fixado: bool = True) -> bool:
+        """Fixa (ou libera) uma entrada: entradas fixadas não são despejadas."""
+        cur = self._con.execute('UPDATE entradas SET fixado = ? WHERE chave = ?', (int(fixado), chave))
+        return cur.rowcount > 0
+
+    def tamanho_total(self) -> int:
+        return self._con.execute('SELECT COALESCE(SUM(tamanho), 0) FROM entradas').fetchone()[0]
+
+    def despejar(self) -> List[str]:
+        """Remove entradas não fixadas menos usadas até caber no orçamento."""
+        excesso = self.tamanho_total() - self.limite_bytes
+        removidas = []
+        if excesso <= 0:
+            return removidas
+        for chave, tamanho in self._con.execute(
+                'SELECT chave, tamanho FROM entradas WHERE fixado = 0 ORDER BY ultimo_acesso').fetchall():
+            if excesso <= 0:
+                break
+            self.remover(chave)
+            removidas.append(chave)
+            excesso -= tamanho
+        return removidas
+
+    def entradas(self) -> Iterable[Tuple[str, int, float, int, str]]:
+        return self._con.execute(
+            'SELECT chave, tamanho, ultimo_acesso, fixado, descricao FROM entradas ORDER BY ultimo_acesso DESC')
+
+    # --------------------------------- Chave -------------------------------- #
+    def chave(self, set_path: Path, tester: Mapping[str, str], ea: Optional[Path], ea_name: str = '',
+              de: str = '', ate: str = '') -> str:
+        """Como `chave_backtest`, mas com o hash do .ex5 memorizado por (caminho, tamanho, mtime)."""
+        if ea is not None:
+            st = ea.stat()
+            ident = (str(ea), st.st_size, st.st_mtime)
+            if ident not in self._hash_ea:
+                self._hash_ea = {ident: _hash_arquivo(ea)}
+            ea_name, ea = f'sha256:{self._hash_ea[ident]}', None
+        return chave_backtest(set_path, tester, ea, ea_name, de, ate)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Gerencia o cache de resultados de backtest")
+    parser.add_argument('--fixar', metavar='CHAVE', help="fixa uma entrada (não é despejada)")
+    parser.add_argument('--liberar', metavar='CHAVE', help="remove a fixação de uma entrada")
+    parser.add_argument('--limpar', action='store_true', help="apaga todas as entradas não fixadas")
+    args = parser.parse_args()
+
+    cfg = configparser.ConfigParser()
+    cfg.read(BASE_DIR / 'config.ini', encoding='utf-8')
+    cache = CacheResultados.do_config(cfg) or CacheResultados()
+    if args.fixar:
+        print("📌 Fixada" if cache.fixar(args.fixar) else "❌ Chave não encontrada")
+    elif args.liberar:
+        print("✅ Liberada" if cache.fixar(args.liberar, False) else "❌ Chave não encontrada")
+    elif args.limpar:
+        limite, cache.limite_bytes = cache.limite_bytes, 0
+        print(f"🧹 {len(cache.despejar())} entradas removidas")
+        cache.limite_bytes = limite
+    else:
+        for chave, tamanho, acesso, fixado, descricao in cache.entradas():
+            marca = '📌' if fixado else '  '
+            print(f"{marca} {chave[:16]}  {tamanho / 1024:8.1f} KB  "
+                  f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(acesso))}  {descricao}")
+        print(f"💾 Total: {cache.tamanho_total() / 1024 / 1024:.1f} MB / {cache.limite_bytes / 1024 / 1024:.0f} MB")
@@ -2,6 +2,10 @@
 # -*- coding: utf-8 -*-
 """
 CALIBRADOR DE COORDENADAS MT5 - VERSÃO FUNCIONAL
+
+- CalibradorMT5: captura manual (mouse + ENTER)
+- CalibradorAutomatico: localiza os alvos por template matching e grava um
+  perfil por resolução/DPI em coordenadas.json ("perfis")
 """
 
 import pyautogui
@@ -9,7 +13,24 @@ import json
 import time
 from pathlib import Path
 
+from janelas_mt5 import RegistroJanelasMT5, area_cliente, chave_perfil_tela, dpi_sistema
+
 BASE_DIR = Path(__file__).resolve().parent
+COORD_PATH = BASE_DIR / 'coordenadas.json'
+
+
+def ler_coordenadas_arquivo():
+    """Lê coordenadas.json completo (dict vazio se não existir/inválido)"""
+    try:
+        with open(COORD_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def gravar_coordenadas_arquivo(dados):
+    with open(COORD_PATH, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, indent=2)
 
 class CalibradorMT5:
     """Classe para calibração de coordenadas MT5"""
@@ -27,6 +48,14 @@ class CalibradorMT5:
         print("• Pressione ENTER para capturar")
         print("• Digite 's' para pular")
         
+        # Coordenadas relativas à área cliente da janela do MT5 (sobrevivem a mover a janela)
+        registro = RegistroJanelasMT5()
+        origem = registro.origem_cliente()
+        if origem:
+            print(f"🪟 Janela MT5 detectada - origem da área cliente: {origem}")
+        else:
+            print("⚠️ Janela MT5 não detectada - coordenadas serão absolutas")
+        
         # Pontos para calibrar (alinhados com a automação)
         pontos = [
             ('parameters_tab', 'Aba Parâmetros do Strategy Tester'),
@@ -37,7 +66,13 @@ class CalibradorMT5:
             ('graph_tab', 'Aba Gráfico do Strategy Tester'),
             ('graph_area', 'Área do gráfico para clique direito'),
             ('export_csv', 'Opção Exportar CSV no menu'),
-            ('save_button', 'Botão Salvar no diálogo (opcional)')
+            ('save_button', 'Botão Salvar no diálogo (opcional)'),
+            ('settings_tab', 'Aba Configurações do Strategy Tester (opcional: reuso OOS)'),
+            ('tester_data_inicio', 'Campo data inicial da aba Configurações (opcional: reuso OOS)'),
+            ('tester_data_fim', 'Campo data final da aba Configurações (opcional: reuso OOS)'),
+            ('backtest_tab', 'Aba Backtest (resultados) do Strategy Tester (opcional: reuso OOS)'),
+            ('backtest_area', 'Área da aba Backtest para clique direito (opcional: reuso OOS)'),
+            ('salvar_relatorio', "Item que salva o relatório no menu de contexto (opcional: reuso OOS)")
         ]
         
         for nome, desc in pontos:
@@ -55,6 +90,10 @@ class CalibradorMT5:
             
             try:
                 x, y = pyautogui.position()
+                if origem:
+                    # Reler origem: o usuário pode ter movido a janela durante a calibração
+                    origem = registro.origem_cliente() or origem
+                    x, y = x - origem[0], y - origem[1]
                 self.coords[nome] = [x, y]  # Lista para JSON
                 print(f"✅ {nome}: ({x}, {y})")
             except Exception as e:
@@ -62,17 +101,179 @@ class CalibradorMT5:
         
         # Salvar coordenadas
         if self.coords:
+            if origem:
+                self.coords['_referencia'] = 'cliente'
+                self.coords['_dpi_base'] = dpi_sistema()
+            # Preservar perfis da calibração automática
+            perfis = ler_coordenadas_arquivo().get('perfis')
+            if perfis:
+                self.coords['perfis'] = perfis
             try:
-                with open(BASE_DIR / 'coordenadas.json', 'w', encoding='utf-8') as f:
-                    json.dump(self.coords, f, indent=2)
+                gravar_coordenadas_arquivo(self.coords)
                 print(f"\n✅ Calibração concluída!")
                 print(f"📁 Coordenadas salvas: {BASE_DIR / 'coordenadas.json'}")
-                print(f"🎯 Total: {len(self.coords)} pontos")
+                print(f"🎯 Total: {sum(1 for k in self.coords if not k.startswith('_'))} pontos")
             except Exception as e:
                 print(f"❌ Erro ao salvar: {e}")
         else:
             print("⚠️ Nenhuma coordenada foi calibrada")
 
+class CalibradorAutomatico:
+    """Calibração automática por template matching (um perfil por resolução/DPI)
+    
+    Templates dos alvos ficam em templates_ui/alvos/<nome>.png, com um
+    <nome>.json opcional: {"dpi": 96, "clique": [dx, dy], "limiar": 0.85}.
+    Os templates são reescalados para o DPI atual antes da busca.
+    """
+    
+    # Alvos visíveis diretamente na janela
+    ALVOS = ['parameters_tab', 'parameters_area', 'start_button', 'graph_tab', 'graph_area']
+    # Itens de menu de contexto: (área do clique direito, aba a abrir antes)
+    ALVOS_MENU = {
+        'menu_abrir': ('parameters_area', 'parameters_tab'),
+        'export_csv': ('graph_area', 'graph_tab'),
+    }
+    RECORTE = (80, 28)  # largura, altura dos templates capturados
+    
+    def __init__(self, pasta_templates=None):
+        self.pasta = Path(pasta_templates) if pasta_templates else BASE_DIR / 'templates_ui' / 'alvos'
+        self.registro = RegistroJanelasMT5()
+    
+    def _captura_cliente(self):
+        janela = self.registro.janela()
+        if janela is None:
+            raise Exception("❌ Janela do MT5 não encontrada")
+        x, y, w, h = area_cliente(janela)
+        return pyautogui.screenshot(region=(x, y, w, h)), (x, y)
+    
+    def _abrir_contexto(self, coords, area, aba):
+        origem = self.registro.origem_cliente()
+        if aba in coords:
+            pyautogui.click(origem[0] + coords[aba][0], origem[1] + coords[aba][1])
+            time.sleep(1)
+        pyautogui.rightClick(origem[0] + coords[area][0], origem[1] + coords[area][1])
+        time.sleep(0.8)
+    
+    def _template(self, nome, dpi):
+        from PIL import Image
+        from deteccao_ui import TemplateUI
+        png = self.pasta / f"{nome}.png"
+        if not png.exists():
+            return None, (0, 0)
+        meta = {}
+        if png.with_suffix('.json').exists():
+            meta = json.loads(png.with_suffix('.json').read_text(encoding='utf-8'))
+        escala = dpi / float(meta.get('dpi', 96))
+        with Image.open(png) as img:
+            img = img.convert('L')
+            clique = meta.get('clique', [img.width / 2, img.height / 2])
+            if abs(escala - 1.0) > 0.01:
+                img = img.resize((max(1, round(img.width * escala)), max(1, round(img.height * escala))))
+            template = TemplateUI(nome, img, limiar=float(meta.get('limiar', 0.85)))
+        return template, (clique[0] * escala, clique[1] * escala)
+    
+    def _localizar(self, nome, captura, dpi):
+        from deteccao_ui import localizar
+        template, clique = self._template(nome, dpi)
+        if template is None:
+            return None
+        x, y, score = localizar(captura, template)
+        if score < template.limiar:
+            print(f"⚠️ {nome}: não encontrado (score {score:.2f})")
+            return None
+        ponto = [round(x + clique[0]), round(y + clique[1])]
+        print(f"✅ {nome}: {tuple(ponto)} (score {score:.2f})")
+        return ponto
+    
+    def calibrar(self, base=None):
+        """Localiza os alvos e grava o perfil da geometria atual
+        
+        base: coordenadas relativas de referência para alvos não encontrados.
+        Retorna (chave_perfil, coords) ou (chave_perfil, None) se faltarem alvos essenciais.
+        """
+        chave = chave_perfil_tela()
+        dpi = dpi_sistema()
+        print(f"\n🤖 CALIBRAÇÃO AUTOMÁTICA - perfil {chave}")
+        
+        dados = ler_coordenadas_arquivo()
+        if base is None:
+            base = {k: v for k, v in dados.items()
+                    if not k.startswith('_') and k != 'perfis'} if dados.get('_referencia') == 'cliente' else {}
+        coords = {}
+        
+        captura, _ = self._captura_cliente()
+        for nome in self.ALVOS:
+            ponto = self._localizar(nome, captura, dpi)
+            if ponto:
+                coords[nome] = ponto
+        
+        for nome, (area, aba) in self.ALVOS_MENU.items():
+            if area not in coords and area not in base:
+                continue
+            self._abrir_contexto({**base, **coords}, area, aba)
+            try:
+                captura, _ = self._captura_cliente()
+                ponto = self._localizar(nome, captura, dpi)
+                if ponto:
+                    coords[nome] = ponto
+            finally:
+                pyautogui.press('escape')
+                time.sleep(0.3)
+        
+        # Alvos não encontrados: herdar da referência, escalando pelo DPI
+        escala = dpi / float(dados.get('_dpi_base') or dpi)
+        for nome, valor in base.items():
+            if nome not in coords and isinstance(valor, (list, tuple)) and len(valor) >= 2:
+                coords[nome] = [round(valor[0] * escala), round(valor[1] * escala)]
+                print(f"↪️ {nome}: herdado da calibração manual {tuple(coords[nome])}")
+        
+        faltando = [n for n in ('parameters_tab', 'start_button', 'graph_tab') if n not in coords]
+        if faltando:
+            print(f"❌ Alvos essenciais não encontrados: {', '.join(faltando)}")
+            return chave, None
+        
+        dados.setdefault('perfis', {})[chave] = coords
+        gravar_coordenadas_arquivo(dados)
+        print(f"💾 Perfil {chave} salvo ({len(coords)} pontos)")
+        return chave, coords
+    
+    def capturar_templates(self):
+        """Gera templates dos alvos a partir das coordenadas calibradas manualmente"""
+        dados = ler_coordenadas_arquivo()
+        if dados.get('_referencia') != 'cliente':
+            print("❌ Calibre manualmente com a janela do MT5 visível antes de capturar templates")
+            return
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        dpi = dpi_sistema()
+        w, h = self.RECORTE
+        
+        def salvar(nome, captura):
+            x, y = dados[nome]
+            caixa = (max(0, x - w // 2), max(0, y - h // 2))
+            recorte = captura.crop((caixa[0], caixa[1], caixa[0] + w, caixa[1] + h))
+            recorte.save(self.pasta / f"{nome}.png")
+            meta = {'dpi': dpi, 'clique': [x - caixa[0], y - caixa[1]]}
+            (self.pasta / f"{nome}.json").write_text(json.dumps(meta), encoding='utf-8')
+            print(f"📸 Template salvo: {nome}")
+        
+        captura, _ = self._captura_cliente()
+        for nome in self.ALVOS:
+            if nome in dados:
+                salvar(nome, captura)
+        for nome, (area, aba) in self.ALVOS_MENU.items():
+            if nome not in dados or area not in dados:
+                continue
+            self._abrir_contexto(dados, area, aba)
+            try:
+                captura, _ = self._captura_cliente()
+                salvar(nome, captura)
+            finally:
+                pyautogui.press('escape')
+                time.sleep(0.3)
+        dados['_dpi_base'] = dpi
+        gravar_coordenadas_arquivo(dados)
+
+
 class VisualizadorCoordenadas:
     """Classe para mostrar coordenadas salvas"""
     
@@ -84,7 +285,13 @@ class VisualizadorCoordenadas:
 
             print("\n📋 COORDENADAS SALVAS:")
             print("-" * 40)
+            if coords.get('_referencia') == 'cliente':
+                print("(relativas à área cliente da janela do MT5)")
+            for chave in sorted(coords.get('perfis', {})):
+                print(f"🤖 Perfil automático: {chave}")
             for nome, pos in coords.items():
+                if nome.startswith('_') or nome == 'perfis':
+                    continue
                 if isinstance(pos, (list, tuple)) and len(pos) >= 2:
                     print(f"{nome}: ({pos[0]}, {pos[1]})")
                 elif isinstance(pos, dict) and 'x' in pos and 'y' in pos:
@@ -92,7 +299,7 @@ class VisualizadorCoordenadas:
                 else:
                     print(f"{nome}: {pos}")
 
-            print(f"\nTotal: {len(coords)} coordenadas")
+            print(f"\nTotal: {sum(1 for k in coords if not k.startswith('_') and k != 'perfis')} coordenadas")
 
         except FileNotFoundError:
             print("❌ Arquivo coordenadas.json não encontrado")
@@ -104,6 +311,7 @@ class MenuCalibrador:
     
     def __init__(self):
         self.calibrador = CalibradorMT5()
+        self.automatico = CalibradorAutomatico()
         self.visualizador = VisualizadorCoordenadas()
     
     def executar_menu(self):
@@ -119,7 +327,9 @@ class MenuCalibrador:
                 print("="*40)
                 print("1. 🎯 Calibrar Coordenadas")
                 print("2. 📋 Ver Coordenadas")
-                print("3. 🚪 Sair")
+                print("3. 🤖 Calibração Automática (imagem)")
+                print("4. 📸 Capturar Templates dos Alvos")
+                print("5. 🚪 Sair")
                 print("="*40)
                 
                 opcao = input("Opção: ").strip()
@@ -129,6 +339,10 @@ class MenuCalibrador:
                 elif opcao == "2":
                     self.visualizador.mostrar_coordenadas()
                 elif opcao == "3":
+                    self.automatico.calibrar()
+                elif opcao == "4":
+                    self.automatico.capturar_templates()
+                elif opcao == "5":
                     print("👋 Saindo...")
                     break
                 else:
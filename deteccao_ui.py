@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""Detecção de estados da interface do MT5 por template matching (NumPy).
+
+Em vez de dormir e torcer, a automação pode perguntar "o diálogo Salvar Como
+abriu?", "a aba Gráfico carregou?" ou "o tester terminou?" comparando uma
+captura limitada a uma região da janela do terminal com imagens de referência.
+
+Estrutura dos templates (um conjunto por resolução de tela):
+
+    templates_ui/
+      1920x1080/
+        dialogo_salvar.png
+        dialogo_salvar.json   # opcional: {"regiao": [x, y, w, h], "limiar": 0.9}
+        aba_grafico.png
+        tester_concluido.png
+
+`regiao` é relativa à área cliente da janela (mesma referência das
+coordenadas). Sem `regiao`, a tela inteira é capturada (mais lento).
+
+O casamento usa correlação cruzada normalizada (NCC) via FFT com somas
+locais por imagem integral; a FFT do template é cacheada por tamanho da
+região, então cada verificação custa uma FFT da captura (poucos ms para
+regiões de algumas centenas de pixels, adequado para polling a 10 Hz).
+"""
+from __future__ import annotations
+
+import json
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+def _para_cinza(imagem) -> np.ndarray:
+    """Converte PIL.Image ou array (H, W[, C]) para float32 em tons de cinza."""
+    if not isinstance(imagem, np.ndarray):
+        imagem = np.asarray(imagem.convert('L'))
+    arr = imagem.astype(np.float32, copy=False)
+    if arr.ndim == 3:
+        arr = arr[..., :3] @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    return arr
+
+
+def _somas_janela(integral: np.ndarray, h: int, w: int) -> np.ndarray:
+    return integral[h:, w:] - integral[:-h, w:] - integral[h:, :-w] + integral[:-h, :-w]
+
+
+@dataclass
+class TemplateUI:
+    """Imagem de referência de um estado da UI."""
+    nome: str
+    imagem: np.ndarray
+    regiao: Optional[Tuple[int, int, int, int]] = None
+    limiar: float = 0.9
+    _t0: np.ndarray = field(init=False, repr=False)
+    _norma: float = field(init=False, repr=False)
+    _fft_cache: Dict[Tuple[int, int], np.ndarray] = field(init=False, repr=False, default_factory=dict)
+
+    def __post_init__(self):
+        self.imagem = _para_cinza(self.imagem)
+        self._t0 = self.imagem - self.imagem.mean()
+        self._norma = float(np.sqrt((self._t0 ** 2).sum()))
+
+    def fft(self, forma: Tuple[int, int]) -> np.ndarray:
+        """FFT conjugada do template centrado, cacheada por tamanho de captura."""
+        cache = self._fft_cache.get(forma)
+        if cache is None:
+            cache = np.conj(np.fft.rfft2(self._t0, s=forma))
+            self._fft_cache[forma] = cache
+        return cache
+
+
+def localizar(imagem, template) -> Tuple[int, int, float]:
+    """Melhor posição (x, y) do template na imagem e o score NCC em [-1, 1].
+
+    `imagem` e `template` podem ser arrays NumPy (sintéticos) ou PIL.Image.
+    """
+    if not isinstance(template, TemplateUI):
+        template = TemplateUI('anonimo', template)
+    img = _para_cinza(imagem)
+    h, w = template.imagem.shape
+    H, W = img.shape
+    if h > H or w > W or template._norma == 0:
+        return 0, 0, 0.0
+
+    # Numerador: correlação da imagem com o template centrado (FFT circular; região válida sem wrap)
+    corr = np.fft.irfft2(np.fft.rfft2(img) * template.fft((H, W)), s=(H, W))
+    corr = corr[:H - h + 1, :W - w + 1]
+
+    # Denominador: desvio local da imagem via imagens integrais
+    integral = np.zeros((H + 1, W + 1), dtype=np.float64)
+    integral[1:, 1:] = img.cumsum(0).cumsum(1)
+    integral2 = np.zeros((H + 1, W + 1), dtype=np.float64)
+    integral2[1:, 1:] = (img.astype(np.float64) ** 2).cumsum(0).cumsum(1)
+    n = h * w
+    soma = _somas_janela(integral, h, w)
+    soma2 = _somas_janela(integral2, h, w)
+    var = np.maximum(soma2 - soma * soma / n, 0.0)
+    denom = np.sqrt(var) * template._norma
+
+    ncc = np.where(denom > 1e-6, corr / np.maximum(denom, 1e-6), 0.0)
+    idx = int(np.argmax(ncc))
+    y, x = divmod(idx, ncc.shape[1])
+    return x, y, float(ncc[y, x])
+
+
+class DetectorEstadoUI:
+    """Detecta estados conhecidos da UI a partir de capturas da janela do terminal."""
+
+    def __init__(self, pasta_templates: Path = None,
+                 origem: Callable[[], Optional[Tuple[int, int]]] = None,
+                 capturar: Callable[[Optional[Tuple[int, int, int, int]]], object] = None,
+                 resolucao: Callable[[], str] = None):
+        self.pasta_templates = Path(pasta_templates) if pasta_templates else BASE_DIR / 'templates_ui'
+        self._origem = origem or (lambda: (0, 0))
+        self._capturar = capturar or self._capturar_tela
+        self._resolucao = resolucao or self._resolucao_tela
+        self._cache: Dict[str, Dict[str, TemplateUI]] = {}
+
+    # ------------------------------ Captura ------------------------------ #
+    @staticmethod
+    def _capturar_tela(regiao):
+        import pyautogui
+        return pyautogui.screenshot(region=regiao) if regiao else pyautogui.screenshot()
+
+    @staticmethod
+    def _resolucao_tela() -> str:
+        import pyautogui
+        w, h = pyautogui.size()
+        return f"{w}x{h}"
+
+    # ------------------------------ Templates ---------------------------- #
+    def templates(self, resolucao: str = None) -> Dict[str, TemplateUI]:
+        """Templates da resolução (carregados do disco uma vez e cacheados)."""
+        resolucao = resolucao or self._resolucao()
+        cache = self._cache.get(resolucao)
+        if cache is not None:
+            return cache
+        cache = {}
+        pasta = self.pasta_templates / resolucao
+        if pasta.is_dir():
+            from PIL import Image
+            for png in sorted(pasta.glob('*.png')):
+                meta = {}
+                meta_path = png.with_suffix('.json')
+                if meta_path.exists():
+                    try:
+                        meta = json.loads(meta_path.read_text(encoding='utf-8'))
+                    except Exception:
+                        meta = {}
+                with Image.open(png) as img:
+                    cache[png.stem] = TemplateUI(
+                        png.stem, np.asarray(img.convert('L')),
+                        tuple(meta['regiao']) if meta.get('regiao') else None,
+                        float(meta.get('limiar', 0.9)),
+                    )
+        self._cache[resolucao] = cache
+        return cache
+
+    def registrar(self, template: TemplateUI, resolucao: str = None):
+        """Adiciona template em memória (ex.: imagens sintéticas)."""
+        self.templates(resolucao)[template.nome] = template
+
+    def conhece(self, estado: str) -> bool:
+        try:
+            return estado in self.templates()
+        except Exception:
+            return False
+
+    # ------------------------------ Detecção ----------------------------- #
+    def detectar(self, estado: str, imagem=None) -> Optional[Tuple[int, int, float]]:
+        """Retorna (x, y, score) em coordenadas relativas à área cliente, ou None."""
+        template = self.templates().get(estado)
+        if template is None:
+            return None
+        ox, oy = 0, 0
+        if imagem is None:
+            origem = self._origem() or (0, 0)
+            regiao = None
+            if template.regiao:
+                rx, ry, rw, rh = template.regiao
+                regiao = (origem[0] + rx, origem[1] + ry, rw, rh)
+                ox, oy = rx, ry
+            else:
+                ox, oy = -origem[0], -origem[1]
+            imagem = self._capturar(regiao)
+        x, y, score = localizar(imagem, template)
+        if score < template.limiar:
+            return None
+        return ox + x, oy + y, score
+
+    def estado_atual(self, *estados: str) -> Optional[str]:
+        """Primeiro estado (na ordem dada) detectado na tela."""
+        for estado in estados:
+            if self.detectar(estado) is not None:
+                return estado
+        return None
+
+    def aguardar(self, estado: str, timeout: float = 5.0, intervalo: float = 0.1) -> bool:
+        """Faz polling até o estado aparecer ou o timeout expirar."""
+        limite = time.time() + timeout
+        while True:
+            if self.detectar(estado) is not None:
+                return True
+            if time.time() >= limite:
+                return False
+            time.sleep(intervalo)
@@ -0,0 +1,549 @@
+# -*- coding: utf-8 -*-
+"""Drivers do MT5: a orquestração (fila, cache, retry, ordenação) conversa com
+o terminal só através de `MT5Driver`.
+
+| Driver      | Uso                                                              |
+|-------------|------------------------------------------------------------------|
+| DriverGUI   | comportamento atual: pyautogui/pyperclip no terminal aberto      |
+| DriverINI   | headless: `terminal64.exe /config:` com ShutdownTerminal=1       |
+| DriverFake  | em processo: latências e taxas de falha simuladas (roda no Linux)|
+
+Contrato: cada fase retorna True/False e, em falha, deixa a causa em
+`driver.causa` (mesmas causas de `classificar_causa`); `MT5Automacao`
+converte em FalhaFase e aplica o orçamento de retry da fase.
+
+Drivers com `terminal_interativo` (GUI e fake) também atendem o fluxo OOS com
+terminal aberto (serial, pipeline e reuso): `lancar`, `aguardar_processo`,
+`usar_terminal`, `aplicar_datas`, `datas_executadas` e `salvar_relatorio`.
+"""
+from __future__ import annotations
+
+import os
+import random
+import re
+import shutil
+import subprocess
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from arquivos_set import decodificar, tester_inputs
+from cache_resultados import tester_de_ini
+
+SW_SHOWMINNOACTIVE = 7
+
+# Linha do diário do tester: "testing of Experts\EA.ex5 from 2023.01.02 00:00 to 2023.06.30 00:00 started"
+LOG_DATAS_REGEX = re.compile(r"from (\d{4}\.\d{2}\.\d{2}) \d{2}:\d{2} to (\d{4}\.\d{2}\.\d{2})")
+
+# Grafia das chaves da seção [Tester] como o MT5 as documenta (configparser devolve minúsculas)
+CHAVES_TESTER = (
+    'Expert', 'ExpertParameters', 'Symbol', 'Period', 'Login', 'Model', 'ExecutionMode', 'Optimization',
+    'OptimizationCriterion', 'FromDate', 'ToDate', 'ForwardMode', 'ForwardDate', 'Report', 'ReplaceReport',
+    'ShutdownTerminal', 'Deposit', 'Currency', 'Leverage', 'ProfitInPips', 'UseLocal', 'UseRemote',
+    'UseCloud', 'Visual', 'Port', 'Dates',
+)
+_GRAFIA_TESTER = {chave.lower(): chave for chave in CHAVES_TESTER}
+
+
+def grafia_mt5(chave: str) -> str:
+    """Nome da chave do [Tester] com a grafia do MT5 (desconhecidas ficam como estão)."""
+    return _GRAFIA_TESTER.get(chave.lower(), chave)
+
+
+def data_mt5(data_br: str) -> str:
+    """dd/mm/aaaa -> aaaa.mm.dd (formato do diário do tester)."""
+    dia, mes, ano = data_br.split('/')
+    return f"{ano}.{mes}.{dia}"
+
+
+def diretorio_dados(mt5_path: str | Path) -> Optional[Path]:
+    """Diretório de dados do terminal (instalação portátil ou AppData/MetaQuotes/Terminal/<id>)"""
+    instalacao = Path(mt5_path)
+    if (instalacao / 'MQL5').is_dir():
+        return instalacao
+    appdata = os.environ.get('APPDATA')
+    if not appdata:
+        return None
+    alvo = str(instalacao).rstrip('\\/').lower()
+    for origin in (Path(appdata) / 'MetaQuotes' / 'Terminal').glob('*/origin.txt'):
+        try:
+            dados = origin.read_bytes()
+            texto = dados.decode('utf-16') if dados.startswith(b'\xff\xfe') else dados.decode('utf-8', 'ignore')
+        except Exception:
+            continue
+        if texto.strip().rstrip('\\/').lower() == alvo:
+            return origin.parent
+    return None
+
+
+class MT5Driver(ABC):
+    """Interface mínima entre a orquestração e um backend de backtest."""
+
+    nome = 'base'
+    usa_gui = False
+    extensao_saida = '.csv'
+    # True se o backtest roda com a seção [Tester] do config.ini (condição para o cache de resultados)
+    aplica_tester = True
+    # True se o terminal fica aberto entre fases (fluxo OOS serial/pipeline/reuso)
+    terminal_interativo = False
+
+    def __init__(self):
+        self.causa: Optional[str] = None
+        # Segundos entre o início e o tester começar de fato (None se desconhecido)
+        self.startup_time: Optional[float] = None
+
+    def abrir(self, ini_path: Path = None) -> bool:
+        """Garante um terminal pronto (opcionalmente a partir de um INI)."""
+        return True
+
+    @abstractmethod
+    def carregar(self, set_path: Path) -> bool:
+        ...
+
+    @abstractmethod
+    def iniciar(self) -> bool:
+        ...
+
+    @abstractmethod
+    def aguardar(self, nome: str, timeout: float) -> bool:
+        """True se o término foi detectado; timeout não é falha fatal."""
+
+    @abstractmethod
+    def exportar(self, nome: str, pasta: Path) -> bool:
+        """Grava `<pasta>/<nome><extensao_saida>`."""
+
+    def encerrar(self, pid: int = None):
+        """Encerra o que o driver abriu (só o terminal `pid`, se informado)."""
+
+    def recuperar(self) -> bool:
+        """Recuperação entre tentativas; True se algo foi tratado (ex.: diálogo)."""
+        return False
+
+    def focar(self):
+        """Devolve o foco ao terminal antes de repetir uma fase."""
+
+    # --------------------- Terminal aberto (fluxo OOS) --------------------- #
+    def lancar(self, ini_path: Path, pasta_terminal: Path = None, encerrar_outros: bool = True,
+               segundo_plano: bool = False):
+        """Abre um terminal com o INI, sem iniciar o teste. Retorna o processo (atributo `pid`)."""
+        raise NotImplementedError(f"driver {self.nome} não abre terminal interativo")
+
+    def aguardar_processo(self, pid: int = None, timeout: float = 20.0) -> bool:
+        """True quando o processo do terminal (`pid` ou qualquer um) existe."""
+        return True
+
+    def usar_terminal(self, pid: Optional[int], timeout: float = 20.0):
+        """Direciona as próximas fases para o terminal do `pid` (None: qualquer terminal)."""
+
+    def aplicar_datas(self, de_br: str, ate_br: str) -> bool:
+        """Troca as datas do tester no terminal aberto (dd/mm/aaaa)."""
+        raise NotImplementedError(f"driver {self.nome} não troca datas no terminal")
+
+    def confirma_datas(self) -> bool:
+        """True se `datas_executadas` consegue confirmar as datas de um teste."""
+        return False
+
+    def datas_executadas(self, desde: float) -> Optional[Tuple[str, str]]:
+        """(de, até) em aaaa.mm.dd do último teste iniciado após `desde` (None se desconhecido)."""
+        return None
+
+    def salvar_relatorio(self, destino: Path) -> bool:
+        """Grava o relatório do último teste em `destino`."""
+        return False
+
+    def conexoes_terminal(self, portas: Sequence[int]) -> Optional[Dict[int, List[str]]]:
+        """Conexões dos terminais nas portas (diagnóstico); None se não há terminal."""
+        return None
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# GUI (pyautogui)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class DriverGUI(MT5Driver):
+    """Delegação para os métodos de GUI de `MT5Automacao` (comportamento original)."""
+
+    nome = 'gui'
+    usa_gui = True
+    # Símbolo, período, datas e modelo são os que estiverem no terminal, não os do [Tester]
+    aplica_tester = False
+    terminal_interativo = True
+
+    def __init__(self, automacao):
+        super().__init__()
+        self.automacao = automacao
+
+    def abrir(self, ini_path: Path = None) -> bool:
+        self.automacao.garantir_mt5_rodando()
+        return True
+
+    def carregar(self, set_path: Path) -> bool:
+        automacao = self.automacao
+        # Verificar foco antes de cada set
+        if not automacao.verificar_mt5_em_foco():
+            print("📌 Refocando MT5...")
+            automacao.focar_mt5(forcar=True)
+            time.sleep(0.5)
+        return automacao.carregar_set_file(set_path)
+
+    def iniciar(self) -> bool:
+        self.automacao.iniciar_backtest()
+        return True
+
+    def aguardar(self, nome: str, timeout: float) -> bool:
+        # Monitorar via BacktestMonitor (reinicia estado cada set)
+        monitor = self.automacao._monitor
+        monitor.start()
+        terminou = monitor.wait(timeout=timeout, ao_poll=self.automacao._sentinela_durante_backtest)
+        self.startup_time = monitor.startup_time
+        return terminou
+
+    def exportar(self, nome: str, pasta: Path) -> bool:
+        # A GUI salva em automacao.curves_folder (quem chama ajusta a pasta)
+        self.automacao._causa_export = None
+        ok = self.automacao.exportar_csv(nome)
+        self.causa = self.automacao._causa_export
+        return ok
+
+    def encerrar(self, pid: int = None):
+        self.automacao.encerrar_mt5(silent=True, pid=pid)
+
+    def recuperar(self) -> bool:
+        self.automacao.invalidar_estado_ui()
+        return bool(self.automacao._checar_dialogos('recuperacao'))
+
+    def focar(self):
+        try:
+            self.automacao.focar_mt5(forcar=True)
+        except Exception:
+            pass
+
+    def lancar(self, ini_path: Path, pasta_terminal: Path = None, encerrar_outros: bool = True,
+               segundo_plano: bool = False):
+        terminal = Path(pasta_terminal or self.automacao.mt5_path) / 'terminal64.exe'
+        if not terminal.exists():
+            terminal = Path('terminal64.exe')  # fallback PATH
+        elif encerrar_outros:
+            # Encerrar instâncias anteriores
+            self.automacao.encerrar_mt5(silent=True)
+            time.sleep(2)
+        cmd = [str(terminal), f"/config:{ini_path}"]
+        print(f"▶️ Iniciando MT5: {' '.join(cmd)}")
+        startupinfo = None
+        if segundo_plano and os.name == 'nt':
+            # Minimizado e sem ativar: não rouba o foco da exportação em andamento
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            startupinfo.wShowWindow = SW_SHOWMINNOACTIVE
+        return subprocess.Popen(cmd, startupinfo=startupinfo)
+
+    def aguardar_processo(self, pid: int = None, timeout: float = 20.0) -> bool:
+        import psutil
+        for _ in range(max(int(timeout), 1)):
+            if pid is not None:
+                if psutil.pid_exists(pid):
+                    return True
+            elif any((p.info.get('name') or '').lower().startswith('terminal64')
+                     for p in psutil.process_iter(['name'])):
+                return True
+            time.sleep(1)
+        return False
+
+    def usar_terminal(self, pid: Optional[int], timeout: float = 20.0):
+        automacao = self.automacao
+        automacao.terminal_pid = pid
+        automacao._janelas.invalidar()
+        automacao.invalidar_estado_ui()
+        if pid is None:
+            return
+        limite = time.time() + timeout
+        while automacao._encontrar_janela_mt5() is None and time.time() < limite:
+            time.sleep(0.5)
+        automacao.focar_mt5()
+
+    def aplicar_datas(self, de_br: str, ate_br: str) -> bool:
+        self.automacao.aplicar_datas_tester(de_br, ate_br)
+        return True
+
+    def confirma_datas(self) -> bool:
+        return diretorio_dados(self.automacao.mt5_path) is not None
+
+    def datas_executadas(self, desde: float) -> Optional[Tuple[str, str]]:
+        """Datas do último teste no diário do tester (Tester/logs) gravado após `desde`."""
+        dados = diretorio_dados(self.automacao.mt5_path)
+        if dados is None:
+            return None
+        logs = [fp for padrao in ('Tester/logs/*.log', 'Tester/Agent-*/logs/*.log')
+                for fp in dados.glob(padrao) if fp.stat().st_mtime >= desde]
+        for fp in sorted(logs, key=lambda f: f.stat().st_mtime, reverse=True):
+            try:
+                texto = fp.read_bytes().decode('utf-16-le', 'ignore')
+            except OSError:
+                continue
+            encontrados = LOG_DATAS_REGEX.findall(texto)
+            if encontrados:
+                return encontrados[-1]
+        return None
+
+    def salvar_relatorio(self, destino: Path) -> bool:
+        return self.automacao.salvar_relatorio(destino)
+
+    def conexoes_terminal(self, portas: Sequence[int]) -> Optional[Dict[int, List[str]]]:
+        import psutil
+        pids = {p.info['pid'] for p in psutil.process_iter(['pid', 'name'])
+                if p.info['name'] and 'terminal64' in p.info['name'].lower()}
+        if not pids:
+            return None
+        # Uma única varredura de conexões para todas as portas monitoradas
+        por_porta: Dict[int, List[str]] = {}
+        for c in psutil.net_connections():
+            if c.laddr and c.laddr.port in portas and c.pid in pids:
+                por_porta.setdefault(c.laddr.port, []).append(f"{c.status}(PID={c.pid})")
+        return por_porta
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# INI / headless
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class DriverINI(MT5Driver):
+    """Cada backtest é um `terminal64.exe /config:<ini>` que fecha sozinho ao terminar.
+
+    O .set é copiado para MQL5/Profiles/Tester e referenciado em ExpertParameters,
+    e os inputs vão também em [TesterInputs] (o terminal não depende do perfil);
+    a saída é o relatório HTML do tester (não há exportação de CSV sem GUI).
+    """
+
+    nome = 'ini'
+    extensao_saida = '.htm'
+
+    def __init__(self, mt5_path: str | Path, tester: Mapping[str, str] = None, pasta_trabalho: Path = None):
+        super().__init__()
+        self.mt5_path = Path(mt5_path)
+        self.tester = dict(tester or {})
+        self.pasta_trabalho = Path(pasta_trabalho) if pasta_trabalho else Path.cwd() / 'ini_headless'
+        self.pasta_trabalho.mkdir(parents=True, exist_ok=True)
+        self._base: Dict[str, str] = dict(self.tester)
+        self._set: Optional[Path] = None
+        self._relatorio: Optional[Path] = None
+        self._proc: Optional[subprocess.Popen] = None
+
+    def abrir(self, ini_path: Path = None) -> bool:
+        self._base = dict(self.tester)
+        if ini_path is not None:
+            for enc in ('utf-8-sig', 'utf-16', 'latin-1'):
+                try:
+                    self._base = tester_de_ini(Path(ini_path).read_text(encoding=enc))
+                    break
+                except (UnicodeError, ValueError):
+                    continue
+        return True
+
+    def carregar(self, set_path: Path) -> bool:
+        dados = diretorio_dados(self.mt5_path)
+        if dados is None:
+            self.causa = 'janela_ausente'
+            return False
+        perfis = dados / 'MQL5' / 'Profiles' / 'Tester'
+        perfis.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(set_path, perfis / Path(set_path).name)
+        self._set = Path(set_path)
+        self._relatorio = self.pasta_trabalho / f"{self._set.stem}.htm"
+        return True
+
+    def iniciar(self) -> bool:
+        if self._set is None:
+            self.causa = 'erro'
+            return False
+        # Chaves com a grafia do MT5: o [Tester] do config.ini e tester_de_ini chegam em minúsculas
+        tester = {grafia_mt5(k): v for k, v in self._base.items() if k.lower() not in ('report', 'set', 'visual')}
+        tester.update({
+            'ExpertParameters': self._set.name,
+            'Report': str(self._relatorio).replace('\\', '/'),
+            'ReplaceReport': '1',
+            'ShutdownTerminal': '1',
+            'Visual': '0',
+        })
+        ini_path = self.pasta_trabalho / f"{self._set.stem}.ini"
+        linhas = ['[Tester]'] + [f"{k}={v}" for k, v in tester.items()]
+        linhas += ['[TesterInputs]'] + [f"{k}={v}" for k, v in tester_inputs(self._set).items()]
+        ini_path.write_text('\r\n'.join(linhas) + '\r\n', encoding='utf-16')
+        terminal = self.mt5_path / 'terminal64.exe'
+        self._proc = subprocess.Popen([str(terminal), f"/config:{ini_path}"])
+        return True
+
+    def aguardar(self, nome: str, timeout: float) -> bool:
+        if self._proc is None:
+            return False
+        try:
+            self._proc.wait(timeout=timeout)
+            return True
+        except subprocess.TimeoutExpired:
+            self.encerrar()
+            return False
+
+    def exportar(self, nome: str, pasta: Path) -> bool:
+        candidatos = [self._relatorio.with_suffix(ext) for ext in ('.htm', '.html')] if self._relatorio else []
+        for relatorio in candidatos:
+            if relatorio.exists():
+                pasta.mkdir(parents=True, exist_ok=True)
+                shutil.move(str(relatorio), str(pasta / f"{nome}{self.extensao_saida}"))
+                return True
+        self.causa = 'csv_ausente'
+        return False
+
+    def encerrar(self, pid: int = None):
+        if self._proc is not None and self._proc.poll() is None:
+            self._proc.kill()
+        self._proc = None
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Fake (em processo)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+# Latências médias simuladas (s)
+LATENCIAS_FAKE = {
+    'abrir': 0.5,
+    'carregar': 0.2,
+    'iniciar': 0.05,
+    'inicializacao': 0.3,
+    'backtest': 1.0,
+    'exportar': 0.3,
+}
+
+# Causa atribuída a cada falha simulada (recuperáveis, como na GUI real)
+CAUSAS_FAKE = {'carregar': 'foco', 'iniciar': 'foco', 'exportar': 'csv_ausente'}
+
+
+@dataclass
+class ProcessoFake:
+    """Terminal simulado devolvido por `DriverFake.lancar` (mesma interface usada do Popen)."""
+    pid: int
+    ini_path: Path
+
+
+class DriverFake(MT5Driver):
+    """Simula carga, execução e exportação com jitter e taxas de falha por fase.
+
+    falhas: probabilidade por fase ('carregar', 'iniciar', 'aguardar', 'exportar');
+    em 'aguardar' a falha simula um timeout (o resultado ainda é exportado).
+    """
+
+    nome = 'fake'
+    terminal_interativo = True
+
+    def __init__(self, latencias: Mapping[str, float] = None, falhas: Mapping[str, float] = None,
+                 jitter: float = 0.1, semente: int = None, dormir: Callable[[float], None] = time.sleep):
+        super().__init__()
+        self.latencias = {**LATENCIAS_FAKE, **(latencias or {})}
+        self.falhas = dict(falhas or {})
+        self.jitter = jitter
+        self._rng = random.Random(semente)
+        self._dormir = dormir
+        self._set: Optional[Path] = None
+        self.contagem: Dict[str, int] = {}
+        self._pids = 0
+        # Datas configuradas no terminal simulado e (datas, instante) do último teste
+        self._datas: Optional[Tuple[str, str]] = None
+        self._executado: Optional[Tuple[Tuple[str, str], float]] = None
+
+    def _simular(self, etapa: str) -> float:
+        base = self.latencias.get(etapa, 0.0)
+        duracao = max(base * self._rng.uniform(1 - self.jitter, 1 + self.jitter), 0.0)
+        if duracao:
+            self._dormir(duracao)
+        self.contagem[etapa] = self.contagem.get(etapa, 0) + 1
+        return duracao
+
+    def _falhou(self, fase: str) -> bool:
+        if self._rng.random() < self.falhas.get(fase, 0.0):
+            self.causa = CAUSAS_FAKE.get(fase, 'erro')
+            return True
+        return False
+
+    def abrir(self, ini_path: Path = None) -> bool:
+        self._simular('abrir')
+        return True
+
+    def carregar(self, set_path: Path) -> bool:
+        self._simular('carregar')
+        if self._falhou('carregar'):
+            return False
+        self._set = Path(set_path)
+        return True
+
+    def iniciar(self) -> bool:
+        self._simular('iniciar')
+        return not self._falhou('iniciar')
+
+    def aguardar(self, nome: str, timeout: float) -> bool:
+        inicio = time.time()
+        self.startup_time = self._simular('inicializacao')
+        self._simular('backtest')
+        if self._datas is not None:
+            self._executado = (self._datas, inicio)
+        return not self._falhou('aguardar')
+
+    def lancar(self, ini_path: Path, pasta_terminal: Path = None, encerrar_outros: bool = True,
+               segundo_plano: bool = False) -> ProcessoFake:
+        self._simular('abrir')
+        tester = tester_de_ini(decodificar(Path(ini_path).read_bytes()))
+        if tester.get('fromdate') and tester.get('todate'):
+            self._datas = (tester['fromdate'].split()[0], tester['todate'].split()[0])
+        self._pids += 1
+        return ProcessoFake(self._pids, Path(ini_path))
+
+    def aplicar_datas(self, de_br: str, ate_br: str) -> bool:
+        self._datas = (data_mt5(de_br), data_mt5(ate_br))
+        return True
+
+    def confirma_datas(self) -> bool:
+        return True
+
+    def datas_executadas(self, desde: float) -> Optional[Tuple[str, str]]:
+        if self._executado is None or self._executado[1] < desde:
+            return None
+        return self._executado[0]
+
+    def salvar_relatorio(self, destino: Path) -> bool:
+        destino = Path(destino)
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        de, ate = self._datas or ('', '')
+        destino.write_text(f"<html><body><h2>Relatório simulado {de} - {ate}</h2></body></html>\n",
+                           encoding='utf-8')
+        return True
+
+    def exportar(self, nome: str, pasta: Path) -> bool:
+        self._simular('exportar')
+        if self._falhou('exportar'):
+            return False
+        pasta.mkdir(parents=True, exist_ok=True)
+        saldo = 100000.0
+        linhas = ['<DATE>\t<BALANCE>\t<EQUITY>\t<DEPOSIT LOAD>']
+        for dia in range(1, 29):
+            saldo += self._rng.uniform(-500, 600)
+            linhas.append(f"2024.01.{dia:02d} 00:00\t{saldo:.2f}\t{saldo:.2f}\t0.0000")
+        (pasta / f"{nome}{self.extensao_saida}").write_text('\n'.join(linhas) + '\n', encoding='utf-8')
+        return True
+
+
+def criar_driver(nome: str, automacao) -> MT5Driver:
+    """Instancia o driver pelo nome ('gui', 'ini' ou 'fake') com a configuração da automação."""
+    nome = (nome or 'gui').lower()
+    if nome == 'gui':
+        return DriverGUI(automacao)
+    config = automacao.config
+    if nome == 'ini':
+        tester = dict(config['Tester']) if 'Tester' in config else {}
+        return DriverINI(automacao.mt5_path, tester, automacao.curves_folder / 'ini_headless')
+    if nome == 'fake':
+        secao = config['DriverFake'] if 'DriverFake' in config else {}
+        latencias = {k: float(secao[k]) for k in LATENCIAS_FAKE if k in secao}
+        falhas = {fase: float(secao[f'falha_{fase}']) for fase in ('carregar', 'iniciar', 'aguardar', 'exportar')
+                  if f'falha_{fase}' in secao}
+        semente = int(secao['semente']) if 'semente' in secao else None
+        return DriverFake(latencias, falhas, float(secao.get('jitter', 0.1)), semente)
+    raise ValueError(f"Driver desconhecido: {nome} (use gui, ini ou fake)")
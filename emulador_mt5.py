@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""Emulador de processos do MT5 para testes de carga no Linux (sem MT5 instalado).
+
+Os monitores procuram processos chamados `terminal64.exe`/`metatester64`,
+padrões de CPU e conexões na porta 3000. O emulador cria processos reais com
+esses nomes (prctl PR_SET_NAME):
+
+- terminal: lê o INI de `/config:`, dispara um metatester, grava o relatório
+  HTML (Report=) e a curva de equity CSV; com ShutdownTerminal=1 encerra
+  sozinho, senão fica aberto como um terminal de verdade;
+- metatester: abre e fecha uma conexão na porta (handshake ~2 s) e queima
+  CPU conforme um perfil "cpu%:segundos,..." (ex.: "0:1,95:8,2:3").
+
+Uso:
+    python emulador_mt5.py instalar /tmp/mt5_fake     # terminal64.exe falso + MQL5/ (portátil)
+    python emulador_mt5.py carga --n 8                # N terminais concorrentes x N BacktestMonitor
+
+Com `[MT5] mt5_path` apontando para a pasta instalada, o driver INI e o
+OOSBatchRunner lançam o emulador como se fosse o MT5. Parâmetros do emulador
+vão por variáveis de ambiente: EMULADOR_PERFIL, EMULADOR_PORTA,
+EMULADOR_INICIALIZACAO e EMULADOR_PASTA_CSV.
+"""
+from __future__ import annotations
+
+import argparse
+import ctypes
+import os
+import random
+import signal
+import socket
+import stat
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent
+
+PERFIL_PADRAO = "0:1,95:8,2:3"
+PR_SET_PDEATHSIG = 1
+PR_SET_NAME = 15
+JANELA_CPU = 0.02  # s por ciclo de trabalho/descanso
+
+
+def _renomear_processo(nome: str, morrer_com_pai: bool = False):
+    """Define o nome do processo (/proc/<pid>/comm, lido pelo psutil)."""
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        libc.prctl(PR_SET_NAME, nome.encode()[:15], 0, 0, 0)
+        if morrer_com_pai:
+            libc.prctl(PR_SET_PDEATHSIG, signal.SIGTERM, 0, 0, 0)
+    except (OSError, AttributeError):
+        print(f"⚠️ prctl indisponível: processo não será renomeado para {nome}")
+
+
+def parse_perfil(perfil: str) -> List[Tuple[float, float]]:
+    """"95:8,2:3" -> [(95.0, 8.0), (2.0, 3.0)]"""
+    segmentos = []
+    for parte in perfil.split(','):
+        cpu, duracao = parte.split(':')
+        segmentos.append((max(0.0, min(float(cpu), 100.0)), float(duracao)))
+    return segmentos
+
+
+def escalar_perfil(perfil: str, fator: float) -> str:
+    """("95:8,2:3", 1.5) -> "95:12,2:4.5" (mesmos níveis de CPU, durações multiplicadas)."""
+    return ','.join(f"{cpu:g}:{duracao * fator:g}" for cpu, duracao in parse_perfil(perfil))
+
+
+def queimar_cpu(segmentos: List[Tuple[float, float]]):
+    """Mantém a CPU no percentual de cada segmento (ciclos de trabalho/descanso)."""
+    for cpu, duracao in segmentos:
+        fim = time.time() + duracao
+        ocupado = JANELA_CPU * cpu / 100.0
+        while time.time() < fim:
+            inicio = time.perf_counter()
+            while time.perf_counter() - inicio < ocupado:
+                pass
+            time.sleep(max(JANELA_CPU - ocupado, 0.0))
+
+
+def _handshake(porta: int, duracao: float = 2.0):
+    """Conexão ESTABLISHED com laddr na porta (como o agente de teste local)."""
+    servidor = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    servidor.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    try:
+        servidor.bind(('127.0.0.1', porta))
+    except OSError:
+        servidor.close()
+        print(f"⚠️ Porta {porta} ocupada - seguindo sem conexão (monitor usará o fallback de CPU)")
+        return
+    servidor.listen(1)
+    cliente = socket.create_connection(('127.0.0.1', porta))
+    aceito, _ = servidor.accept()
+    time.sleep(duracao)
+    for s in (aceito, cliente, servidor):
+        s.close()
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Papéis dos processos
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def executar_metatester(perfil: str, porta: int):
+    _renomear_processo('metatester64', morrer_com_pai=True)
+    conexao = threading.Thread(target=_handshake, args=(porta,), daemon=True)
+    conexao.start()
+    queimar_cpu(parse_perfil(perfil))
+    conexao.join(timeout=0.1)
+
+
+def ler_ini_tester(caminho: Path) -> dict:
+    import configparser
+    dados = caminho.read_bytes()
+    texto = dados.decode('utf-16') if dados.startswith((b'\xff\xfe', b'\xfe\xff')) else dados.decode('utf-8-sig', 'replace')
+    cfg = configparser.ConfigParser(strict=False, interpolation=None)
+    cfg.read_string(texto)
+    return dict(cfg['Tester']) if cfg.has_section('Tester') else {}
+
+
+def gravar_relatorio(caminho: Path, tester: dict, rng: random.Random):
+    """Relatório HTML com tabela de negócios (>5 KB, como o fallback do OOS espera)."""
+    if not caminho.suffix:
+        caminho = caminho.with_suffix('.htm')
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    linhas = []
+    saldo = float(tester.get('deposit', 100000) or 100000)
+    for i in range(120):
+        lucro = rng.uniform(-400, 500)
+        saldo += lucro
+        linhas.append(f"<tr><td>{i + 1}</td><td>{tester.get('symbol', 'WIN$N')}</td>"
+                      f"<td>{'buy' if i % 2 else 'sell'}</td><td>{lucro:.2f}</td><td>{saldo:.2f}</td></tr>")
+    html = (
+        "<html><head><title>Strategy Tester Report</title></head><body>"
+        f"<h2>{tester.get('expert', 'EA')} {tester.get('symbol', '')} {tester.get('period', '')}</h2>"
+        f"<p>Período: {tester.get('fromdate', '')} - {tester.get('todate', '')}</p>"
+        "<table><tr><th>#</th><th>Symbol</th><th>Type</th><th>Profit</th><th>Balance</th></tr>"
+        + ''.join(linhas) + "</table></body></html>"
+    )
+    caminho.write_text(html, encoding='utf-8')
+
+
+def gravar_curva(caminho: Path, rng: random.Random):
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    saldo = 100000.0
+    linhas = ['<DATE>\t<BALANCE>\t<EQUITY>\t<DEPOSIT LOAD>']
+    for dia in range(1, 29):
+        saldo += rng.uniform(-500, 600)
+        linhas.append(f"2024.01.{dia:02d} 00:00\t{saldo:.2f}\t{saldo:.2f}\t0.0000")
+    caminho.write_text('\n'.join(linhas) + '\n', encoding='utf-16')
+
+
+def executar_terminal(argumentos: List[str]):
+    _renomear_processo('terminal64.exe')
+    config = next((a.split(':', 1)[1] for a in argumentos if a.lower().startswith('/config:')), None)
+    tester = ler_ini_tester(Path(config)) if config and Path(config).exists() else {}
+    perfil = os.environ.get('EMULADOR_PERFIL', PERFIL_PADRAO)
+    porta = int(os.environ.get('EMULADOR_PORTA', '3000'))
+    rng = random.Random()
+
+    time.sleep(float(os.environ.get('EMULADOR_INICIALIZACAO', '1.0')))
+    if tester:
+        subprocess.run([sys.executable, str(Path(__file__).resolve()), 'metatester',
+                        '--perfil', perfil, '--porta', str(porta)])
+        if tester.get('report'):
+            gravar_relatorio(Path(tester['report']), tester, rng)
+        pasta_csv = os.environ.get('EMULADOR_PASTA_CSV')
+        if pasta_csv:
+            nome = Path(tester.get('report') or f"emulador_{os.getpid()}").stem
+            gravar_curva(Path(pasta_csv) / f"{nome}.csv", rng)
+    if tester.get('shutdownterminal', '0') != '1':
+        # Terminal "aberto": aguarda ser encerrado (encerrar_mt5 / kill)
+        while True:
+            time.sleep(3600)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Instalação e teste de carga
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def instalar(pasta: Path) -> Path:
+    """Cria uma "instalação portátil" com terminal64.exe apontando para o emulador."""
+    pasta = Path(pasta)
+    (pasta / 'MQL5' / 'Profiles' / 'Tester').mkdir(parents=True, exist_ok=True)
+    (pasta / 'MQL5' / 'Experts').mkdir(parents=True, exist_ok=True)
+    (pasta / 'Tester' / 'logs').mkdir(parents=True, exist_ok=True)
+    executavel = pasta / 'terminal64.exe'
+    executavel.write_text(
+        f'#!/bin/sh\nexec "{sys.executable}" "{Path(__file__).resolve()}" terminal "$@"\n', encoding='utf-8')
+    executavel.chmod(executavel.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return executavel
+
+
+def testar_carga(n: int, perfil: str = PERFIL_PADRAO, porta_base: int = 3000,
+                 timeout: float = 120.0, pasta: Path = None) -> List[dict]:
+    """N terminais emulados simultâneos, cada um observado por um BacktestMonitor próprio.
+
+    Mede a latência de detecção do início e o erro na detecção do fim
+    (fim detectado - saída real do metatester). O terminal i roda o perfil com
+    durações x(1 + 0,5·i): os fins ficam espalhados e um monitor que olhasse o
+    metatester de outro terminal erraria o fim. Cada monitor segue só o PID
+    dono da conexão na sua porta (isolar_pid).
+    """
+    from backtest_core import BacktestMonitor
+    import tempfile
+
+    pasta = Path(pasta or tempfile.mkdtemp(prefix='emulador_mt5_'))
+    executavel = instalar(pasta)
+    resultados: List[Optional[dict]] = [None] * n
+
+    def _um(i: int):
+        ini = pasta / f"carga_{i}.ini"
+        ini.write_text(f"[Tester]\nSymbol=WIN$N\nReport={pasta / f'carga_{i}.htm'}\nShutdownTerminal=1\n",
+                       encoding='utf-8')
+        perfil_i = escalar_perfil(perfil, 1 + 0.5 * i)
+        env = {**os.environ, 'EMULADOR_PERFIL': perfil_i, 'EMULADOR_PORTA': str(porta_base + i),
+               'EMULADOR_INICIALIZACAO': '0.5'}
+        monitor = BacktestMonitor(port=porta_base + i, poll_interval=0.1, verbose=False, isolar_pid=True)
+        lancado = time.time()
+        proc = subprocess.Popen([str(executavel), f"/config:{ini}"], env=env)
+        saida = {}
+
+        def _aguardar_saida():
+            proc.wait(timeout=timeout)
+            saida['t'] = time.time()
+
+        espera = threading.Thread(target=_aguardar_saida)
+        espera.start()
+        monitor.start()
+        terminou = monitor.wait(timeout=timeout)
+        detectado = time.time()
+        espera.join()
+        resultados[i] = {
+            'terminal': i,
+            'porta': porta_base + i,
+            'perfil': perfil_i,
+            'pid_metatester': monitor._backtest_pid,
+            'detectou_fim': terminou,
+            'inicio_detectado_s': monitor.startup_time,
+            'fim_detectado_s': detectado - lancado,
+            'saida_real_s': saida.get('t', time.time()) - lancado,
+        }
+
+    threads = [threading.Thread(target=_um, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return [r for r in resultados if r is not None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulador de processos do MT5 (Linux)")
+    sub = parser.add_subparsers(dest='papel', required=True)
+    p_inst = sub.add_parser('instalar', help="cria terminal64.exe falso numa pasta")
+    p_inst.add_argument('pasta')
+    p_carga = sub.add_parser('carga', help="teste de carga do BacktestMonitor")
+    p_carga.add_argument('--n', type=int, default=4)
+    p_carga.add_argument('--perfil', default=PERFIL_PADRAO)
+    p_carga.add_argument('--porta-base', type=int, default=3000)
+    p_meta = sub.add_parser('metatester')
+    p_meta.add_argument('--perfil', default=PERFIL_PADRAO)
+    p_meta.add_argument('--porta', type=int, default=3000)
+    sub.add_parser('terminal').add_argument('argumentos', nargs=argparse.REMAINDER)
+    args = parser.parse_args()
+
+    if args.papel == 'instalar':
+        print(f"✅ Emulador instalado: {instalar(Path(args.pasta))}")
+    elif args.papel == 'carga':
+        resultados = testar_carga(args.n, args.perfil, args.porta_base)
+        for r in resultados:
+            inicio = f"{r['inicio_detectado_s']:.1f}s" if r['inicio_detectado_s'] is not None else "não detectado"
+            print(f"🖥️ #{r['terminal']} porta {r['porta']} perfil {r['perfil']}: início {inicio} | fim detectado "
+                  f"{r['fim_detectado_s']:.1f}s | saída real {r['saida_real_s']:.1f}s | "
+                  f"{'✅' if r['detectou_fim'] else '⏰ timeout'}")
+    elif args.papel == 'metatester':
+        executar_metatester(args.perfil, args.porta)
+    else:
+        executar_terminal(args.argumentos)
+
+
+if __name__ == "__main__":
+    main()
@@ -63,12 +63,15 @@ from pathlib import Path
 from dataclasses import dataclass
 from typing import List, Tuple
 import re
-import subprocess
 import time
 import configparser
 
-from backtest_core import INIGenerator, BacktestMonitor
-from automacao import MT5Automacao
+from backtest_core import INIGenerator, JobINI, BacktestMonitor
+from cache_resultados import tester_de_ini
+from automacao import FalhaFase, MT5Automacao
+import perfilamento
+import rastreamento
+from status_console import console
 
 # ---------------------------- Utilidades de Data ---------------------------- #
 
@@ -163,6 +166,21 @@ def prompt_oos_steps() -> List[Tuple[str, str]]:
 
 # ----------------------------- Runner Principal ----------------------------- #
 
+# Coordenadas necessárias para trocar as datas e salvar o relatório no terminal já aberto
+CAMPOS_REUSO = ('settings_tab', 'tester_data_inicio', 'tester_data_fim',
+                'backtest_tab', 'backtest_area', 'salvar_relatorio')
+
+
+@dataclass
+class StepOOS:
+    """Step OOS preparado (INI gerado e chave de cache calculada)"""
+    de: str
+    ate: str
+    ini_path: Path
+    csv_name: str
+    chave: str | None = None
+
+
 @dataclass
 class OOSBatchRunner:
     automacao: MT5Automacao
@@ -175,6 +193,10 @@ class OOSBatchRunner:
     monitor_port: int = 3000
     post_launch_wait: float = 3.0
     window_wait_timeout: float = 20.0
+    espera_pre_clique: float = 15.0
+    terminal_standby: str | Path = None   # 2ª instalação do MT5 (outro diretório de dados) p/ pipeline
+    reusar_terminal: bool = None          # manter o terminal aberto e trocar só as datas entre steps
+    inputs_no_ini: bool = None            # inputs do .set em [TesterInputs]: sem carregar o .set pela GUI
 
     def __post_init__(self):
         # Definir caminhos padrão se não fornecidos
@@ -204,9 +226,32 @@ class OOSBatchRunner:
         self.work_dir.mkdir(parents=True, exist_ok=True)
         self.csv_dir.mkdir(parents=True, exist_ok=True)
         
-        self._ini_generator = INIGenerator(self.ini_template, self.reports_dir)
+        if self.inputs_no_ini is None:
+            self.inputs_no_ini = self.automacao.config.getboolean('OOS', 'inputs_no_ini', fallback=False)
+        self._ini_generator = INIGenerator(self.ini_template, self.reports_dir, injetar_inputs=self.inputs_no_ini)
         self._monitor = BacktestMonitor(port=self.monitor_port, verbose=True)
         self._debug_ports = [3000, 443, 80, 8080, 17000, 18000]
+        if self.terminal_standby is None:
+            self.terminal_standby = self.automacao.config.get('OOS', 'terminal_standby', fallback='') or None
+        driver = self.automacao.driver
+        if (self.terminal_standby and driver.usa_gui
+                and not (Path(self.terminal_standby) / 'terminal64.exe').exists()):
+            print(f"⚠️ Terminal em espera não encontrado ({self.terminal_standby}) - execução serial")
+            self.terminal_standby = None
+        if self.reusar_terminal is None:
+            self.reusar_terminal = self.automacao.config.getboolean('OOS', 'reusar_terminal', fallback=False)
+        faltando = [c for c in CAMPOS_REUSO if c not in self.automacao.coords] if driver.usa_gui else []
+        if self.reusar_terminal and faltando:
+            print(f"⚠️ Reuso do terminal requer calibrar: {', '.join(faltando)} - reiniciando a cada step")
+            self.reusar_terminal = False
+        if self.reusar_terminal and not driver.confirma_datas():
+            # Sem o diário do tester as datas de um step reaproveitado não podem ser confirmadas
+            print("⚠️ Reuso do terminal requer o diretório de dados do MT5 (diário do tester) - "
+                  "reiniciando a cada step")
+            self.reusar_terminal = False
+        self.caminhos_steps: List[Tuple[int, str]] = []
+        self._inicio_job = time.time()
+        self._resultados = {'sucesso': 0, 'falha': 0}
 
         if not self.set_path.exists():
             raise FileNotFoundError(f"Arquivo .set não encontrado: {self.set_path}")
@@ -236,51 +281,58 @@ class OOSBatchRunner:
         from_mt5 = _br_to_mt5(from_br)
         to_mt5 = _br_to_mt5(to_br)
         from_slug, to_slug = _br_to_slug(from_br), _br_to_slug(to_br)
-        content, enc = self._ini_generator.build(from_mt5, to_mt5, from_slug, to_slug, self.set_path)
-        ini_path = self.work_dir / f"OOS_{from_slug}_{to_slug}.ini"
-        ini_path.write_text(content, encoding=enc)
-        return ini_path
+        job = JobINI(from_mt5, to_mt5, from_slug, to_slug, self.set_path)
+        return self._ini_generator.build_many([job], self.work_dir)[0]
 
     # --------------------------- Lançar MT5 /config -------------------------- #
-    def _launch_mt5_with_ini(self, ini_path: Path):
-        terminal_path = Path(self.automacao.mt5_path) / 'terminal64.exe'
-        if not terminal_path.exists():
-            terminal_path = Path('terminal64.exe')  # fallback PATH
-        if terminal_path.exists():
-            # Encerrar instâncias anteriores
-            import psutil
-            for proc in psutil.process_iter(['name']):
-                try:
-                    if proc.info['name'] and 'terminal64.exe' in proc.info['name'].lower():
-                        proc.kill()
-                except Exception:
-                    pass
-            time.sleep(2)
-        
-        # Construir comando apenas com .ini (o .set será carregado manualmente via UI)
-        cmd = [str(terminal_path), f"/config:{ini_path}"]
-        
-        print(f"▶️ Iniciando MT5: {' '.join(cmd)}")
-        print(f"📋 Arquivo .set para carregar manualmente: {self.set_path.name}")
-        subprocess.Popen(cmd)
+    def _launch_mt5_with_ini(self, ini_path: Path, pasta_terminal: Path = None,
+                             encerrar_outros: bool = True, segundo_plano: bool = False):
+        """Abre o terminal do step pelo driver (INI com as datas; o Start é clicado depois)"""
+        with rastreamento.span('oos_lancar', ini=Path(ini_path).stem, segundo_plano=segundo_plano), \
+                perfilamento.fase('oos_lancar'):
+            if not self.inputs_no_ini:
+                print(f"📋 Arquivo .set para carregar manualmente: {self.set_path.name}")
+            return self.automacao.driver.lancar(ini_path, pasta_terminal, encerrar_outros, segundo_plano)
 
     # ----------------------------- Exportar CSV UI --------------------------- #
-    def _export_csv(self, from_br: str, to_br: str):
-        csv_name = self._compose_csv_name(from_br, to_br)
+    def _export_csv(self, from_br: str, to_br: str, csv_name: str = None) -> Path:
+        csv_name = csv_name or self._compose_csv_name(from_br, to_br)
         prev_folder = self.automacao.curves_folder
         try:
             # Usar pasta específica para CSVs
             self.automacao.curves_folder = self.csv_dir
-            self.automacao.focar_mt5()
-            time.sleep(2)
-            # Ir para aba gráfico se coordenada existir
-            if 'graph_tab' in self.automacao.coords:
-                import pyautogui
-                pyautogui.click(self.automacao.coords['graph_tab'])
-                time.sleep(1)
-            self.automacao.exportar_csv(csv_name)
+            if self.automacao.driver.usa_gui:
+                self.automacao.driver.focar()
+                self.automacao._aguardar('oos_foco_export', 2.0)
+            # exportar_csv navega para a aba Gráfico (pulando o clique se já estiver nela);
+            # em falha, só a exportação é repetida - o backtest do step não roda de novo
+            self.automacao.exportar_csv_com_retry(csv_name)
         finally:
             self.automacao.curves_folder = prev_folder
+        return self._csv_path(csv_name)
+
+    def _csv_path(self, csv_name: str) -> Path:
+        """Arquivo de saída do step (CSV na GUI, relatório no driver INI)"""
+        return self.csv_dir / f"{csv_name}{self.automacao.driver.extensao_saida}"
+
+    # --------------------------- Cache de resultados ------------------------- #
+    def _chave_cache(self, ini_path: Path, from_br: str, to_br: str):
+        """Chave do step: .set + [Tester] efetivo do INI gerado + EA + datas"""
+        try:
+            tester = tester_de_ini(ini_path.read_text(encoding=self._ini_generator._encoding or 'utf-8'))
+        except Exception:
+            tester = {}
+        return self.automacao.chave_cache(self.set_path, tester, _br_to_mt5(from_br), _br_to_mt5(to_br))
+
+    def _relatorio_destino(self, from_br: str, to_br: str) -> Path:
+        """Relatório do step (mesmo nome do Report= gerado no INI)"""
+        return self.reports_dir / f"OOS_{_br_to_slug(from_br)}_{_br_to_slug(to_br)}.html"
+
+    def _relatorio_step(self, from_br: str, to_br: str):
+        """Relatório HTML mais recente do step (None se o MT5 não gerou)"""
+        fragmento = f"OOS_{_br_to_slug(from_br)}_{_br_to_slug(to_br)}".lower()
+        candidatos = [fp for fp in self.reports_dir.glob('*.htm*') if fragmento in fp.name.lower()]
+        return max(candidatos, key=lambda fp: fp.stat().st_mtime) if candidatos else None
 
     def _compose_csv_name(self, from_br: str, to_br: str) -> str:
         from_slug, to_slug = _br_to_slug(from_br), _br_to_slug(to_br)
@@ -292,111 +344,411 @@ class OOSBatchRunner:
         ts = time.strftime('%Y%m%d-%H%M%S')
         return f"{sym}_{per}_{set_stem}_OOS_{from_slug}_{to_slug}_{ts}"
 
+    # ------------------------------ Etapas do Step -------------------------- #
+    def _preparar_step(self, from_br: str, to_br: str):
+        """Gera o INI do step; se o resultado estiver em cache, restaura e retorna None"""
+        self._iniciar_job()
+        ini_path = self._build_ini_file(from_br, to_br)
+        print(f"📝 INI gerado: {ini_path.name}")
+        
+        # Step idêntico já executado: restaurar CSV e relatório sem abrir o MT5
+        chave = self._chave_cache(ini_path, from_br, to_br)
+        csv_name = self._compose_csv_name(from_br, to_br)
+        relatorio = self._relatorio_destino(from_br, to_br)
+        saida = self._csv_path(csv_name)
+        if chave and self.automacao._cache.restaurar(chave, saida, relatorio):
+            print(f"♻️ Step restaurado do cache: {saida.name}")
+            self._registrar_job(from_br, to_br, 'cache', chave, saida)
+            return None
+        return StepOOS(from_br, to_br, ini_path, csv_name, chave)
+
+    def _aguardar_processo(self, pre_launch: float, pid: int = None):
+        """Aguarda o processo do terminal aparecer (pid específico ou qualquer terminal64)"""
+        if self.automacao.driver.aguardar_processo(pid, self.window_wait_timeout):
+            print(f"🔎 Processo MT5 detectado em {time.time()-pre_launch:.1f}s")
+        else:
+            print("⚠️ Processo MT5 não detectado (seguindo assim mesmo)")
+
+    def _rodar_step(self, step: 'StepOOS', espera_pre_clique: float):
+        """Monitor, carga do .set, Start, espera do término e exportação do CSV"""
+        with rastreamento.contexto(job=step.csv_name):
+            return self._executar_step(step, espera_pre_clique)
+
+    def _executar_step(self, step: 'StepOOS', espera_pre_clique: float):
+        automacao = self.automacao
+        monitorar = automacao.driver.usa_gui  # terminal real: término pela porta/CPU do metatester
+        if monitorar:
+            print("🎯 Passo 2: Iniciando monitoramento porta 3000...")
+            self._monitor.reset()
+            self._monitor.start()
+        
+        if espera_pre_clique > 0:
+            print(f"⏳ Passo 3: Aguardando {espera_pre_clique:.0f} segundos antes do clique...")
+            time.sleep(espera_pre_clique)
+        
+        if self.inputs_no_ini:
+            print("📋 Passo 4a: inputs do .set já no INI ([TesterInputs]) - sem carga pela interface")
+        else:
+            print("📋 Passo 4a: Carregando arquivo .set via interface...")
+            try:
+                automacao._executar_fase('carregar', lambda: automacao._fase_carregar(self.set_path))
+                print(f"✅ Arquivo .set carregado: {self.set_path.name}")
+                if monitorar:
+                    automacao._aguardar('oos_carregar_set', 3.0)  # carregamento completo
+            except FalhaFase as e:
+                print(f"❌ Erro ao carregar .set: {e}")
+                print("ℹ️ Continuando sem .set - use configuração padrão")
+        
+        print("🖱️ Passo 4b: Clicando no botão 'Iniciar backtesting'...")
+        automacao._executar_fase('iniciar', automacao._fase_iniciar)
+        
+        if monitorar:
+            print("🔍 Verificando conexões após clique...")
+            self._debug_active_ports()
+        
+        inicio, t0 = time.time(), time.perf_counter()
+        try:
+            if not monitorar:
+                # Driver sem processo observável (fake): o próprio driver informa o término
+                with perfilamento.fase('aguardar'):
+                    return automacao._fase_aguardar(step.csv_name, 240)
+            with rastreamento.span('aguardar'), perfilamento.fase('aguardar'):
+                terminou = self._aguardar_termino(step.de, step.ate)
+        finally:
+            automacao._tempos_job['aguardar'] = time.perf_counter() - t0
+        partida = self._monitor.run_start_time
+        if partida is not None:
+            partida = min(max(partida, inicio), time.time())
+            rastreamento.registrar('aguardar_inicio', inicio, partida - inicio)
+            rastreamento.registrar('aguardar_fim', partida, inicio + time.perf_counter() - t0 - partida)
+        return terminou
+
+    def _aguardar_termino(self, from_br: str, to_br: str):
+        """Loop de monitoramento com fallback pelo relatório HTML"""
+        fallback_report_check_after = 25  # TODO: tornar configurável
+        fallback_min_report_size = 5_000   # bytes mínimos para considerar válido (heurística)
+        global_timeout = 240              # TODO: tornar configurável
+        poll_sleep = 0.5                  # intervalo base de polling
+        report_confirmed = False
+        start_wait = time.time()
+        expected_fragment = f"OOS_{_br_to_slug(from_br)}_{_br_to_slug(to_br)}".lower()
+        last_size = 0
+        # Uma linha por worker: o próprio monitor desenha o status, com o step como nome
+        self._monitor.rotulo = f"OOS {from_br}-{to_br} (limite {global_timeout}s)"
+        last_log = 0.0
+        while True:
+            finished, last_log = self._monitor.poll({'last_log': last_log})
+            if finished:
+                break
+            elapsed = time.time() - start_wait
+            # Se ainda em WAITING além de X segundos, checar report como fallback
+            if not report_confirmed and elapsed >= fallback_report_check_after:
+                for fp in self.reports_dir.glob('*.html'):
+                    if expected_fragment in fp.name.lower():
+                        size = fp.stat().st_size
+                        mtime_age = time.time() - fp.stat().st_mtime
+                        if size >= fallback_min_report_size and mtime_age < 120:  # modificado recentemente
+                            report_confirmed = True
+                            console.escrever("📝 Fallback: Report detectado com tamanho suficiente e modificação recente.")
+                            finished = True
+                            break
+                        last_size = size
+            if elapsed >= global_timeout:
+                console.escrever("⚠️ Timeout geral sem detecção de término pela porta")
+                break
+            time.sleep(poll_sleep)
+        console.remover(self._monitor.rotulo)
+        self._monitor.rotulo = None
+        if not finished and report_confirmed:
+            finished = True
+        if not finished:
+            print("⚠️ Prosseguindo apesar do timeout (resultado pode estar incompleto)")
+        return finished
+
+    def _exportar_step(self, step: 'StepOOS'):
+        print("💾 Exportando CSV...")
+        with rastreamento.contexto(job=step.csv_name):
+            csv_path = self._export_csv(step.de, step.ate, step.csv_name)
+        if step.chave:
+            self.automacao._cache.armazenar(step.chave, csv_path, self._relatorio_step(step.de, step.ate),
+                                            descricao=f"{self.set_path.stem} OOS {step.de}-{step.ate}")
+
+    # ------------------------------ Histórico ------------------------------ #
+    def _iniciar_job(self):
+        """Zera tempos por fase e retries do step (acumulados por _executar_fase)"""
+        automacao = self.automacao
+        automacao._tempos_job = {}
+        automacao._retries_job = 0
+        automacao.driver.startup_time = None
+        self._inicio_job = time.time()
+
+    def _registrar_job(self, de: str, ate: str, resultado: str, chave=None, saida=None, causa=None):
+        """Um job no histórico de execuções por step OOS (cache conta como sucesso no resumo)"""
+        self._resultados['falha' if resultado == 'falha' else 'sucesso'] += 1
+        self.automacao._registrar_historico(self.set_path, resultado, self._inicio_job, chave, causa=causa,
+                                            saida=saida, set_nome=f"{self.set_path.stem} OOS {de}-{ate}")
+
+    def _registrar_sucesso(self, step: 'StepOOS'):
+        self._registrar_job(step.de, step.ate, 'sucesso', step.chave, self._csv_path(step.csv_name))
+
+    def _registrar_falha(self, de: str, ate: str, erro: Exception, chave=None):
+        causa = f"{erro.fase}/{erro.causa}" if isinstance(erro, FalhaFase) else 'inesperado'
+        self._registrar_job(de, ate, 'falha', chave, causa=causa)
+
+    def _iniciar_execucao(self, total: int):
+        """Abre a linha de `execucoes` do lote (símbolo/período do template para os jobs)"""
+        automacao = self.automacao
+        self._resultados = {'sucesso': 0, 'falha': 0}
+        if automacao._historico is None:
+            return
+        try:
+            automacao._localidades[self.set_path] = self._ini_generator.extract_symbol_period()
+        except Exception:
+            pass
+        automacao._execucao_id = automacao._historico.iniciar_execucao(automacao.driver.nome, total)
+
+    def _finalizar_execucao(self):
+        automacao = self.automacao
+        if automacao._historico is not None and automacao._execucao_id is not None:
+            automacao._historico.finalizar_execucao(automacao._execucao_id, self._resultados['sucesso'],
+                                                    self._resultados['falha'])
+        automacao._execucao_id = None
+
     # ----------------------------- Execução Batch --------------------------- #
-    def run(self, ranges: List[Tuple[str, str]]):
+    def run(self, ranges: List[Tuple[str, str]], perfilar: bool = False):
         if not ranges:
             print("⚠️ Nenhum range fornecido")
             return
         print(f"\n📋 Executando {len(ranges)} steps OOS...")
+        if perfilar:
+            self.automacao.iniciar_perfilamento()
+        self._iniciar_execucao(len(ranges))
+        try:
+            if not self.automacao.driver.terminal_interativo:
+                self._run_driver(ranges)
+            elif self.reusar_terminal:
+                self._run_reuso(ranges)
+            elif self.terminal_standby:
+                self._run_pipeline(ranges)
+            else:
+                self._run_serial(ranges)
+        finally:
+            self._finalizar_execucao()
+            if perfilar:
+                self.automacao.encerrar_perfilamento()
+        print(f"\n✅ Fim! Resultados organizados:")
+        print(f"  📊 CSVs: {self.csv_dir}")
+        print(f"  📄 Relatórios: {self.reports_dir}")
+        print(f"  🔧 INIs: {self.work_dir}")
+
+    def _run_serial(self, ranges: List[Tuple[str, str]]):
         for idx, (from_br, to_br) in enumerate(ranges, 1):
             print(f"\n🧪 Step {idx}: {from_br} -> {to_br}")
+            step = None
             try:
-                ini_path = self._build_ini_file(from_br, to_br)
-                print(f"📝 INI gerado: {ini_path.name}")
+                step = self._preparar_step(from_br, to_br)
+                if step is None:
+                    continue
                 
-                # NOVO FLUXO: 1) Abrir MT5, 2) Monitor, 3) Aguardar 5s, 4) Clicar Start
+                # NOVO FLUXO: 1) Abrir MT5, 2) Monitor, 3) Aguardar 15s, 4) Clicar Start
                 print("▶️ Passo 1: Abrindo MT5...")
                 pre_launch = time.time()
-                self._launch_mt5_with_ini(ini_path)
-                
-                # Aguardar processo MT5 aparecer
-                import psutil
-                proc_seen = False
-                for _ in range(int(self.window_wait_timeout)):
-                    if any((p.info.get('name') or '').lower().startswith('terminal64') for p in psutil.process_iter(['name'])):
-                        proc_seen = True
-                        break
-                    time.sleep(1)
-                if proc_seen:
-                    print(f"🔎 Processo MT5 detectado em {time.time()-pre_launch:.1f}s")
-                else:
-                    print("⚠️ Processo MT5 não detectado (seguindo assim mesmo)")
+                self._launch_mt5_with_ini(step.ini_path)
+                self._aguardar_processo(pre_launch)
                 
                 # Espera inicial para MT5 carregar completamente
                 if self.post_launch_wait > 0:
                     print(f"⏳ Aguardando MT5 carregar ({self.post_launch_wait}s)...")
                     time.sleep(self.post_launch_wait)
                 
-                print("🎯 Passo 2: Iniciando monitoramento porta 3000...")
-                self._monitor.reset()
-                self._monitor.start()
-                
-                print("⏳ Passo 3: Aguardando 15 segundos antes do clique...")
-                time.sleep(15)
-                
-                print("� Passo 4a: Carregando arquivo .set via interface...")
-                self._load_set_file()
-                
-                print("�🖱️ Passo 4b: Clicando no botão 'Iniciar backtesting'...")
-                self._click_start_backtest()
-                
-                print("🔍 Verificando conexões após clique...")
-                self._debug_active_ports()
-                
-                # ---------------- Loop de monitoramento com fallback ---------------- #
-                fallback_report_check_after = 25  # TODO: tornar configurável
-                fallback_min_report_size = 5_000   # bytes mínimos para considerar válido (heurística)
-                global_timeout = 240              # TODO: tornar configurável
-                poll_sleep = 0.5                  # intervalo base de polling
-                report_confirmed = False
-                start_wait = time.time()
-                expected_fragment = f"OOS_{_br_to_slug(from_br)}_{_br_to_slug(to_br)}".lower()
-                last_size = 0
-                while True:
-                    finished, _last_log = self._monitor.poll({'last_log': 0})
-                    if finished:
-                        break
-                    elapsed = time.time() - start_wait
-                    # Se ainda em WAITING além de X segundos, checar report como fallback
-                    if not report_confirmed and elapsed >= fallback_report_check_after:
-                        for fp in self.reports_dir.glob('*.html'):
-                            if expected_fragment in fp.name.lower():
-                                size = fp.stat().st_size
-                                mtime_age = time.time() - fp.stat().st_mtime
-                                if size >= fallback_min_report_size and mtime_age < 120:  # modificado recentemente
-                                    report_confirmed = True
-                                    print("📝 Fallback: Report detectado com tamanho suficiente e modificação recente.")
-                                    finished = True
-                                    break
-                                last_size = size
-                    if elapsed >= global_timeout:
-                        print("⚠️ Timeout geral sem detecção de término pela porta")
-                        break
-                    time.sleep(poll_sleep)
-                if not finished and report_confirmed:
-                    finished = True
-                if not finished:
-                    print("⚠️ Prosseguindo apesar do timeout (resultado pode estar incompleto)")
-                # Exportar CSV
-                print("💾 Exportando CSV...")
-                self._export_csv(from_br, to_br)
+                self._rodar_step(step, self.espera_pre_clique)
+                self._exportar_step(step)
                 # Encerrar MT5 p/ próximo step
                 print("🛠 Encerrando MT5...")
-                self.automacao.encerrar_mt5(silent=True)
+                self.automacao.driver.encerrar()
                 time.sleep(3)
+                self.automacao._delays.registrar_sucesso()
+                self._registrar_sucesso(step)
                 print("✅ Step concluído")
             except Exception as e:
                 print(f"❌ Erro no step {idx}: {e}")
+                self._registrar_falha(from_br, to_br, e, step.chave if step else None)
                 # Garantir encerramento MT5 antes de seguir
                 try:
-                    self.automacao.encerrar_mt5(silent=True)
+                    self.automacao.driver.encerrar()
                 except Exception:
                     pass
                 time.sleep(2)
-        print(f"\n✅ Fim! Resultados organizados:")
-        print(f"  📊 CSVs: {self.csv_dir}")
-        print(f"  📄 Relatórios: {self.reports_dir}")
-        print(f"  🔧 INIs: {self.work_dir}")
+
+    def _run_driver(self, ranges: List[Tuple[str, str]]):
+        """Steps pelo driver sem GUI (INI/headless ou fake): abrir, carregar, iniciar, aguardar, exportar"""
+        automacao = self.automacao
+        driver = automacao.driver
+        for idx, (from_br, to_br) in enumerate(ranges, 1):
+            print(f"\n🧪 Step {idx}: {from_br} -> {to_br} (driver {driver.nome})")
+            step = None
+            try:
+                step = self._preparar_step(from_br, to_br)
+                if step is None:
+                    continue
+                with rastreamento.contexto(job=step.csv_name):
+                    with rastreamento.span('oos_lancar', ini=step.ini_path.stem), perfilamento.fase('oos_lancar'):
+                        driver.abrir(step.ini_path)
+                    automacao._executar_fase('carregar', lambda: automacao._fase_carregar(self.set_path))
+                    automacao._executar_fase('iniciar', automacao._fase_iniciar)
+                    t0 = time.perf_counter()
+                    with perfilamento.fase('aguardar'):
+                        automacao._fase_aguardar(step.csv_name, 240)
+                    automacao._tempos_job['aguardar'] = time.perf_counter() - t0
+                self._exportar_step(step)
+                automacao._delays.registrar_sucesso()
+                self._registrar_sucesso(step)
+                print("✅ Step concluído")
+            except Exception as e:
+                print(f"❌ Erro no step {idx}: {e}")
+                self._registrar_falha(from_br, to_br, e, step.chave if step else None)
+            finally:
+                driver.encerrar()
+
+    def _run_pipeline(self, ranges: List[Tuple[str, str]]):
+        """Alterna dois terminais: o step N+1 é lançado no outro diretório de dados
+        enquanto o step N exporta, escondendo a latência de abertura/inicialização."""
+        terminais = [Path(self.automacao.mt5_path), Path(self.terminal_standby)]
+        aquecimento = self.post_launch_wait + self.espera_pre_clique
+        self.automacao.driver.encerrar()
+        
+        steps = []
+        for idx, (from_br, to_br) in enumerate(ranges, 1):
+            print(f"\n🧪 Preparando step {idx}: {from_br} -> {to_br}")
+            step = self._preparar_step(from_br, to_br)
+            if step is not None:
+                steps.append((idx, step))
+        if not steps:
+            return
+        
+        print(f"\n⚡ Pipeline com terminal em espera: {terminais[1]}")
+        lancado = self._lancar_standby(steps[0][1], terminais[0], segundo_plano=False)
+        economia_total = 0.0
+        fim_anterior = None
+        for n, (idx, step) in enumerate(steps):
+            proc, lancado_em = lancado
+            print(f"\n🧪 Step {idx}: {step.de} -> {step.ate} (terminal {n % 2 + 1}, PID {proc.pid})")
+            self._iniciar_job()
+            try:
+                # Aquecimento já decorrido em segundo plano não precisa ser esperado
+                sobreposto = time.time() - lancado_em
+                restante = max(aquecimento - sobreposto, 0.0)
+                if fim_anterior is not None:
+                    # Medido: inicialização deste terminal enquanto o step anterior ainda rodava/exportava
+                    economia = min(max(fim_anterior - lancado_em, 0.0), aquecimento)
+                    economia_total += economia
+                    print(f"⚡ Sobreposição medida: {economia:.1f}s de inicialização durante o step anterior")
+                self.automacao.driver.usar_terminal(proc.pid, self.window_wait_timeout)
+                if restante > self.espera_pre_clique:
+                    time.sleep(restante - self.espera_pre_clique)
+                self._rodar_step(step, min(restante, self.espera_pre_clique))
+                
+                # Pré-lançar o próximo step no outro terminal enquanto este exporta
+                if n + 1 < len(steps):
+                    lancado = self._lancar_standby(steps[n + 1][1], terminais[(n + 1) % 2], segundo_plano=True)
+                self._exportar_step(step)
+                self.automacao._delays.registrar_sucesso()
+                self._registrar_sucesso(step)
+                print("✅ Step concluído")
+            except Exception as e:
+                print(f"❌ Erro no step {idx}: {e}")
+                self._registrar_falha(step.de, step.ate, e, step.chave)
+                if n + 1 < len(steps) and lancado[0] is proc:
+                    lancado = self._lancar_standby(steps[n + 1][1], terminais[(n + 1) % 2], segundo_plano=True)
+            finally:
+                print("🛠 Encerrando terminal do step...")
+                self.automacao.driver.encerrar(proc.pid)
+                fim_anterior = time.time()
+        self.automacao.driver.usar_terminal(None)
+        print(f"\n⚡ Inicialização sobreposta (medida): {economia_total:.1f}s em {len(steps)} steps")
+
+    def _run_reuso(self, ranges: List[Tuple[str, str]]):
+        """Mantém o terminal aberto: entre steps só as datas do tester mudam.
+
+        O reinício completo (INI novo) só acontece no primeiro step ou quando o
+        reuso falha; o caminho de cada step fica em `caminhos_steps`.
+        """
+        terminal_ativo = False
+        self.caminhos_steps = []
+        try:
+            for idx, (from_br, to_br) in enumerate(ranges, 1):
+                print(f"\n🧪 Step {idx}: {from_br} -> {to_br}")
+                step = None
+                try:
+                    step = self._preparar_step(from_br, to_br)
+                    if step is None:
+                        self.caminhos_steps.append((idx, 'cache'))
+                        continue
+                    caminho = 'reinicio'
+                    if terminal_ativo:
+                        try:
+                            self._reusar_step(step)
+                            caminho = 'reuso'
+                        except Exception as e:
+                            print(f"⚠️ Reuso falhou ({e}) - reiniciando o terminal")
+                            self.automacao.driver.encerrar()
+                            terminal_ativo = False
+                            caminho = 'reuso_falhou->reinicio'
+                    if not terminal_ativo:
+                        print("▶️ Passo 1: Abrindo MT5...")
+                        pre_launch = time.time()
+                        self._launch_mt5_with_ini(step.ini_path)
+                        self._aguardar_processo(pre_launch)
+                        if self.post_launch_wait > 0:
+                            time.sleep(self.post_launch_wait)
+                        terminal_ativo = True
+                        self._rodar_step(step, self.espera_pre_clique)
+                    self._exportar_step(step)
+                    self.caminhos_steps.append((idx, caminho))
+                    self.automacao._delays.registrar_sucesso()
+                    self._registrar_sucesso(step)
+                    print(f"✅ Step concluído ({caminho})")
+                except Exception as e:
+                    print(f"❌ Erro no step {idx}: {e}")
+                    self._registrar_falha(from_br, to_br, e, step.chave if step else None)
+                    self.caminhos_steps.append((idx, 'erro'))
+                    self.automacao.driver.encerrar()
+                    terminal_ativo = False
+                    time.sleep(2)
+        finally:
+            if terminal_ativo:
+                print("🛠 Encerrando MT5...")
+                self.automacao.driver.encerrar()
+        contagem = {}
+        for _, caminho in self.caminhos_steps:
+            contagem[caminho] = contagem.get(caminho, 0) + 1
+        print(f"\n♻️ Caminhos dos steps: {contagem}")
+
+    def _reusar_step(self, step: 'StepOOS'):
+        """Troca as datas no terminal aberto, roda, confere as datas no diário do tester e
+        salva o relatório do step (o Report= do INI só valeu para o primeiro teste)"""
+        driver = self.automacao.driver
+        driver.aplicar_datas(step.de, step.ate)
+        inicio = time.time()
+        if not self._rodar_step(step, 0):
+            raise RuntimeError("término do backtest não detectado")
+        esperado = (_br_to_mt5(step.de).split()[0], _br_to_mt5(step.ate).split()[0])
+        datas = driver.datas_executadas(inicio)
+        if datas is None:
+            raise RuntimeError("datas do teste não confirmadas no diário do tester")
+        if datas != esperado:
+            raise RuntimeError(f"tester rodou {datas[0]} - {datas[1]}, esperado {esperado[0]} - {esperado[1]}")
+        if not driver.salvar_relatorio(self._relatorio_destino(step.de, step.ate)):
+            raise RuntimeError("relatório do step não foi salvo")
+
+    def _lancar_standby(self, step: 'StepOOS', pasta_terminal: Path, segundo_plano: bool):
+        """Lança o terminal do step sem encerrar os demais. Retorna (Popen, instante)."""
+        pre_launch = time.time()
+        proc = self._launch_mt5_with_ini(step.ini_path, pasta_terminal, encerrar_outros=False,
+                                         segundo_plano=segundo_plano)
+        if not segundo_plano:
+            self._aguardar_processo(pre_launch, proc.pid)
+        return proc, pre_launch
 
     @classmethod
     def create_with_defaults(cls, automacao: MT5Automacao):
@@ -414,77 +766,23 @@ class OOSBatchRunner:
         )
 
     def _debug_active_ports(self):
-        """Debug: mostra portas ativas de processos MT5"""
-        import psutil
-        print("🔍 Debug - Portas ativas do MT5:")
+        """Debug: resumo das portas ativas do MT5 no console, detalhes no log"""
         try:
-            mt5_processes = []
-            for proc in psutil.process_iter(['pid', 'name']):
-                if proc.info['name'] and 'terminal64' in proc.info['name'].lower():
-                    mt5_processes.append(proc.info['pid'])
-            
-            if not mt5_processes:
+            por_porta = self.automacao.driver.conexoes_terminal(self._debug_ports)
+            if por_porta is None:
                 print("⚠️ Nenhum processo terminal64.exe encontrado")
                 return
+            console.detalhe(f"Conexões MT5: {por_porta or 'nenhuma'}", portas=self._debug_ports)
+            if por_porta:
+                print(f"🔍 Portas MT5 ativas: {', '.join(str(p) for p in sorted(por_porta))}")
             else:
-                print(f"✅ Processos MT5 encontrados: {mt5_processes}")
-                
-            found_any = False
-            for port in self._debug_ports:
-                connections = []
-                for c in psutil.net_connections():
-                    if (c.laddr and c.laddr.port == port and 
-                        c.pid in mt5_processes):
-                        connections.append(f"{c.status}(PID={c.pid})")
-                if connections:
-                    print(f"  ✅ Porta {port}: {', '.join(connections)}")
-                    found_any = True
-                    
-            if not found_any:
-                print("⚠️ Nenhuma conexão encontrada nas portas monitoradas")
-                print(f"   Portas verificadas: {self._debug_ports}")
-                
+                print(f"⚠️ Nenhuma conexão nas portas monitoradas {self._debug_ports}")
         except Exception as e:
             print(f"⚠️ Erro no debug de portas: {e}")
 
-    def _click_start_backtest(self):
-        """Clica no botão 'Iniciar backtesting' usando o método já testado da automação"""
-        try:
-            # Usar o método que já funciona na rotina 1
-            print("⚡ Iniciando backtest via método testado...")
-            self.automacao.iniciar_backtest()
-            
-        except Exception as e:
-            print(f"❌ Erro ao iniciar backtest: {e}")
-            # Fallback: tentar método manual
-            try:
-                self.automacao.focar_mt5()
-                time.sleep(1)
-                if 'start_button' in self.automacao.coords:
-                    import pyautogui
-                    start_coord = self.automacao.coords['start_button']
-                    print(f"� Fallback - clicando em ({start_coord[0]}, {start_coord[1]})")
-                    pyautogui.click(start_coord[0], start_coord[1])
-                    time.sleep(0.5)
-            except Exception as e2:
-                print(f"❌ Fallback também falhou: {e2}")
-
-    def _load_set_file(self):
-        """Carrega arquivo .set via interface do MT5"""
-        try:
-            # Usar método correto da automação existente
-            print(f"📋 Carregando: {self.set_path.name}")
-            self.automacao.carregar_set_file(str(self.set_path))
-            print(f"✅ Arquivo .set carregado: {self.set_path.name}")
-            time.sleep(3)  # Aguardar carregamento completo
-            
-        except Exception as e:
-            print(f"❌ Erro ao carregar .set: {e}")
-            print("ℹ️ Continuando sem .set - use configuração padrão")
-
     # Compatibilidade com interface antiga
-    def run_batch(self, ranges: List[Tuple[str, str]]):
-        self.run(ranges)
+    def run_batch(self, ranges: List[Tuple[str, str]], perfilar: bool = False):
+        self.run(ranges, perfilar)
 
 # Alias para manter import existente (from extracao_oos import ExtracaoOOS)
 ExtracaoOOS = OOSBatchRunner
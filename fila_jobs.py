@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""Fila persistente de jobs (.set) em SQLite com checkpoint e retomada.
+
+Se o Python cair ou a máquina reiniciar no set 3.400 de 5.000, a execução
+retomada pula o que já foi concluído e devolve à fila os jobs que estavam
+em execução (lease expirado ou processo dono morto).
+
+Registros compactos (estado inteiro, caminho único indexado), então filas
+de 100k entradas abrem instantaneamente: nada é carregado em memória além
+do próximo job.
+"""
+from __future__ import annotations
+
+import os
+import socket
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+PENDENTE, EM_EXECUCAO, CONCLUIDO, FALHA = 0, 1, 2, 3
+NOMES_ESTADO = {PENDENTE: 'pendente', EM_EXECUCAO: 'em_execucao', CONCLUIDO: 'concluido', FALHA: 'falha'}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    caminho TEXT NOT NULL UNIQUE,
+    ordem INTEGER NOT NULL,
+    estado INTEGER NOT NULL DEFAULT 0,
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    dono TEXT,
+    lease_ate REAL,
+    inicio REAL,
+    duracao REAL,
+    saida TEXT,
+    erro TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_estado_ordem ON jobs (estado, ordem);
+"""
+
+
+@dataclass
+class Job:
+    id: int
+    caminho: Path
+    ordem: int
+    tentativas: int
+
+
+def _dono_atual() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _dono_vivo(dono: Optional[str]) -> bool:
+    """True se o processo dono ainda existe (donos de outro host são considerados vivos)."""
+    if not dono:
+        return False
+    host, _, pid = dono.rpartition(':')
+    if host != socket.gethostname():
+        return True
+    try:
+        import psutil
+        return psutil.pid_exists(int(pid))
+    except Exception:
+        return True
+
+
+class FilaJobs:
+    """Fila durável de jobs com lease por processo."""
+
+    def __init__(self, caminho: Path, lease_segundos: float = 1800.0):
+        self.caminho = Path(caminho)
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_segundos = lease_segundos
+        self.dono = _dono_atual()
+        self._con = sqlite3.connect(str(self.caminho), timeout=30, isolation_level=None)
+        self._con.execute('PRAGMA journal_mode=WAL')
+        self._con.execute('PRAGMA synchronous=NORMAL')
+        self._con.executescript(_SCHEMA)
+
+    def fechar(self):
+        self._con.close()
+
+    # ------------------------------ Montagem ------------------------------ #
+    def limpar(self):
+        self._con.execute('DELETE FROM jobs')
+
+    def enfileirar(self, caminhos: Iterable[Path]) -> int:
+        """Adiciona jobs novos (caminhos já presentes são ignorados). Retorna quantos entraram."""
+        antes = self._con.total_changes
+        with self._con:  # COMMIT no fim, ROLLBACK se um insert falhar (conexão não fica em transação)
+            self._con.execute('BEGIN IMMEDIATE')
+            inicio = self._con.execute('SELECT COALESCE(MAX(ordem), -1) + 1 FROM jobs').fetchone()[0]
+            self._con.executemany(
+                'INSERT OR IGNORE INTO jobs (caminho, ordem) VALUES (?, ?)',
+                ((str(c), inicio + i) for i, c in enumerate(caminhos)),
+            )
+        return self._con.total_changes - antes
+
+    def recuperar_leases(self, incluir_falhas: bool = True) -> int:
+        """Devolve à fila jobs em execução órfãos (lease vencido ou dono morto).
+
+        Jobs de outro processo vivo com lease válido não são tocados.
+        """
+        agora = time.time()
+        self._con.execute('BEGIN IMMEDIATE')
+        orfaos = [
+            (job_id,) for job_id, dono, lease in self._con.execute(
+                'SELECT id, dono, lease_ate FROM jobs WHERE estado = ?', (EM_EXECUCAO,))
+            if (lease or 0) < agora or not _dono_vivo(dono)
+        ]
+        self._con.executemany(
+            'UPDATE jobs SET estado = 0, dono = NULL, lease_ate = NULL WHERE id = ?', orfaos)
+        if incluir_falhas:
+            self._con.execute('UPDATE jobs SET estado = 0, erro = NULL WHERE estado = ?', (FALHA,))
+        self._con.execute('COMMIT')
+        return len(orfaos)
+
+    # ------------------------------- Execução ------------------------------ #
+    def proximo(self) -> Optional[Job]:
+        """Obtém o próximo job pendente e o marca como em execução (atômico)."""
+        agora = time.time()
+        self._con.execute('BEGIN IMMEDIATE')
+        try:
+            row = self._con.execute(
+                'SELECT id, caminho, ordem, tentativas FROM jobs WHERE estado = 0 ORDER BY ordem LIMIT 1'
+            ).fetchone()
+            if row is None:
+                return None
+            self._con.execute(
+                'UPDATE jobs SET estado = 1, dono = ?, lease_ate = ?, inicio = ?, tentativas = tentativas + 1 '
+                'WHERE id = ?', (self.dono, agora + self.lease_segundos, agora, row[0]))
+            return Job(row[0], Path(row[1]), row[2], row[3] + 1)
+        finally:
+            self._con.execute('COMMIT')
+
+    def renovar(self, job: Job):
+        """Estende o lease de um job deste processo (chamado durante backtests longos)."""
+        self._con.execute('UPDATE jobs SET lease_ate = ? WHERE id = ? AND dono = ?',
+                          (time.time() + self.lease_segundos, job.id, self.dono))
+
+    def concluir(self, job: Job, saida: Optional[Path] = None):
+        self._con.execute(
+            'UPDATE jobs SET estado = 2, duracao = ? - inicio, saida = ?, lease_ate = NULL, erro = NULL '
+            'WHERE id = ?', (time.time(), str(saida) if saida else None, job.id))
+
+    def falhar(self, job: Job, erro: str = ''):
+        self._con.execute(
+            'UPDATE jobs SET estado = 3, duracao = ? - inicio, erro = ?, lease_ate = NULL WHERE id = ?',
+            (time.time(), erro[:500], job.id))
+
+    def devolver(self, job: Job):
+        """Devolve à fila um job ainda em execução por este processo (ex.: Ctrl+C)."""
+        self._con.execute(
+            'UPDATE jobs SET estado = 0, dono = NULL, lease_ate = NULL WHERE id = ? AND estado = 1 AND dono = ?',
+            (job.id, self.dono))
+
+    # ------------------------------- Consulta ------------------------------ #
+    def contagem(self) -> Dict[str, int]:
+        contagem = {nome: 0 for nome in NOMES_ESTADO.values()}
+        for estado, n in self._con.execute('SELECT estado, COUNT(*) FROM jobs GROUP BY estado'):
+            contagem[NOMES_ESTADO[estado]] = n
+        return contagem
+
+    def total(self) -> int:
+        return self._con.execute('SELECT COUNT(*) FROM jobs').fetchone()[0]
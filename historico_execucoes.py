@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""Histórico de execuções em SQLite (WAL): um registro por job de cada lote.
+
+Guarda, por job: hash das entradas (chave do cache), tempo de cada fase,
+resultado e causa, retries, host/worker, arquivo de saída e métricas da curva
+(lucro, drawdown máximo). Vários workers gravam no mesmo banco: cada um tem a
+própria conexão e cada job é um único INSERT em transação curta, então em WAL
+os escritores quase nunca esperam e os leitores (menu do starter) nunca travam.
+
+Consultas:
+    python historico_execucoes.py lentos --limite 20
+    python historico_execucoes.py simbolos
+    python historico_execucoes.py tendencia --dias 30
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import socket
+import sqlite3
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parent
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS execucoes (
+    id INTEGER PRIMARY KEY,
+    inicio REAL NOT NULL,
+    fim REAL,
+    host TEXT,
+    worker TEXT,
+    driver TEXT,
+    total INTEGER,
+    sucessos INTEGER,
+    falhas INTEGER
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    execucao_id INTEGER,
+    set_nome TEXT NOT NULL,
+    caminho TEXT,
+    chave TEXT,
+    simbolo TEXT,
+    periodo TEXT,
+    inicio REAL NOT NULL,
+    duracao REAL,
+    resultado TEXT NOT NULL,
+    causa TEXT,
+    retries INTEGER NOT NULL DEFAULT 0,
+    host TEXT,
+    worker TEXT,
+    saida TEXT,
+    t_carregar REAL,
+    t_iniciar REAL,
+    t_aguardar REAL,
+    t_inicializacao REAL,
+    t_exportar REAL,
+    lucro REAL,
+    drawdown_max REAL,
+    pontos INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_duracao ON jobs (duracao);
+CREATE INDEX IF NOT EXISTS idx_jobs_simbolo ON jobs (simbolo, resultado);
+CREATE INDEX IF NOT EXISTS idx_jobs_inicio ON jobs (inicio);
+CREATE INDEX IF NOT EXISTS idx_jobs_set ON jobs (set_nome, inicio);
+CREATE INDEX IF NOT EXISTS idx_jobs_execucao ON jobs (execucao_id);
+"""
+
+RESULTADOS = ('sucesso', 'falha', 'cache')
+
+
+@dataclass
+class RegistroJob:
+    set_nome: str
+    inicio: float
+    duracao: float
+    resultado: str  # 'sucesso' | 'falha' | 'cache'
+    caminho: Optional[str] = None
+    chave: Optional[str] = None
+    simbolo: Optional[str] = None
+    periodo: Optional[str] = None
+    causa: Optional[str] = None
+    retries: int = 0
+    saida: Optional[str] = None
+    tempos: Dict[str, float] = field(default_factory=dict)  # fase -> segundos
+    lucro: Optional[float] = None
+    drawdown_max: Optional[float] = None
+    pontos: Optional[int] = None
+
+
+def metricas_curva(caminho: Path) -> Dict[str, Optional[float]]:
+    """Lucro, drawdown máximo de equity e nº de pontos do CSV exportado pelo MT5.
+
+    Formato: <DATE>\\t<BALANCE>\\t<EQUITY>... (UTF-16 ou UTF-8); vazio se não der para ler.
+    """
+    try:
+        dados = Path(caminho).read_bytes()
+    except OSError:
+        return {}
+    texto = dados.decode('utf-16') if dados.startswith((b'\xff\xfe', b'\xfe\xff')) else dados.decode('utf-8', 'ignore')
+    saldos, equity = [], []
+    for linha in texto.splitlines()[1:]:
+        colunas = linha.replace(',', '\t').split('\t')
+        if len(colunas) < 3:
+            continue
+        try:
+            saldos.append(float(colunas[1]))
+            equity.append(float(colunas[2]))
+        except ValueError:
+            continue
+    if not saldos:
+        return {}
+    pico, drawdown = equity[0], 0.0
+    for valor in equity:
+        pico = max(pico, valor)
+        drawdown = max(drawdown, pico - valor)
+    return {'lucro': saldos[-1] - saldos[0], 'drawdown_max': drawdown, 'pontos': len(saldos)}
+
+
+class HistoricoExecucoes:
+    """Banco de histórico compartilhado entre workers (uma conexão por instância)."""
+
+    def __init__(self, caminho: Path = None):
+        self.caminho = Path(caminho) if caminho else BASE_DIR / 'historico_execucoes.sqlite'
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        self.host = socket.gethostname()
+        self.worker = f"{self.host}:{os.getpid()}"
+        self._con = sqlite3.connect(str(self.caminho), timeout=30, isolation_level=None)
+        self._con.row_factory = sqlite3.Row
+        self._con.execute('PRAGMA journal_mode=WAL')
+        self._con.execute('PRAGMA synchronous=NORMAL')
+        self._con.execute('PRAGMA busy_timeout=30000')
+        self._con.executescript(_SCHEMA)
+
+    @classmethod
+    def do_config(cls, config) -> Optional['HistoricoExecucoes']:
+        """Histórico da seção [Historico] do config.ini (None se desabilitado ou indisponível)."""
+        secao = config['Historico'] if config.has_section('Historico') else {}
+        if str(secao.get('habilitado', 'true')).strip().lower() in ('0', 'false', 'nao', 'não', 'no'):
+            return None
+        try:
+            return cls(Path(secao['caminho']) if secao.get('caminho') else None)
+        except sqlite3.Error as e:
+            print(f"⚠️ Histórico de execuções indisponível: {e}")
+            return None
+
+    def fechar(self):
+        self._con.close()
+
+    # ─────────────────────────────── escrita ───────────────────────────────
+
+    def iniciar_execucao(self, driver: str = None, total: int = None) -> int:
+        cur = self._con.execute(
+            "INSERT INTO execucoes (inicio, host, worker, driver, total) VALUES (?, ?, ?, ?, ?)",
+            (time.time(), self.host, self.worker, driver, total))
+        return cur.lastrowid
+
+    def finalizar_execucao(self, execucao_id: int, sucessos: int, falhas: int):
+        self._con.execute("UPDATE execucoes SET fim = ?, sucessos = ?, falhas = ? WHERE id = ?",
+                          (time.time(), sucessos, falhas, execucao_id))
+
+    def registrar_job(self, registro: RegistroJob, execucao_id: int = None) -> int:
+        """Um INSERT em autocommit: transação curta, sem segurar o lock de escrita."""
+        r = asdict(registro)
+        tempos = r.pop('tempos')
+        cur = self._con.execute(
+            """INSERT INTO jobs (execucao_id, set_nome, caminho, chave, simbolo, periodo, inicio, duracao,
+                                 resultado, causa, retries, host, worker, saida, t_carregar, t_iniciar,
+                                 t_aguardar, t_inicializacao, t_exportar, lucro, drawdown_max, pontos)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (execucao_id, r['set_nome'], r['caminho'], r['chave'], r['simbolo'], r['periodo'], r['inicio'],
+             r['duracao'], r['resultado'], r['causa'], r['retries'], self.host, self.worker, r['saida'],
+             tempos.get('carregar'), tempos.get('iniciar'), tempos.get('aguardar'), tempos.get('inicializacao'),
+             tempos.get('exportar'), r['lucro'], r['drawdown_max'], r['pontos']))
+        return cur.lastrowid
+
+    # ─────────────────────────────── consultas ─────────────────────────────
+
+    def _consulta(self, sql: str, parametros: tuple = ()) -> List[dict]:
+        return [dict(linha) for linha in self._con.execute(sql, parametros)]
+
+    def mais_lentos(self, limite: int = 10) -> List[dict]:
+        """Jobs executados (sem cache) de maior duração."""
+        return self._consulta(
+            """SELECT set_nome, simbolo, periodo, duracao, t_aguardar, t_exportar, retries, resultado,
+                      datetime(inicio, 'unixepoch', 'localtime') AS quando
+               FROM jobs WHERE resultado != 'cache' ORDER BY duracao DESC LIMIT ?""", (limite,))
+
+    def falhas_por_simbolo(self) -> List[dict]:
+        return self._consulta(
+            """SELECT COALESCE(simbolo, '?') AS simbolo, COUNT(*) AS jobs,
+                      SUM(resultado = 'falha') AS falhas,
+                      ROUND(100.0 * SUM(resultado = 'falha') / COUNT(*), 1) AS taxa_falha,
+                      ROUND(AVG(CASE WHEN resultado = 'sucesso' THEN duracao END), 1) AS duracao_media
+               FROM jobs GROUP BY simbolo ORDER BY taxa_falha DESC, jobs DESC""")
+
+    def causas_falha(self, limite: int = 10) -> List[dict]:
+        return self._consulta(
+            """SELECT causa, COUNT(*) AS ocorrencias FROM jobs WHERE resultado = 'falha'
+               GROUP BY causa ORDER BY ocorrencias DESC LIMIT ?""", (limite,))
+
+    def tendencia_duracao(self, dias: int = 30) -> List[dict]:
+        """Duração média por dia (jobs executados), últimos `dias` dias."""
+        return self._consulta(
+            """SELECT date(inicio, 'unixepoch', 'localtime') AS dia, COUNT(*) AS jobs,
+                      ROUND(AVG(duracao), 1) AS duracao_media, ROUND(AVG(t_aguardar), 1) AS aguardar_medio,
+                      ROUND(AVG(duracao - COALESCE(t_aguardar, 0)), 1) AS overhead_medio
+               FROM jobs WHERE resultado != 'cache' AND inicio >= ?
+               GROUP BY dia ORDER BY dia""", (time.time() - dias * 86400,))
+
+    def ultimas_execucoes(self, limite: int = 10) -> List[dict]:
+        return self._consulta(
+            """SELECT id, datetime(inicio, 'unixepoch', 'localtime') AS inicio, ROUND(fim - inicio, 1) AS duracao,
+                      host, driver, total, sucessos, falhas
+               FROM execucoes ORDER BY id DESC LIMIT ?""", (limite,))
+
+
+CONSULTAS = {
+    'lentos': ('🐢 Sets mais lentos', lambda h, limite, dias: h.mais_lentos(limite)),
+    'simbolos': ('📉 Taxa de falha por símbolo', lambda h, limite, dias: h.falhas_por_simbolo()),
+    'causas': ('❌ Causas de falha', lambda h, limite, dias: h.causas_falha(limite)),
+    'tendencia': ('📈 Tendência de duração por dia', lambda h, limite, dias: h.tendencia_duracao(dias)),
+    'execucoes': ('🗂️ Últimas execuções', lambda h, limite, dias: h.ultimas_execucoes(limite)),
+}
+
+
+def imprimir_tabela(linhas: List[dict]):
+    if not linhas:
+        print("   (sem registros)")
+        return
+    colunas = list(linhas[0])
+    larguras = {c: max(len(c), *(len(_fmt(l[c])) for l in linhas)) for c in colunas}
+    print("   " + "  ".join(c.ljust(larguras[c]) for c in colunas))
+    print("   " + "  ".join('─' * larguras[c] for c in colunas))
+    for l in linhas:
+        print("   " + "  ".join(_fmt(l[c]).ljust(larguras[c]) for c in colunas))
+
+
+def _fmt(valor) -> str:
+    if valor is None:
+        return '-'
+    if isinstance(valor, float):
+        return f"{valor:.1f}"
+    return str(valor)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Consultas ao histórico de execuções")
+    parser.add_argument('consulta', choices=sorted(CONSULTAS))
+    parser.add_argument('--limite', type=int, default=10)
+    parser.add_argument('--dias', type=int, default=30)
+    parser.add_argument('--banco', type=Path, default=None)
+    args = parser.parse_args()
+
+    historico = HistoricoExecucoes(args.banco)
+    titulo, consulta = CONSULTAS[args.consulta]
+    print(titulo)
+    imprimir_tabela(consulta(historico, args.limite, args.dias))
+    historico.fechar()
+
+
+if __name__ == "__main__":
+    main()
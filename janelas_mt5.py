@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""Registro de janelas do MT5 (PID do terminal -> handle da janela).
+
+Substitui as varreduras repetidas de `pyautogui.getAllWindows()` por um
+registro preenchido uma vez e validado em O(1) a cada consulta:
+
+- a entrada é descartada quando a janela é destruída (IsWindow) ou quando
+  o título muda (troca de conta/servidor);
+- o PID do terminal é obtido via GetWindowThreadProcessId, permitindo
+  endereçar vários terminais abertos ao mesmo tempo.
+
+Fora do Windows (ou sem ctypes.windll) a validação cai para a leitura do
+título via objeto da janela, e todas as janelas ficam sob o PID 0.
+"""
+from __future__ import annotations
+
+import ctypes
+import os
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+_user32 = ctypes.windll.user32 if os.name == 'nt' else None
+
+
+class _POINT(ctypes.Structure):
+    _fields_ = [('x', ctypes.c_long), ('y', ctypes.c_long)]
+
+
+class _RECT(ctypes.Structure):
+    _fields_ = [('left', ctypes.c_long), ('top', ctypes.c_long),
+                ('right', ctypes.c_long), ('bottom', ctypes.c_long)]
+
+
+def dpi_sistema() -> int:
+    """DPI lógico do sistema (96 = escala 100%)."""
+    if _user32 is not None:
+        try:
+            return int(_user32.GetDpiForSystem())
+        except Exception:
+            pass
+    return 96
+
+
+def chave_perfil_tela(tamanho: Tuple[int, int] = None) -> str:
+    """Chave do perfil de coordenadas para a geometria atual: "1920x1080@96"."""
+    if tamanho is None:
+        import pyautogui
+        tamanho = pyautogui.size()
+    return f"{tamanho[0]}x{tamanho[1]}@{dpi_sistema()}"
+
+
+def titulo_parece_mt5(titulo: str) -> bool:
+    """Heurística de título do MT5, independente da corretora.
+
+    Exemplos: "12656329 - XPMT5-PRD - Netting - XP Investimentos"
+              "123456 - MetaTrader 5 - Hedging - Clear"
+    """
+    if not titulo:
+        return False
+    titulo_lower = titulo.lower()
+    # Padrão 1: Contém "Netting" ou "Hedging" (modo de conta MT5)
+    if 'netting' in titulo_lower or 'hedging' in titulo_lower:
+        return True
+    # Padrão 2: Contém "XPMT5" ou similar
+    if 'xpmt5' in titulo_lower or 'mt5-' in titulo_lower:
+        return True
+    # Padrão 3: Título começa com número (conta) e tem MetaTrader
+    return titulo[0].isdigit() and 'metatrader' in titulo_lower
+
+
+def _hwnd(janela) -> Optional[int]:
+    return getattr(janela, '_hWnd', None)
+
+
+def _pid_da_janela(hwnd: Optional[int]) -> int:
+    if _user32 is None or not hwnd:
+        return 0
+    pid = ctypes.c_ulong()
+    _user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+    return pid.value
+
+
+def _titulo_atual(entrada: '_Entrada') -> Optional[str]:
+    if _user32 is not None and entrada.hwnd:
+        if not _user32.IsWindow(entrada.hwnd):
+            return None
+        buf = ctypes.create_unicode_buffer(512)
+        _user32.GetWindowTextW(entrada.hwnd, buf, 512)
+        return buf.value
+    try:
+        return entrada.janela.title
+    except Exception:
+        return None
+
+
+def origem_cliente(janela) -> Tuple[int, int]:
+    """Canto superior esquerdo da área cliente da janela, em coordenadas de tela.
+
+    Sem Win32, usa o canto da janela (inclui borda/título, mas é estável
+    enquanto a decoração da janela não mudar).
+    """
+    hwnd = _hwnd(janela)
+    if _user32 is not None and hwnd:
+        pt = _POINT(0, 0)
+        if _user32.ClientToScreen(hwnd, ctypes.byref(pt)):
+            return pt.x, pt.y
+    return janela.left, janela.top
+
+
+def minimizada(janela) -> bool:
+    """Janela minimizada (IsIconic; sem Win32, pelo objeto ou pela posição -32000 do Windows)."""
+    hwnd = _hwnd(janela)
+    if _user32 is not None and hwnd:
+        return bool(_user32.IsIconic(hwnd))
+    if getattr(janela, 'isMinimized', False):
+        return True
+    return janela.left <= -32000 or janela.top <= -32000
+
+
+def area_cliente(janela) -> Tuple[int, int, int, int]:
+    """Área cliente da janela em coordenadas de tela: (x, y, largura, altura)."""
+    ox, oy = origem_cliente(janela)
+    hwnd = _hwnd(janela)
+    if _user32 is not None and hwnd:
+        rect = _RECT()
+        if _user32.GetClientRect(hwnd, ctypes.byref(rect)):
+            return ox, oy, rect.right - rect.left, rect.bottom - rect.top
+    return ox, oy, janela.left + janela.width - ox, janela.top + janela.height - oy
+
+
+@dataclass
+class _Entrada:
+    janela: Any
+    hwnd: Optional[int]
+    pid: int
+    titulo: str
+
+
+class RegistroJanelasMT5:
+    """Mapa PID -> janela do terminal, invalidado em destruição/troca de título."""
+
+    def __init__(self, listar_janelas: Callable[[], List[Any]] = None):
+        self._listar = listar_janelas
+        self._por_pid: Dict[int, _Entrada] = {}
+        self.varreduras = 0
+
+    def _listar_janelas(self) -> List[Any]:
+        if self._listar is None:
+            import pyautogui
+            self._listar = pyautogui.getAllWindows
+        return self._listar()
+
+    def atualizar(self):
+        """Varre as janelas do desktop e reconstrói o registro."""
+        self.varreduras += 1
+        registro: Dict[int, _Entrada] = {}
+        for janela in self._listar_janelas():
+            titulo = janela.title
+            if not titulo_parece_mt5(titulo):
+                continue
+            hwnd = _hwnd(janela)
+            pid = _pid_da_janela(hwnd)
+            # Primeira janela por PID (a principal é enumerada antes das filhas)
+            registro.setdefault(pid, _Entrada(janela, hwnd, pid, titulo))
+        self._por_pid = registro
+
+    def _valida(self, entrada: _Entrada) -> bool:
+        return _titulo_atual(entrada) == entrada.titulo
+
+    def _entrada(self, pid: Optional[int]) -> Optional[_Entrada]:
+        if pid is None:
+            return self._por_pid[min(self._por_pid)] if self._por_pid else None
+        return self._por_pid.get(pid)
+
+    def janela(self, pid: Optional[int] = None):
+        """Retorna a janela do terminal `pid` (ou a primeira registrada)."""
+        entrada = self._entrada(pid)
+        if entrada is not None and self._valida(entrada):
+            return entrada.janela
+        # Janela destruída, título alterado ou ainda não registrada
+        self.invalidar(pid)
+        self.atualizar()
+        entrada = self._entrada(pid)
+        return entrada.janela if entrada is not None else None
+
+    def hwnd(self, pid: Optional[int] = None) -> Optional[int]:
+        janela = self.janela(pid)
+        return _hwnd(janela) if janela is not None else None
+
+    def origem_cliente(self, pid: Optional[int] = None) -> Optional[Tuple[int, int]]:
+        """Origem atual da área cliente do terminal (None se a janela não existe)."""
+        janela = self.janela(pid)
+        return origem_cliente(janela) if janela is not None else None
+
+    def minimizada(self, pid: Optional[int] = None) -> bool:
+        janela = self.janela(pid)
+        return janela is not None and minimizada(janela)
+
+    def em_foco(self, pid: Optional[int] = None) -> bool:
+        """Verifica em O(1) se a janela do terminal está em primeiro plano."""
+        janela = self.janela(pid)
+        if janela is None:
+            return False
+        hwnd = _hwnd(janela)
+        if _user32 is not None and hwnd:
+            return _user32.GetForegroundWindow() == hwnd
+        return bool(janela.isActive)
+
+    def invalidar(self, pid: Optional[int] = None):
+        """Descarta a entrada do PID (ou todo o registro se pid for None)."""
+        if pid is None:
+            self._por_pid.clear()
+        else:
+            self._por_pid.pop(pid, None)
+
+    def pids(self) -> List[int]:
+        if not self._por_pid:
+            self.atualizar()
+        return sorted(self._por_pid)
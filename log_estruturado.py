@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""Log estruturado sem bloqueio: fila + thread de escrita, JSON por linha.
+
+- O chamador só enfileira o registro (`QueueHandler`); a escrita em disco fica
+  com uma thread (`QueueListener`), então o log no loop de poll não espera I/O.
+- Cada registro é um JSON com nível, mensagem, worker (host:pid), thread e o
+  contexto do job (`rastreamento.contexto`), capturados na thread que logou.
+- Um arquivo por processo (logs/automacao_<data>_<pid>.jsonl): workers em
+  processos diferentes nunca disputam o mesmo arquivo; `agregar` intercala tudo
+  por horário, inclusive os rotacionados.
+- Rotação por tamanho com gzip; arquivos de sessões encerradas são comprimidos
+  ao iniciar uma nova.
+
+Consulta:
+    python log_estruturado.py                       # todos os logs, em ordem
+    python log_estruturado.py --job set_001 --nivel WARNING
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import shutil
+import socket
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+
+import rastreamento
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# Arquivos com o PID do processo dono após a data (…_<aaaammdd>_<hhmmss>_<pid>.jsonl)
+PID_NO_NOME = re.compile(r"_\d{8}_\d{6}_(\d+)\.(?:jsonl|log)$")
+IDADE_MIN_SEM_PID = 3600  # s: arquivos antigos sem PID no nome só são comprimidos após 1 h
+
+
+class FiltroContexto(logging.Filter):
+    """Anexa worker e contexto do job ao registro na thread que logou (antes da fila)."""
+
+    def __init__(self, worker: str):
+        super().__init__()
+        self.worker = worker
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.worker = self.worker
+        record.contexto = rastreamento.atributos_contexto()
+        return True
+
+
+class HandlerFila(logging.handlers.QueueHandler):
+    """QueueHandler que preserva o traceback.
+
+    O `prepare` padrão cola o traceback na mensagem e apaga exc_info/exc_text;
+    aqui a mensagem fica limpa e o traceback segue formatado em exc_text (texto,
+    sem referências a frames) até o campo 'excecao' do JSON.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or _FORMATADOR_EXCECAO.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_FORMATADOR_EXCECAO = logging.Formatter()
+
+
+class FormatadorJSON(logging.Formatter):
+    """Uma linha JSON por registro."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        dados = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'msg': record.getMessage(),
+            'worker': getattr(record, 'worker', None),
+            'pid': record.process,
+            'thread': record.threadName,
+        }
+        dados.update(getattr(record, 'contexto', None) or {})
+        dados.update(getattr(record, 'campos', None) or {})
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            dados['excecao'] = record.exc_text
+        return json.dumps(dados, ensure_ascii=False, default=str)
+
+
+def _nome_gz(nome: str) -> str:
+    return f"{nome}.gz"
+
+
+def _comprimir(origem: str, destino: str):
+    with open(origem, 'rb') as f_in, gzip.open(destino, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(origem)
+
+
+def handler_rotativo(caminho: Path, max_mb: float = 10.0, backups: int = 5) -> logging.Handler:
+    """RotatingFileHandler que comprime os arquivos rotacionados (.1.gz, .2.gz...)."""
+    handler = logging.handlers.RotatingFileHandler(
+        caminho, maxBytes=int(max_mb * 1024 * 1024), backupCount=backups, encoding='utf-8', delay=True)
+    handler.namer = _nome_gz
+    handler.rotator = _comprimir
+    handler.setFormatter(FormatadorJSON())
+    return handler
+
+
+def _pid_vivo(pid: int) -> bool:
+    try:
+        import psutil
+        return psutil.pid_exists(pid)
+    except ImportError:
+        return True  # sem psutil não dá para saber: não mexe no arquivo
+
+
+def comprimir_antigos(pasta: Path, exceto: Iterable[Path] = ()) -> int:
+    """Comprime logs/spans de sessões encerradas (dono morto ou arquivo antigo). Retorna a quantidade."""
+    exceto = {Path(p).resolve() for p in exceto}
+    comprimidos = 0
+    for caminho in list(pasta.glob('*.log')) + list(pasta.glob('*.jsonl')):
+        if caminho.resolve() in exceto:
+            continue
+        try:
+            m = PID_NO_NOME.search(caminho.name)
+            if m:
+                if int(m.group(1)) == os.getpid() or _pid_vivo(int(m.group(1))):
+                    continue
+            elif time.time() - caminho.stat().st_mtime < IDADE_MIN_SEM_PID:
+                continue
+            _comprimir(str(caminho), _nome_gz(str(caminho)))
+            comprimidos += 1
+        except OSError:
+            continue  # em uso por outro processo (Windows) ou já removido
+    return comprimidos
+
+
+class LogAssincrono:
+    """Logger com QueueHandler na frente e QueueListener gravando em arquivo rotativo."""
+
+    def __init__(self, nome: str, pasta: Path, prefixo: str = 'automacao', max_mb: float = 10.0,
+                 backups: int = 5, worker: str = None):
+        self.pasta = Path(pasta)
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        self.worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+        self.caminho = self.pasta / f"{prefixo}_{datetime.now():%Y%m%d_%H%M%S}_{os.getpid()}.jsonl"
+
+        self.logger = logging.getLogger(nome)
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.propagate = False
+        for antigo in list(self.logger.handlers):
+            self.logger.removeHandler(antigo)
+
+        self._fila: queue.SimpleQueue = queue.SimpleQueue()
+        handler_fila = HandlerFila(self._fila)
+        handler_fila.addFilter(FiltroContexto(self.worker))
+        self.logger.addHandler(handler_fila)
+
+        self.handler_arquivo = handler_rotativo(self.caminho, max_mb, backups)
+        self.handler_arquivo.setLevel(logging.DEBUG)
+        self._listener = logging.handlers.QueueListener(self._fila, self.handler_arquivo,
+                                                        respect_handler_level=True)
+        self._listener.start()
+        # Compressão de sessões antigas fora do caminho crítico
+        threading.Thread(target=comprimir_antigos, args=(self.pasta, [self.caminho]),
+                         name='log-compressao', daemon=True).start()
+
+    def parar(self):
+        """Esvazia a fila e fecha o arquivo (chamado no atexit)."""
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+            self.handler_arquivo.close()
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Agregação e consulta
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def _abrir(caminho: Path):
+    if caminho.suffix == '.gz':
+        return gzip.open(caminho, 'rt', encoding='utf-8', errors='replace')
+    return open(caminho, encoding='utf-8', errors='replace')
+
+
+def ler_registros(caminhos: Iterable[Path]) -> Iterator[dict]:
+    """Registros JSON dos arquivos (texto ou .gz); linhas não-JSON (logs antigos) são ignoradas."""
+    for caminho in caminhos:
+        try:
+            with _abrir(caminho) as f:
+                for linha in f:
+                    if linha.startswith('{'):
+                        try:
+                            yield json.loads(linha)
+                        except ValueError:
+                            continue
+        except OSError:
+            continue
+
+
+def _ordem_rotacao(caminho: Path):
+    m = re.search(r"\.jsonl\.(\d+)\.gz$", caminho.name)
+    base = caminho.name.split('.jsonl', 1)[0]
+    return base, -int(m.group(1)) if m else 0
+
+
+def agregar(pasta: Path = None, job: str = None, nivel: str = None, worker: str = None) -> List[dict]:
+    """Registros de todos os processos/rotações, intercalados por horário."""
+    pasta = Path(pasta) if pasta else BASE_DIR / 'logs'
+    # Rotações mais antigas primeiro (.3.gz, .2.gz, .1.gz, atual): empates de horário mantêm a ordem de escrita
+    caminhos = sorted(pasta.glob('automacao_*.jsonl*'), key=_ordem_rotacao)
+    minimo = logging.getLevelName(nivel.upper()) if nivel else logging.NOTSET
+    registros = [r for r in ler_registros(caminhos)
+                 if (job is None or r.get('job') == job)
+                 and (worker is None or r.get('worker') == worker)
+                 and logging.getLevelName(r.get('nivel', 'INFO')) >= minimo]
+    return sorted(registros, key=lambda r: r.get('ts', ''))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agrega os logs JSON de todos os processos")
+    parser.add_argument('--pasta', type=Path, default=BASE_DIR / 'logs')
+    parser.add_argument('--job')
+    parser.add_argument('--worker')
+    parser.add_argument('--nivel', help="nível mínimo (DEBUG, INFO, WARNING, ERROR)")
+    parser.add_argument('-o', '--saida', type=Path, help="grava o agregado em JSONL")
+    args = parser.parse_args()
+
+    registros = agregar(args.pasta, args.job, args.nivel, args.worker)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            for r in registros:
+                f.write(json.dumps(r, ensure_ascii=False) + '\n')
+        print(f"💾 {len(registros)} registros em {args.saida}")
+        return
+    for r in registros:
+        job = f" [{r['job']}]" if r.get('job') else ''
+        print(f"{r.get('ts')} | {r.get('nivel', ''):<8} | {r.get('worker')}{job} | {r.get('msg')}")
+
+
+if __name__ == "__main__":
+    main()
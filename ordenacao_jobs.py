@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""Ordenação de jobs por localidade de cache do Strategy Tester.
+
+Em ordem alfabética, sets de símbolos, períodos e modelos diferentes se
+intercalam e o tester recarrega histórico e reconstrói seu cache a cada
+troca. Aqui os jobs são agrupados por (símbolo, período, modelo, datas),
+lidos do próprio .set (inputs como SYMBOL_CODE/TIMEFRAME) e, na falta
+deles, da seção [Tester] do INI; cada grupo roda em sequência.
+
+`MedidorInicializacao` registra o tempo de inicialização de cada job
+(clique em Start até o tester começar de fato) separando jobs "frios"
+(primeiro do grupo) de "quentes" e estima a economia frente à ordem
+alfabética pela diferença no número de trocas de grupo.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from statistics import mean
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from arquivos_set import ler_set
+
+Localidade = Tuple[str, str, str, str, str]
+
+# Nomes de input/chave aceitos para cada componente (minúsculas)
+CHAVES_SIMBOLO = ('symbol', 'symbol_code', 'simbolo', 'ativo', 'inpsymbol')
+CHAVES_PERIODO = ('period', 'timeframe', 'periodo', 'tf', 'inptimeframe')
+CHAVES_MODELO = ('model', 'modelo')
+CHAVES_DE = ('fromdate',)
+CHAVES_ATE = ('todate',)
+
+
+def ler_valores_set(set_path: Path) -> Dict[str, str]:
+    """Pares chave=valor do .set (UTF-16 com BOM ou UTF-8), chaves em minúsculas.
+
+    Para inputs de otimização (`valor||início||passo||fim||Y`) fica só o valor.
+    """
+    return {entrada.nome.lower(): entrada.valor for entrada in ler_set(set_path)}
+
+
+def _primeiro(fontes: Sequence[Mapping[str, str]], chaves: Sequence[str]) -> str:
+    for fonte in fontes:
+        for chave in chaves:
+            valor = fonte.get(chave)
+            if valor:
+                return str(valor)
+    return ''
+
+
+def chave_localidade(set_path: Path, tester: Mapping[str, str] = None) -> Localidade:
+    """(símbolo, período, modelo, de, até) do job: .set tem prioridade sobre o [Tester]."""
+    tester = {k.lower(): v for k, v in (tester or {}).items()}
+    try:
+        fontes = (ler_valores_set(set_path), tester)
+    except OSError:
+        fontes = (tester,)
+    return (
+        _primeiro(fontes, CHAVES_SIMBOLO).upper(),
+        _primeiro(fontes, CHAVES_PERIODO).upper(),
+        _primeiro(fontes, CHAVES_MODELO),
+        _primeiro(fontes, CHAVES_DE),
+        _primeiro(fontes, CHAVES_ATE),
+    )
+
+
+def ordenar_por_localidade(caminhos: Iterable[Path], tester: Mapping[str, str] = None
+                           ) -> Tuple[List[Path], Dict[Path, Localidade]]:
+    """Agrupa os jobs por localidade; dentro do grupo mantém a ordem alfabética.
+
+    Retorna (caminhos ordenados, mapa caminho -> localidade).
+    """
+    localidades = {Path(c): chave_localidade(c, tester) for c in sorted(caminhos)}
+    ordenados = sorted(localidades, key=lambda c: localidades[c])
+    return ordenados, localidades
+
+
+def trocas_de_grupo(localidades: Iterable[Localidade]) -> int:
+    """Inicializações frias de uma sequência (o primeiro job conta como troca)."""
+    trocas, anterior = 0, None
+    for loc in localidades:
+        if loc != anterior:
+            trocas += 1
+        anterior = loc
+    return trocas
+
+
+class MedidorInicializacao:
+    """Tempo de inicialização por job, separado em frio (troca de grupo) e quente."""
+
+    def __init__(self):
+        self._executados: List[Tuple[Path, Optional[Localidade]]] = []
+        self.frios: List[float] = []
+        self.quentes: List[float] = []
+
+    def registrar(self, caminho: Path, localidade: Optional[Localidade], segundos: Optional[float]):
+        if segundos is None:
+            return
+        anterior = self._executados[-1][1] if self._executados else None
+        quente = localidade is not None and localidade == anterior
+        (self.quentes if quente else self.frios).append(segundos)
+        self._executados.append((Path(caminho), localidade))
+
+    def resumo(self) -> Optional[dict]:
+        """Médias medidas e economia estimada frente à ordem alfabética (None sem dados)."""
+        if not self.frios:
+            return None
+        frio = mean(self.frios)
+        quente = mean(self.quentes) if self.quentes else frio
+        trocas_exec = trocas_de_grupo(loc for _, loc in self._executados)
+        trocas_alfa = trocas_de_grupo(loc for _, loc in sorted(self._executados, key=lambda e: e[0]))
+        return {
+            'frio_medio': frio,
+            'quente_medio': quente,
+            'trocas_alfabetica': trocas_alfa,
+            'trocas_executadas': trocas_exec,
+            'economia_estimada': max(trocas_alfa - trocas_exec, 0) * max(frio - quente, 0.0),
+        }
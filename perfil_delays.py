@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""Perfil adaptativo de esperas (delays) por passo da automação GUI.
+
+Onde não conseguimos observar uma pós-condição (menu aberto, diálogo pronto,
+navegação concluída), a espera correta depende da máquina: uma VM carregada
+precisa de ~1.5s e uma máquina física de ~0.2s. Este perfil:
+
+- começa pelo valor padrão de cada passo;
+- após N ciclos bem-sucedidos seguidos, sonda um valor menor;
+- após falha (CSV ausente, foco perdido...), recua para um valor maior e
+  registra o ponto de falha como piso para as próximas sondagens;
+- persiste os valores aprendidos por host em JSON.
+
+Em regime, o overhead por set converge para o menor valor seguro observado.
+"""
+from __future__ import annotations
+
+import json
+import socket
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+class PerfilDelays:
+    """Mantém e aprende os delays por passo para o host atual."""
+
+    def __init__(self, caminho: Optional[Path] = None, host: Optional[str] = None,
+                 piso: float = 0.1, teto: float = 5.0,
+                 fator_reducao: float = 0.85, fator_aumento: float = 1.5,
+                 sucessos_para_sondar: int = 3, margem_falha: float = 1.1):
+        self.caminho = Path(caminho) if caminho else BASE_DIR / 'delays_perfil.json'
+        self.host = host or socket.gethostname()
+        self.piso = piso
+        self.teto = teto
+        self.fator_reducao = fator_reducao
+        self.fator_aumento = fator_aumento
+        self.sucessos_para_sondar = sucessos_para_sondar
+        self.margem_falha = margem_falha
+
+        self._passos: Dict[str, dict] = {}
+        self._usados: set = set()
+        self._carregar()
+
+    # ------------------------------ Persistência ------------------------------ #
+    def _carregar(self):
+        try:
+            if self.caminho.exists():
+                dados = json.loads(self.caminho.read_text(encoding='utf-8'))
+                self._passos = dados.get(self.host, {})
+                for estado in self._passos.values():
+                    # Perfis antigos: o maior delay que falhou era gravado como 'min_falha'
+                    if 'min_falha' in estado:
+                        estado.setdefault('maior_falha', estado.pop('min_falha'))
+        except Exception:
+            # Perfil corrompido não deve impedir a automação
+            self._passos = {}
+
+    def salvar(self):
+        """Grava o perfil do host atual preservando o de outros hosts."""
+        try:
+            dados = {}
+            if self.caminho.exists():
+                try:
+                    dados = json.loads(self.caminho.read_text(encoding='utf-8'))
+                except Exception:
+                    dados = {}
+            dados[self.host] = self._passos
+            tmp = self.caminho.with_suffix('.tmp')
+            tmp.write_text(json.dumps(dados, indent=2, sort_keys=True), encoding='utf-8')
+            tmp.replace(self.caminho)
+        except Exception as e:
+            print(f"⚠️ Não foi possível salvar perfil de delays: {e}")
+
+    # ------------------------------- Consulta -------------------------------- #
+    def _passo(self, nome: str, padrao: float) -> dict:
+        estado = self._passos.get(nome)
+        if estado is None:
+            estado = {
+                'atual': padrao,
+                'seguro': padrao,
+                'maior_falha': None,  # maior delay que já falhou (piso das sondagens)
+                'sucessos_seguidos': 0,
+                'sucessos': 0,
+                'falhas': 0,
+            }
+            self._passos[nome] = estado
+        return estado
+
+    def delay(self, nome: str, padrao: float) -> float:
+        """Retorna o delay atual do passo e marca o passo como usado no ciclo."""
+        self._usados.add(nome)
+        return self._passo(nome, padrao)['atual']
+
+    def aguardar(self, nome: str, padrao: float):
+        """Dorme o delay aprendido para o passo."""
+        time.sleep(self.delay(nome, padrao))
+
+    # ------------------------------ Aprendizado ------------------------------ #
+    def registrar_sucesso(self, passos: Iterable[str] = None):
+        """Confirma os passos do ciclo e sonda valores menores após N sucessos."""
+        nomes = list(passos) if passos is not None else list(self._usados)
+        for nome in nomes:
+            estado = self._passos.get(nome)
+            if estado is None:
+                continue
+            estado['seguro'] = estado['atual']
+            estado['sucessos'] += 1
+            estado['sucessos_seguidos'] += 1
+            if estado['sucessos_seguidos'] < self.sucessos_para_sondar:
+                continue
+            estado['sucessos_seguidos'] = 0
+            limite = self.piso
+            if estado['maior_falha'] is not None:
+                # Não sondar abaixo do maior valor que já falhou (com margem)
+                limite = max(limite, estado['maior_falha'] * self.margem_falha)
+                # Esquecer lentamente falhas antigas (a máquina pode ter ficado mais rápida)
+                estado['maior_falha'] *= 0.98
+            proposto = max(limite, round(estado['atual'] * self.fator_reducao, 3))
+            if proposto < estado['atual']:
+                estado['atual'] = proposto
+        self._usados.difference_update(nomes)
+
+    def registrar_falha(self, passos: Iterable[str] = None):
+        """Recua os passos suspeitos e registra o ponto de falha como piso."""
+        nomes = list(passos) if passos is not None else list(self._usados)
+        for nome in nomes:
+            estado = self._passos.get(nome)
+            if estado is None:
+                continue
+            atual = estado['atual']
+            estado['falhas'] += 1
+            estado['sucessos_seguidos'] = 0
+            estado['maior_falha'] = max(estado['maior_falha'] or 0.0, atual)
+            estado['atual'] = min(self.teto, max(estado['seguro'], round(atual * self.fator_aumento, 3)))
+            if estado['atual'] <= atual:
+                # Falhou no valor "seguro": não há valor confirmado acima, subir mesmo assim
+                estado['atual'] = min(self.teto, round(atual * self.fator_aumento, 3))
+        self._usados.difference_update(nomes)
+
+    def descartar_ciclo(self):
+        """Esquece os passos usados no ciclo sem aprender nada."""
+        self._usados.clear()
+
+    def overhead_total(self) -> float:
+        """Soma dos delays atuais (estimativa do overhead fixo por set)."""
+        return sum(e['atual'] for e in self._passos.values())
+
+    def resumo(self) -> Dict[str, float]:
+        return {nome: e['atual'] for nome, e in sorted(self._passos.items())}
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+"""Modo de perfilamento (`--perfilar`): cProfile e tracemalloc por fase, com
+captura de pilhas disparada pela cauda.
+
+- Cada fase (carregar, iniciar, aguardar, exportar, oos_lancar...) roda sob um
+  cProfile próprio; ao final do lote as estatísticas são somadas por fase em
+  `fase_<nome>.prof` (abrir com `python -m pstats` ou snakeview/snakeviz).
+- tracemalloc mede memória alocada e pico por fase. O tracemalloc é do processo
+  inteiro: fases que se sobrepõem em outras threads (pipeline com terminal em
+  espera) misturariam alocações e zerariam o pico uma da outra, então só fases
+  sem outra em paralelo registram memória; as demais contam em `sobrepostas`.
+- Uma thread de amostragem acompanha as fases em andamento: quando uma passa do
+  p99 das execuções anteriores da mesma fase, ela passa a amostrar a pilha da
+  thread (`sys._current_frames`) e tira um snapshot do tracemalloc. No fim da
+  fase a captura (pilhas, cProfile da execução e alocações desde o disparo) é
+  gravada ao lado do log do lote, para investigar o outlier depois, sem rodar
+  de novo.
+
+    perfilamento.ativar(Perfilador(pasta))
+    with perfilamento.fase('carregar'):
+        ...
+    perfilamento.desativar()
+
+Sem perfilador ativo, `fase` não faz nada.
+"""
+from __future__ import annotations
+
+import atexit
+import collections
+import cProfile
+import io
+import json
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Counter, Deque, Dict, List, Optional
+
+import rastreamento
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+def percentil(valores: List[float], p: float) -> float:
+    """Percentil com interpolação linear (0 para lista vazia). Também usado pelos benchmarks."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    posicao = (len(ordenados) - 1) * p / 100
+    base = int(posicao)
+    if base + 1 >= len(ordenados):
+        return ordenados[-1]
+    return ordenados[base] + (ordenados[base + 1] - ordenados[base]) * (posicao - base)
+
+
+def pilha_dobrada(frame) -> str:
+    """Pilha no formato "folded" (raiz;...;folha), aceito por flamegraph.pl e speedscope."""
+    partes = []
+    while frame is not None:
+        codigo = frame.f_code
+        partes.append(f"{Path(codigo.co_filename).stem}:{codigo.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ';'.join(reversed(partes))
+
+
+class _FaseEmAndamento:
+    """Estado de uma fase em execução (lido pela thread de amostragem)."""
+
+    def __init__(self, nome: str, limiar: Optional[float], atributos: dict):
+        self.nome = nome
+        self.limiar = limiar
+        self.atributos = atributos
+        self.inicio = time.perf_counter()
+        self.disparada_em: Optional[float] = None
+        self.indice = 0
+        self.amostras: Counter[str] = collections.Counter()
+        self.snapshot = None
+        self.sobreposta = False  # outra fase rodou em paralelo: memória não é atribuível
+
+
+class Perfilador:
+    """cProfile + tracemalloc por fase e captura de pilhas acima do p99 corrente."""
+
+    def __init__(self, pasta: Path = None, intervalo_amostragem: float = 0.01, min_amostras: int = 20,
+                 max_capturas: int = 50, quadros_memoria: int = 10):
+        self.pasta = Path(pasta) if pasta else BASE_DIR / 'logs' / f"perfil_{time.strftime('%Y%m%d_%H%M%S')}"
+        self.intervalo = intervalo_amostragem
+        self.min_amostras = min_amostras
+        self.max_capturas = max_capturas
+        self.quadros_memoria = quadros_memoria
+        self.capturas = 0
+        self._duracoes: Dict[str, Deque[float]] = {}
+        self._limiares: Dict[str, float] = {}
+        self._stats: Dict[str, pstats.Stats] = {}
+        self._memoria: Dict[str, Dict[str, float]] = {}
+        self._em_andamento: Dict[int, _FaseEmAndamento] = {}
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._amostrador: Optional[threading.Thread] = None
+        self._tracemalloc_proprio = False
+        self._finalizado = False
+
+    @classmethod
+    def do_config(cls, config, pasta: Path = None) -> 'Perfilador':
+        """Perfilador com a seção [Perfil] do config.ini (intervalo_amostragem, min_amostras, max_capturas)."""
+        secao = config['Perfil'] if config.has_section('Perfil') else {}
+        return cls(pasta,
+                   intervalo_amostragem=float(secao.get('intervalo_amostragem', 0.01)),
+                   min_amostras=int(secao.get('min_amostras', 20)),
+                   max_capturas=int(secao.get('max_capturas', 50)))
+
+    # ─────────────────────────────────────────────────────────────────────────
+
+    def iniciar(self):
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.quadros_memoria)
+            self._tracemalloc_proprio = True
+        self._amostrador = threading.Thread(target=self._amostrar, name='perfil-amostrador', daemon=True)
+        self._amostrador.start()
+
+    @contextmanager
+    def fase(self, nome: str, **atributos):
+        ident = threading.get_ident()
+        with self._lock:
+            if ident in self._em_andamento:  # fase aninhada: a externa já mede tudo
+                aninhada = True
+            else:
+                aninhada = False
+                estado = _FaseEmAndamento(nome, self._limiares.get(nome),
+                                          {**rastreamento.atributos_contexto(), **atributos})
+                if self._em_andamento:
+                    estado.sobreposta = True
+                    for outra in self._em_andamento.values():
+                        outra.sobreposta = True
+                self._em_andamento[ident] = estado
+        if aninhada:
+            yield
+            return
+
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:
+            perfil = None  # outro profiler ativo (outra thread): mede só tempo e memória
+        memoria_inicio, _ = tracemalloc.get_traced_memory()
+        if not estado.sobreposta:
+            tracemalloc.reset_peak()  # global: não zerar o pico de uma fase em andamento
+        try:
+            yield
+        finally:
+            if perfil is not None:
+                perfil.disable()
+            duracao = time.perf_counter() - estado.inicio
+            memoria_fim, pico = tracemalloc.get_traced_memory()
+            with self._lock:
+                del self._em_andamento[ident]
+            self._concluir(estado, duracao, perfil, memoria_fim - memoria_inicio, pico - memoria_inicio)
+
+    def _concluir(self, estado: _FaseEmAndamento, duracao: float, perfil: Optional[cProfile.Profile],
+                  memoria: int, pico: int):
+        nome = estado.nome
+        with self._lock:
+            historico = self._duracoes.setdefault(nome, collections.deque(maxlen=2000))
+            historico.append(duracao)
+            if len(historico) >= self.min_amostras:
+                self._limiares[nome] = percentil(sorted(historico), 99)
+            mem = self._memoria.setdefault(nome, {'alocado_max': 0, 'pico_max': 0, 'sobrepostas': 0})
+            if estado.sobreposta:
+                mem['sobrepostas'] += 1
+            else:
+                mem['alocado_max'] = max(mem['alocado_max'], memoria)
+                mem['pico_max'] = max(mem['pico_max'], pico)
+            if perfil is not None:
+                if nome in self._stats:
+                    self._stats[nome].add(perfil)
+                else:
+                    self._stats[nome] = pstats.Stats(perfil)
+        if estado.disparada_em is not None:
+            self._gravar_captura(estado, duracao, perfil)
+
+    # ─────────────────────────────────────────────────────────────────────────
+
+    def _amostrar(self):
+        while not self._parar.is_set():
+            agora = time.perf_counter()
+            with self._lock:
+                alvos = [(ident, e) for ident, e in self._em_andamento.items()
+                         if e.limiar is not None and agora - e.inicio > e.limiar]
+            if not alvos:
+                self._parar.wait(max(self.intervalo, 0.05))
+                continue
+            quadros = sys._current_frames()
+            for ident, estado in alvos:
+                if estado.disparada_em is None:
+                    if self.capturas >= self.max_capturas:
+                        estado.limiar = None  # cota esgotada: não amostra mais
+                        continue
+                    self.capturas += 1
+                    estado.indice = self.capturas
+                    estado.disparada_em = agora
+                    estado.snapshot = tracemalloc.take_snapshot()
+                frame = quadros.get(ident)
+                if frame is not None:
+                    estado.amostras[pilha_dobrada(frame)] += 1
+            del quadros
+            self._parar.wait(self.intervalo)
+
+    def _gravar_captura(self, estado: _FaseEmAndamento, duracao: float, perfil: Optional[cProfile.Profile]):
+        job = str(estado.atributos.get('job', 'sem_job'))
+        base = self.pasta / f"captura_{estado.indice:03d}_{estado.nome}_{job}"[:200]
+        linhas = [
+            f"fase: {estado.nome}",
+            f"atributos: {json.dumps(estado.atributos, ensure_ascii=False, default=str)}",
+            f"duracao: {duracao:.3f}s | limiar p99: {estado.limiar:.3f}s | "
+            f"disparo após {estado.disparada_em - estado.inicio:.3f}s",
+            f"amostras de pilha: {sum(estado.amostras.values())} (intervalo {self.intervalo * 1000:.0f} ms)",
+            "",
+            "── Pilhas mais frequentes após o disparo ──",
+        ]
+        for pilha, n in estado.amostras.most_common(15):
+            linhas.append(f"{n:>6}  {';'.join(pilha.split(';')[-6:])}")
+        if perfil is not None:
+            texto = io.StringIO()
+            pstats.Stats(perfil, stream=texto).sort_stats('cumulative').print_stats(25)
+            linhas += ["", "── cProfile da execução (cumulativo) ──", texto.getvalue()]
+        if estado.snapshot is not None:
+            linhas += ["", "── Alocações desde o disparo (tracemalloc) ──"]
+            diferencas = tracemalloc.take_snapshot().compare_to(estado.snapshot, 'lineno')
+            linhas += [str(d) for d in diferencas[:15]]
+        try:
+            base.with_suffix('.txt').write_text('\n'.join(linhas) + '\n', encoding='utf-8')
+            base.with_suffix('.folded').write_text(
+                ''.join(f"{pilha} {n}\n" for pilha, n in estado.amostras.items()), encoding='utf-8')
+        except OSError as e:
+            print(f"⚠️ Perfil: falha ao gravar captura {base.name}: {e}")
+
+    # ─────────────────────────────────────────────────────────────────────────
+
+    def resumo(self) -> List[dict]:
+        """Duração (n, p50, p99, máx) e memória por fase."""
+        with self._lock:
+            linhas = []
+            for nome, duracoes in self._duracoes.items():
+                ordenadas = sorted(duracoes)
+                linhas.append({'fase': nome, 'n': len(ordenadas),
+                               'p50': round(percentil(ordenadas, 50), 4),
+                               'p99': round(percentil(ordenadas, 99), 4),
+                               'max': round(ordenadas[-1], 4),
+                               **self._memoria.get(nome, {})})
+        return sorted(linhas, key=lambda l: l['p50'] * l['n'], reverse=True)
+
+    def finalizar(self) -> Path:
+        """Para a amostragem e grava .prof por fase e resumo.json. Idempotente."""
+        if self._finalizado:
+            return self.pasta
+        self._finalizado = True
+        self._parar.set()
+        if self._amostrador is not None:
+            self._amostrador.join(timeout=2)
+        if self._tracemalloc_proprio:
+            tracemalloc.stop()
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        for nome, stats in self._stats.items():
+            stats.dump_stats(str(self.pasta / f"fase_{nome}.prof"))
+        (self.pasta / 'resumo.json').write_text(
+            json.dumps({'fases': self.resumo(), 'capturas': self.capturas}, indent=2, ensure_ascii=False),
+            encoding='utf-8')
+        return self.pasta
+
+
+_ativo: Optional[Perfilador] = None
+
+
+def ativar(perfilador: Perfilador):
+    """Define e inicia o perfilador do processo."""
+    global _ativo
+    if _ativo is not None:
+        _ativo.finalizar()
+    _ativo = perfilador
+    perfilador.iniciar()
+    atexit.register(perfilador.finalizar)
+
+
+def ativo() -> Optional[Perfilador]:
+    return _ativo
+
+
+def desativar() -> Optional[Perfilador]:
+    """Finaliza o perfilador ativo (gravando os resultados) e o devolve."""
+    global _ativo
+    perfilador, _ativo = _ativo, None
+    if perfilador is not None:
+        perfilador.finalizar()
+    return perfilador
+
+
+def fase(nome: str, **atributos):
+    """Perfila o bloco como a fase `nome` (não faz nada sem perfilador ativo)."""
+    if _ativo is None:
+        return _nulo()
+    return _ativo.fase(nome, **atributos)
+
+
+@contextmanager
+def _nulo():
+    yield
+
+
+def imprimir_resumo(perfilador: Perfilador):
+    print(f"🔬 Perfil: {perfilador.pasta} ({perfilador.capturas} captura(s) de cauda)")
+    print(f"   {'fase':<16}{'n':>6}{'p50 s':>10}{'p99 s':>10}{'máx s':>10}{'pico MB':>10}{'sobrep.':>9}")
+    for l in perfilador.resumo():
+        print(f"   {l['fase']:<16}{l['n']:>6}{l['p50']:>10.3f}{l['p99']:>10.3f}{l['max']:>10.3f}"
+              f"{l.get('pico_max', 0) / 1024 / 1024:>10.1f}{l.get('sobrepostas', 0):>9}")
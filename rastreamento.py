@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""Spans por fase (JSONL) e exportação para o formato Chrome trace-event.
+
+Cada fase do lote (foco, carregar, iniciar, aguardar_inicio/aguardar_fim,
+exportar, encerrar, oos_lancar...) vira um span com início, duração, worker,
+thread e atributos do job. Os spans vão para logs/spans_<data>_<pid>.jsonl
+(um arquivo por processo, sem disputa entre workers).
+
+    with contexto(job='set_001'):
+        with span('carregar', tentativa=1):
+            ...
+
+Sem rastreador ativo (`[Rastreamento] habilitado = false`), `span` não faz nada.
+
+Linha do tempo de um lote (abrir em chrome://tracing ou ui.perfetto.dev):
+    python rastreamento.py logs/spans_*.jsonl* -o logs/trace.json
+"""
+from __future__ import annotations
+
+import argparse
+import atexit
+import functools
+import glob
+import gzip
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+class Rastreador:
+    """Grava spans em JSONL (append, uma linha por span, thread-safe)."""
+
+    def __init__(self, pasta: Path = None, worker: str = None):
+        self.pasta = Path(pasta) if pasta else BASE_DIR / 'logs'
+        self.pasta.mkdir(parents=True, exist_ok=True)
+        self.worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+        self.caminho = self.pasta / f"spans_{datetime.now():%Y%m%d_%H%M%S}_{os.getpid()}.jsonl"
+        self._arquivo = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def do_config(cls, config, worker: str = None) -> Optional['Rastreador']:
+        """Rastreador da seção [Rastreamento] do config.ini (None se desabilitado)."""
+        secao = config['Rastreamento'] if config.has_section('Rastreamento') else {}
+        if str(secao.get('habilitado', 'true')).strip().lower() in ('0', 'false', 'nao', 'não', 'no'):
+            return None
+        pasta = secao.get('pasta') or None
+        return cls(Path(pasta) if pasta else None, worker)
+
+    def registrar(self, nome: str, inicio: float, duracao: float, erro: str = None, **atributos):
+        """Grava um span já medido (inicio em epoch s, duracao em s)."""
+        registro = {
+            'nome': nome,
+            'inicio': round(inicio, 6),
+            'duracao': round(max(duracao, 0.0), 6),
+            'worker': self.worker,
+            'pid': os.getpid(),
+            'thread': threading.get_ident(),
+            'status': 'erro' if erro else 'ok',
+            'atributos': {**getattr(_contexto, 'atributos', {}), **atributos},
+        }
+        if erro:
+            registro['erro'] = erro
+        linha = json.dumps(registro, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._arquivo is None:
+                self._arquivo = open(self.caminho, 'a', encoding='utf-8', buffering=1)
+            self._arquivo.write(linha + '\n')
+
+    def fechar(self):
+        with self._lock:
+            if self._arquivo is not None:
+                self._arquivo.close()
+                self._arquivo = None
+
+
+_ativo: Optional[Rastreador] = None
+_contexto = threading.local()
+
+
+def ativar(rastreador: Optional[Rastreador]):
+    """Define o rastreador do processo (None desliga os spans)."""
+    global _ativo
+    if _ativo is not None and _ativo is not rastreador:
+        _ativo.fechar()
+    _ativo = rastreador
+    if rastreador is not None:
+        atexit.register(rastreador.fechar)
+
+
+def ativo() -> Optional[Rastreador]:
+    return _ativo
+
+
+def atributos_contexto() -> Dict[str, object]:
+    """Atributos de contexto da thread atual (também anexados aos registros de log)."""
+    return dict(getattr(_contexto, 'atributos', {}))
+
+
+@contextmanager
+def contexto(**atributos):
+    """Atributos (job, step...) incluídos em todos os spans da thread dentro do bloco."""
+    anterior = getattr(_contexto, 'atributos', {})
+    _contexto.atributos = {**anterior, **atributos}
+    try:
+        yield
+    finally:
+        _contexto.atributos = anterior
+
+
+@contextmanager
+def span(nome: str, **atributos):
+    """Mede o bloco e grava o span (com o erro, se o bloco levantar exceção)."""
+    rastreador = _ativo
+    if rastreador is None:
+        yield
+        return
+    inicio, t0 = time.time(), time.perf_counter()
+    erro = None
+    try:
+        yield
+    except BaseException as e:
+        erro = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        rastreador.registrar(nome, inicio, time.perf_counter() - t0, erro, **atributos)
+
+
+def registrar(nome: str, inicio: float, duracao: float, **atributos):
+    """Span derivado de medições já feitas (ex.: aguardar_inicio a partir do startup_time)."""
+    if _ativo is not None:
+        _ativo.registrar(nome, inicio, duracao, **atributos)
+
+
+def rastreado(nome: str):
+    """Decorador: a chamada inteira vira um span `nome`."""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            with span(nome):
+                return funcao(*args, **kwargs)
+        return envoltorio
+    return decorador
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# Leitura, resumo e exportação
+# ═══════════════════════════════════════════════════════════════════════════════
+
+def ler_spans(caminhos: Iterable[Path]) -> Iterator[dict]:
+    """Spans dos arquivos JSONL (também .gz, comprimidos pelo log ao fim da sessão)."""
+    for caminho in caminhos:
+        caminho = Path(caminho)
+        abrir = gzip.open if caminho.suffix == '.gz' else open
+        with abrir(caminho, 'rt', encoding='utf-8') as f:
+            for linha in f:
+                linha = linha.strip()
+                if not linha:
+                    continue
+                try:
+                    yield json.loads(linha)
+                except ValueError:
+                    continue  # linha truncada (processo morto no meio da escrita)
+
+
+def para_chrome_trace(spans: Iterable[dict]) -> dict:
+    """Eventos "X" (complete) com ts/dur em µs; um "processo" por worker."""
+    eventos: List[dict] = []
+    workers: Dict[str, int] = {}
+    for s in spans:
+        pid = workers.setdefault(s.get('worker', str(s.get('pid'))), s.get('pid') or len(workers) + 1)
+        args = dict(s.get('atributos', {}), status=s.get('status'))
+        if s.get('erro'):
+            args['erro'] = s['erro']
+        eventos.append({
+            'name': s['nome'],
+            'cat': 'fase',
+            'ph': 'X',
+            'ts': int(s['inicio'] * 1e6),
+            'dur': int(s['duracao'] * 1e6),
+            'pid': pid,
+            'tid': s.get('thread', 0),
+            'args': args,
+        })
+    for worker, pid in workers.items():
+        eventos.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': worker}})
+    return {'traceEvents': eventos, 'displayTimeUnit': 'ms'}
+
+
+def resumo_fases(spans: Iterable[dict]) -> List[dict]:
+    """Tempo total/médio/máximo por fase, da mais cara para a mais barata."""
+    fases: Dict[str, List[float]] = {}
+    for s in spans:
+        fases.setdefault(s['nome'], []).append(s['duracao'])
+    linhas = [{'fase': nome, 'n': len(d), 'total': sum(d), 'medio': sum(d) / len(d), 'max': max(d)}
+              for nome, d in fases.items()]
+    return sorted(linhas, key=lambda l: l['total'], reverse=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Converte spans JSONL em Chrome trace e resume as fases")
+    parser.add_argument('arquivos', nargs='*', help="spans_*.jsonl (padrão: todos em logs/)")
+    parser.add_argument('-o', '--saida', type=Path, help="arquivo trace-event (.json)")
+    args = parser.parse_args()
+
+    padroes = args.arquivos or [str(BASE_DIR / 'logs' / 'spans_*.jsonl*')]
+    caminhos = sorted({Path(c) for p in padroes for c in (glob.glob(p) or [p])})
+    spans = list(ler_spans(c for c in caminhos if c.exists()))
+    if not spans:
+        print("⚠️ Nenhum span encontrado")
+        return
+    print(f"📈 {len(spans)} spans de {len(caminhos)} arquivo(s)")
+    print(f"{'fase':<18}{'n':>7}{'total s':>11}{'médio s':>10}{'máx s':>10}")
+    for l in resumo_fases(spans):
+        print(f"{l['fase']:<18}{l['n']:>7}{l['total']:>11.1f}{l['medio']:>10.2f}{l['max']:>10.2f}")
+    if args.saida:
+        args.saida.write_text(json.dumps(para_chrome_trace(spans)), encoding='utf-8')
+        print(f"💾 Chrome trace: {args.saida} (abrir em chrome://tracing ou ui.perfetto.dev)")
+
+
+if __name__ == "__main__":
+    main()
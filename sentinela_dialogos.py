@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""Sentinela de diálogos modais inesperados do MT5.
+
+Entre os passos da GUI, enumera as janelas de diálogo (#32770) com dono
+pertencentes ao processo do terminal, classifica diálogos conhecidos
+pelo título/texto e aplica uma ação de recuperação por classe:
+
+| Classe              | Exemplo                                    | Ação                    |
+|---------------------|--------------------------------------------|-------------------------|
+| arquivo_existe      | "Confirmar Salvar como" / "already exists" | clicar Sim/Yes          |
+| download_historico  | "Baixando histórico" / "loading history"   | aguardar fechar         |
+| aviso_conexao       | "Sem conexão" / "connection"               | clicar OK / fechar      |
+| salvar_como         | diálogo "Salvar como" esperado             | nenhuma (ignorado)      |
+| desconhecido        | qualquer outro modal                       | fechar (WM_CLOSE)       |
+
+As ações usam mensagens Win32 diretas (BM_CLICK / WM_CLOSE), sem depender
+de foco ou coordenadas, então a recuperação leva menos de um segundo.
+`verificar(esperar=False)` (loop de poll do backtest) nunca bloqueia: o
+download de histórico é anotado e conferido de novo na próxima chamada.
+Com `fechar_desconhecidos=False` (um passo da GUI abriu o próprio diálogo,
+ex.: "Salvar como" em outro idioma) modais não classificados ficam intactos.
+Fora do Windows a sentinela fica inativa (`disponivel == False`).
+"""
+from __future__ import annotations
+
+import ctypes
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+_user32 = ctypes.windll.user32 if os.name == 'nt' else None
+
+GW_OWNER = 4
+CLASSE_DIALOGO_WIN32 = '#32770'
+WM_CLOSE = 0x0010
+BM_CLICK = 0x00F5
+
+# (classe, termos no título/texto) - ordem importa: primeiro match vence
+CLASSES_DIALOGO: Sequence[Tuple[str, Tuple[str, ...]]] = (
+    ('arquivo_existe', ('já existe', 'already exists', 'confirmar salvar', 'confirm save',
+                        'deseja substituí', 'want to replace')),
+    # Só o progresso de download/sincronização: "histórico" ou "download" soltos aparecem
+    # em diálogos quaisquer (pastas Downloads, aba Histórico)
+    ('download_historico', ('baixando histórico', 'baixando dados', 'download de histórico',
+                            'downloading history', 'sincronizando histórico', 'synchronizing history',
+                            'carregando histórico', 'loading history')),
+    ('aviso_conexao', ('conexão', 'connection', 'desconectado', 'disconnected', 'offline')),
+    ('salvar_como', ('salvar como', 'save as')),
+)
+
+BOTOES_CONFIRMAR = ('&sim', 'sim', '&yes', 'yes')
+BOTOES_OK = ('ok', '&ok', 'fechar', '&fechar', 'close', '&close')
+
+
+@dataclass
+class Dialogo:
+    hwnd: int
+    titulo: str
+    texto: str
+    classe: str
+
+
+def _texto_janela(hwnd: int) -> str:
+    buf = ctypes.create_unicode_buffer(512)
+    _user32.GetWindowTextW(hwnd, buf, 512)
+    return buf.value
+
+
+def _classe_janela(hwnd: int) -> str:
+    buf = ctypes.create_unicode_buffer(256)
+    _user32.GetClassNameW(hwnd, buf, 256)
+    return buf.value
+
+
+def _filhos(hwnd: int) -> List[Tuple[int, str]]:
+    filhos: List[Tuple[int, str]] = []
+
+    @ctypes.WINFUNCTYPE(ctypes.c_bool, ctypes.c_void_p, ctypes.c_void_p)
+    def _cb(h, _):
+        filhos.append((h, _texto_janela(h)))
+        return True
+
+    _user32.EnumChildWindows(hwnd, _cb, 0)
+    return filhos
+
+
+def classificar(titulo: str, texto: str = '') -> str:
+    """Classe do diálogo a partir do título e, se inconclusivo, dos textos dos controles.
+
+    O título tem prioridade: o "Salvar como" contém textos arbitrários (pastas
+    como "Downloads") que não devem reclassificá-lo.
+    """
+    for alvo in (titulo.lower(), texto.lower()):
+        for classe, termos in CLASSES_DIALOGO:
+            if any(t in alvo for t in termos):
+                return classe
+    return 'desconhecido'
+
+
+class SentinelaDialogos:
+    """Detecta e recupera diálogos modais do processo do terminal."""
+
+    def __init__(self, hwnd_principal: Callable[[], Optional[int]],
+                 timeout_download: float = 30.0):
+        self._hwnd_principal = hwnd_principal
+        self.timeout_download = timeout_download
+        self.ocorrencias: List[Tuple[float, str, str]] = []
+        # Downloads vistos sem esperar: hwnd -> (primeira vez visto, timeout já reportado)
+        self._downloads: Dict[int, Tuple[float, bool]] = {}
+
+    @property
+    def disponivel(self) -> bool:
+        return _user32 is not None
+
+    def dialogos(self) -> List[Dialogo]:
+        """Janelas visíveis do processo do terminal com dono (modais), exceto a principal."""
+        if not self.disponivel:
+            return []
+        principal = self._hwnd_principal()
+        if not principal:
+            return []
+        pid_terminal = ctypes.c_ulong()
+        _user32.GetWindowThreadProcessId(principal, ctypes.byref(pid_terminal))
+
+        encontrados: List[Dialogo] = []
+
+        @ctypes.WINFUNCTYPE(ctypes.c_bool, ctypes.c_void_p, ctypes.c_void_p)
+        def _cb(hwnd, _):
+            if hwnd == principal or not _user32.IsWindowVisible(hwnd):
+                return True
+            pid = ctypes.c_ulong()
+            _user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+            if pid.value != pid_terminal.value or not _user32.GetWindow(hwnd, GW_OWNER):
+                return True
+            # Só diálogos padrão: painéis destacados (Testador, Navegador) também têm dono
+            if _classe_janela(hwnd) != CLASSE_DIALOGO_WIN32:
+                return True
+            titulo = _texto_janela(hwnd)
+            texto = '\n'.join(t for _, t in _filhos(hwnd) if t)
+            encontrados.append(Dialogo(hwnd, titulo, texto, classificar(titulo, texto)))
+            return True
+
+        _user32.EnumWindows(_cb, 0)
+        return encontrados
+
+    # ------------------------------- Ações -------------------------------- #
+    @staticmethod
+    def _clicar_botao(dialogo: Dialogo, textos: Sequence[str]) -> bool:
+        for h, t in _filhos(dialogo.hwnd):
+            if t.strip().lower() in textos:
+                _user32.SendMessageW(h, BM_CLICK, 0, 0)
+                return True
+        return False
+
+    @staticmethod
+    def _fechar(dialogo: Dialogo) -> bool:
+        _user32.PostMessageW(dialogo.hwnd, WM_CLOSE, 0, 0)
+        return True
+
+    def _aguardar_fechar(self, dialogo: Dialogo) -> bool:
+        limite = time.time() + self.timeout_download
+        while time.time() < limite:
+            if not _user32.IsWindow(dialogo.hwnd) or not _user32.IsWindowVisible(dialogo.hwnd):
+                return True
+            time.sleep(0.2)
+        return False
+
+    def _acompanhar_download(self, dialogo: Dialogo, agora: float) -> Optional[Tuple[str, bool]]:
+        """Download sem bloquear: reporta ao aparecer e ao estourar o timeout, senão None."""
+        visto = self._downloads.get(dialogo.hwnd)
+        if visto is None:
+            self._downloads[dialogo.hwnd] = (agora, False)
+            return 'aguardar', True
+        inicio, reportado = visto
+        if not reportado and agora - inicio >= self.timeout_download:
+            self._downloads[dialogo.hwnd] = (inicio, True)
+            return 'aguardar', False
+        return None
+
+    def recuperar(self, dialogo: Dialogo, fechar_desconhecidos: bool = True) -> Tuple[str, bool]:
+        """Aplica a ação da classe do diálogo. Retorna (ação, sucesso)."""
+        if dialogo.classe == 'arquivo_existe':
+            return 'confirmar', self._clicar_botao(dialogo, BOTOES_CONFIRMAR)
+        if dialogo.classe == 'download_historico':
+            return 'aguardar', self._aguardar_fechar(dialogo)
+        if dialogo.classe == 'aviso_conexao':
+            return 'ok', self._clicar_botao(dialogo, BOTOES_OK) or self._fechar(dialogo)
+        if dialogo.classe == 'salvar_como' or not fechar_desconhecidos:
+            return 'nenhuma', True
+        return 'fechar', self._fechar(dialogo)
+
+    def verificar(self, ignorar: Sequence[str] = ('salvar_como',), esperar: bool = True,
+                  fechar_desconhecidos: bool = True) -> List[Tuple[str, str, bool]]:
+        """Trata todos os diálogos presentes. Retorna [(classe, ação, sucesso), ...].
+
+        esperar=False: não aguarda o download de histórico (callback de poll);
+        fechar_desconhecidos=False: um passo da GUI espera um diálogo agora.
+        """
+        tratados = []
+        agora = time.time()
+        presentes = set()
+        for dialogo in self.dialogos():
+            presentes.add(dialogo.hwnd)
+            if dialogo.classe in ignorar:
+                continue
+            if dialogo.classe == 'download_historico' and not esperar:
+                resultado = self._acompanhar_download(dialogo, agora)
+                if resultado is None:
+                    continue
+                acao, ok = resultado
+            elif dialogo.classe == 'desconhecido' and not fechar_desconhecidos:
+                continue
+            else:
+                acao, ok = self.recuperar(dialogo, fechar_desconhecidos)
+            self.ocorrencias.append((agora, dialogo.classe, dialogo.titulo))
+            tratados.append((dialogo.classe, acao, ok))
+        # Downloads que fecharam saem do acompanhamento
+        self._downloads = {h: v for h, v in self._downloads.items() if h in presentes}
+        return tratados
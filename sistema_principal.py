@@ -9,6 +9,8 @@ from calibrar import MenuCalibrador
 from verificar_config import MenuVerificador
 from pathlib import Path
 from extracao_oos import ExtracaoOOS, parse_oos_from_html, parse_oos_from_text, prompt_oos_steps
+from backtest_core import INIGenerator
+import walk_forward
 import os
 import subprocess
 import sys
@@ -43,14 +45,21 @@ class SistemaAutomacaoMT5:
         self.calibrador = MenuCalibrador()
         self.verificador = MenuVerificador()
 
-    def executar_automacao_completa(self):
-        """Executa toda a automação"""
+    def executar_automacao_completa(self, retomar=None):
+        """Executa toda a automação (retomar=None pergunta se houver fila anterior)"""
         print("=" * 50)
         print("🚀 EXECUTANDO AUTOMAÇÃO COMPLETA")
         print("=" * 50)
 
         try:
-            self.automacao.executar_automacao_completa()
+            if retomar is None:
+                retomar = False
+                pendente = self.automacao.execucao_pendente()
+                if pendente:
+                    print(f"♻️ Execução anterior encontrada: {pendente['concluido']} concluídos, "
+                          f"{pendente['pendente'] + pendente['em_execucao']} pendentes, {pendente['falha']} com falha")
+                    retomar = input("Retomar de onde parou? (S/n): ").strip().lower() != 'n'
+            self.automacao.executar_automacao_completa(retomar=retomar)
         except Exception as e:
             print(f"❌ Erro na automação: {e}")
 
@@ -223,6 +232,7 @@ class SistemaAutomacaoMT5:
             print("1. HTML da tabela (colar DIV)")
             print("2. Texto com ranges separados por vírgula")
             print("3. Interativo: informar steps e ranges")
+            print("4. Walk-forward: gerar janelas IS/OOS (dias de pregão B3)")
             metodo = input("Opção: ").strip()
 
             if metodo == "1":
@@ -240,6 +250,14 @@ class SistemaAutomacaoMT5:
                 ranges = parse_oos_from_text(texto)
             elif metodo == "3":
                 ranges = prompt_oos_steps()
+            elif metodo == "4":
+                janelas = walk_forward.prompt_walk_forward()
+                ranges = walk_forward.ranges_oos(janelas)
+                if janelas and input("Gerar INIs de otimização do IS? (s/n): ").strip().lower() == 's':
+                    pasta_is = Path(out_dir) / 'ini_is'
+                    gerador = INIGenerator(Path(ini_template), pasta_is / 'reports')
+                    caminhos = walk_forward.inis_otimizacao(janelas, gerador, pasta_is, Path(set_path))
+                    print(f"🔧 {len(caminhos)} INIs de otimização do IS em {pasta_is}")
             else:
                 print("❌ Método inválido")
                 return
@@ -252,13 +270,13 @@ class SistemaAutomacaoMT5:
             for i, (a, b) in enumerate(ranges, 1):
                 print(f"  {i:02d}. {a} -> {b}")
 
-            confirmar = input("Confirmar execução? (s/n): ").strip().lower()
-            if confirmar != 's':
+            confirmar = input("Confirmar execução? (s/n, p = com perfilamento): ").strip().lower()
+            if confirmar not in ('s', 'p'):
                 print("🚫 Cancelado")
                 return
 
             executor = ExtracaoOOS(self.automacao, ini_template, set_path, out_dir)
-            executor.run_batch(ranges)
+            executor.run_batch(ranges, perfilar=confirmar == 'p')
 
         except KeyboardInterrupt:
             print("\n👋 Cancelado")
@@ -337,6 +337,7 @@ class MT5NinjaBacktester:
         print(f"{Cores.CIANO_CLARO}  │{Cores.RESET}    {Cores.BRANCO_CLARO}[6]{Cores.RESET} 🔍 Verificar Sistema                               {Cores.CIANO_CLARO}│{Cores.RESET}")
         print(f"{Cores.CIANO_CLARO}  │{Cores.RESET}    {Cores.BRANCO_CLARO}[7]{Cores.RESET} 📋 Verificar Configuração                          {Cores.CIANO_CLARO}│{Cores.RESET}")
         print(f"{Cores.CIANO_CLARO}  │{Cores.RESET}    {Cores.BRANCO_CLARO}[8]{Cores.RESET} 🎯 Testar Monitor MT5                              {Cores.CIANO_CLARO}│{Cores.RESET}")
+        print(f"{Cores.CIANO_CLARO}  │{Cores.RESET}    {Cores.BRANCO_CLARO}[H]{Cores.RESET} 📈 Histórico de Execuções                          {Cores.CIANO_CLARO}│{Cores.RESET}")
         
         print(f"{Cores.CIANO_CLARO}  ├─────────────────────────────────────────────────────────────┤{Cores.RESET}")
         
@@ -455,9 +456,11 @@ class MT5NinjaBacktester:
                 with open(coord_file, 'r') as f:
                     coords = json.load(f)
                 
-                # Verificar se tem as coordenadas principais
+                # Verificar se tem as coordenadas principais (manual ou em algum perfil automático)
                 coords_necessarias = ['parameters_tab', 'start_button', 'parameters_area']
-                faltando = [c for c in coords_necessarias if c not in coords]
+                perfis = list((coords.get('perfis') or {}).values())
+                faltando = [c for c in coords_necessarias
+                            if c not in coords and not any(c in perfil for perfil in perfis)]
                 
                 if not faltando:
                     self.status['coordenadas'] = True
@@ -570,7 +573,14 @@ class MT5NinjaBacktester:
             else:
                 sistema = sistema_principal.SistemaAutomacaoMT5()
             
-            sistema.executar_automacao_completa()
+            retomar = False
+            pendente = sistema.automacao.execucao_pendente()
+            if pendente:
+                UI.info(f"Execução anterior: {pendente['concluido']} concluídos, "
+                        f"{pendente['pendente'] + pendente['em_execucao']} pendentes, {pendente['falha']} com falha")
+                retomar = UI.confirmar("Retomar de onde parou (pula os concluídos)")
+            
+            sistema.executar_automacao_completa(retomar=retomar)
             
         except Exception as e:
             UI.erro(f"Erro durante automação: {e}")
@@ -881,6 +891,53 @@ class MT5NinjaBacktester:
         
         UI.pausar()
     
+    @ErrorHandler.handle
+    def historico_execucoes(self):
+        """Consultas ao histórico de execuções (sets lentos, falhas por símbolo, tendência)"""
+        UI.limpar()
+        
+        print(f"\n{Cores.MAGENTA_CLARO}")
+        print(UI.caixa_topo())
+        print(UI.caixa_meio("📈 HISTÓRICO DE EXECUÇÕES"))
+        print(UI.caixa_base())
+        print(f"{Cores.RESET}")
+        
+        try:
+            import configparser
+            from historico_execucoes import CONSULTAS, HistoricoExecucoes, imprimir_tabela
+            config = configparser.ConfigParser()
+            config.read(str(BASE_DIR / 'config.ini'), encoding='utf-8')
+            historico = HistoricoExecucoes.do_config(config)
+            if historico is None:
+                UI.aviso("Histórico desabilitado ([Historico] habilitado = false)")
+                UI.pausar()
+                return
+            
+            opcoes = list(CONSULTAS)
+            for i, nome in enumerate(opcoes, 1):
+                print(f"    {Cores.BRANCO_CLARO}[{i}]{Cores.RESET} {CONSULTAS[nome][0]}")
+            print(f"\n  {Cores.DIM}Banco: {historico.caminho}{Cores.RESET}\n")
+            
+            escolha = UI.input_styled("Consulta (ENTER = todas)")
+            if escolha is None:
+                historico.fechar()
+                return
+            if escolha.strip().isdigit() and 1 <= int(escolha) <= len(opcoes):
+                selecionadas = [opcoes[int(escolha) - 1]]
+            else:
+                selecionadas = opcoes
+            
+            for nome in selecionadas:
+                titulo, consulta = CONSULTAS[nome]
+                print(f"\n{Cores.CIANO}  ▸ {titulo}{Cores.RESET}")
+                imprimir_tabela(consulta(historico, limite=15, dias=30))
+            historico.fechar()
+        except Exception as e:
+            UI.erro(f"Erro: {e}")
+            traceback.print_exc()
+        
+        UI.pausar()
+    
     def mostrar_ajuda(self):
         """Exibe ajuda detalhada"""
         UI.limpar()
@@ -984,13 +1041,15 @@ class MT5NinjaBacktester:
                     self.verificar_configuracao()
                 elif opcao == "8":
                     self.testar_monitor()
+                elif opcao.lower() == "h":
+                    self.historico_execucoes()
                 elif opcao == "9":
                     self.mostrar_ajuda()
                 elif opcao in ["0", "10"]:
                     self.sair()
                     break
                 else:
-                    UI.erro("Opção inválida! Digite um número de 0-9")
+                    UI.erro("Opção inválida! Digite um número de 0-9 ou H")
                     time.sleep(1)
                 
                 # Atualizar status após cada operação
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""Linha de status por worker, redesenhada a uma taxa fixa.
+
+Os loops de poll (BacktestMonitor, OOS) chamam `console.atualizar(worker, texto)`
+a cada iteração; só o último texto de cada worker é guardado e a tela é
+redesenhada no máximo `fps` vezes por segundo, então um console lento (SSH,
+Windows) não segura o loop. Detalhes vão para o log estruturado (`detalhe`).
+
+- TTY: uma linha por worker, reescrita no lugar (ANSI);
+- sem TTY (redirecionado para arquivo/pipe): linhas simples, no máximo uma a
+  cada `intervalo_linhas` segundos por worker e só quando o texto muda.
+
+Mensagens permanentes (início/fim de backtest, diálogos tratados, retries)
+usam `console.escrever`, que imprime acima do bloco de status sem corrompê-lo;
+um `print` comum durante o bloco seria sobrescrito no próximo quadro.
+"""
+from __future__ import annotations
+
+import configparser
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, TextIO
+
+BASE_DIR = Path(__file__).resolve().parent
+
+LIMPAR_LINHA = '\x1b[2K'
+SUBIR_LINHAS = '\x1b[{}F'
+
+
+class StatusConsole:
+    """Agrega atualizações de status e redesenha com limite de quadros por segundo."""
+
+    def __init__(self, fps: float = 4.0, intervalo_linhas: float = 10.0, saida: TextIO = None,
+                 tty: Optional[bool] = None):
+        self._saida = saida
+        self.tty = self.saida.isatty() if tty is None else tty
+        self.intervalo = 1.0 / fps if fps > 0 else 0.0
+        self.intervalo_linhas = intervalo_linhas
+        self._status: Dict[str, str] = {}
+        self._impresso: Dict[str, tuple] = {}  # worker -> (texto, instante) no modo sem TTY
+        self._linhas_desenhadas = 0
+        self._ultimo_quadro = 0.0
+        self._lock = threading.Lock()
+        self._log = logging.getLogger('MT5Automacao')
+        if self.tty and os.name == 'nt':
+            os.system('')  # habilita sequências ANSI no console do Windows
+
+    @classmethod
+    def do_config(cls, caminho: Path = None) -> 'StatusConsole':
+        """Instância com a seção [Console] do config.ini (fps, intervalo_linhas)."""
+        config = configparser.ConfigParser()
+        config.read(caminho or BASE_DIR / 'config.ini', encoding='utf-8')
+        secao = config['Console'] if config.has_section('Console') else {}
+        return cls(fps=float(secao.get('fps', 4)), intervalo_linhas=float(secao.get('intervalo_linhas', 10)))
+
+    @property
+    def saida(self) -> TextIO:
+        """Saída fixa ou o sys.stdout do momento (respeita redirect_stdout)."""
+        return self._saida or sys.stdout
+
+    # ─────────────────────────────────────────────────────────────────────────
+
+    def atualizar(self, worker: str, texto: str, forcar: bool = False):
+        """Novo status do worker; desenha só se o quadro anterior já venceu."""
+        with self._lock:
+            self._status[worker] = texto
+            agora = time.monotonic()
+            if not self.tty:
+                self._linha_simples(worker, texto, agora, forcar)
+                return
+            if not forcar and agora - self._ultimo_quadro < self.intervalo:
+                return
+            self._ultimo_quadro = agora
+            self._desenhar()
+
+    def detalhe(self, msg: str, nivel: int = logging.DEBUG, **campos):
+        """Detalhe de diagnóstico: vai para o log estruturado, não para o console."""
+        self._log.log(nivel, msg, extra={'campos': campos} if campos else None)
+
+    def escrever(self, msg: str):
+        """Linha permanente acima do bloco de status."""
+        with self._lock:
+            if self.tty and self._linhas_desenhadas:
+                self._apagar_bloco()
+                self.saida.write(msg + '\n')
+                self._desenhar()
+            else:
+                self.saida.write(msg + '\n')
+                self.saida.flush()
+
+    def remover(self, worker: str):
+        """Tira o worker do bloco (ex.: backtest concluído)."""
+        with self._lock:
+            if self._status.pop(worker, None) is not None and self.tty:
+                self._desenhar()
+            self._impresso.pop(worker, None)
+
+    def finalizar(self):
+        """Deixa o último status na tela e libera o cursor."""
+        with self._lock:
+            self._status.clear()
+            self._impresso.clear()
+            self._linhas_desenhadas = 0
+
+    # ─────────────────────────────────────────────────────────────────────────
+
+    def _largura(self) -> int:
+        return max(shutil.get_terminal_size((100, 20)).columns - 1, 20)
+
+    def _apagar_bloco(self):
+        if self._linhas_desenhadas:
+            self.saida.write(SUBIR_LINHAS.format(self._linhas_desenhadas))
+            self.saida.write((LIMPAR_LINHA + '\n') * self._linhas_desenhadas)
+            self.saida.write(SUBIR_LINHAS.format(self._linhas_desenhadas))
+            self._linhas_desenhadas = 0
+
+    def _desenhar(self):
+        largura = self._largura()
+        partes = []
+        if self._linhas_desenhadas:
+            partes.append(SUBIR_LINHAS.format(self._linhas_desenhadas))
+        for worker, texto in self._status.items():
+            partes.append(f"{LIMPAR_LINHA}[{worker}] {texto}"[:largura + len(LIMPAR_LINHA)] + '\n')
+        # Linhas que sobraram de um bloco maior
+        for _ in range(self._linhas_desenhadas - len(self._status)):
+            partes.append(LIMPAR_LINHA + '\n')
+        if self._linhas_desenhadas > len(self._status):
+            partes.append(SUBIR_LINHAS.format(self._linhas_desenhadas - len(self._status)))
+        self.saida.write(''.join(partes))
+        self.saida.flush()
+        self._linhas_desenhadas = len(self._status)
+
+    def _linha_simples(self, worker: str, texto: str, agora: float, forcar: bool):
+        anterior = self._impresso.get(worker)
+        if not forcar and anterior is not None and (anterior[0] == texto or agora - anterior[1] < self.intervalo_linhas):
+            return
+        self._impresso[worker] = (texto, agora)
+        self.saida.write(f"[{worker}] {texto}\n")
+        self.saida.flush()
+
+
+# Instância global (como o logger da automação)
+console = StatusConsole.do_config()
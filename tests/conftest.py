@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""Os módulos do projeto ficam na raiz (sem pacote): torna-os importáveis nos testes."""
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+if str(RAIZ) not in sys.path:
+    sys.path.insert(0, str(RAIZ))
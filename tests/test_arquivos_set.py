@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""Leitura de .set: encodings do MT5/editores, comentários e faixas de otimização."""
+import codecs
+
+import pytest
+
+import arquivos_set
+from arquivos_set import InputSet, decodificar, ler_set
+
+CONTEUDO = (
+    "; gerado pelo MT5\n"
+    "Lote=1\n"
+    "  Stop = 100||50||10||200||Y \n"
+    "Alvo=300||100||50||500||N\n"
+    "Comentario=ação=compra\n"
+    "\n"
+    "linha sem igual\n"
+)
+
+
+@pytest.mark.parametrize('dados', [
+    codecs.BOM_UTF16_LE + CONTEUDO.encode('utf-16-le'),
+    CONTEUDO.encode('utf-16'),
+    CONTEUDO.encode('utf-16-le'),          # sem BOM: detectado pelos bytes nulos
+    codecs.BOM_UTF8 + CONTEUDO.encode('utf-8'),
+    CONTEUDO.encode('utf-8'),
+])
+def test_decodificar_encodings_do_set(dados):
+    assert decodificar(dados) == CONTEUDO
+
+
+def test_ler_set_ignora_comentarios_e_linhas_invalidas(tmp_path):
+    caminho = tmp_path / 'exemplo.set'
+    caminho.write_text(CONTEUDO, encoding='utf-16')
+
+    inputs = ler_set(caminho)
+    assert [i.nome for i in inputs] == ['Lote', 'Stop', 'Alvo', 'Comentario']
+    assert inputs[0] == InputSet('Lote', '1')
+    assert inputs[1] == InputSet('Stop', '100', '50', '10', '200', otimizar=True)
+    assert not inputs[2].otimizar and inputs[2].tem_faixa
+    assert inputs[3].valor == 'ação=compra'
+
+
+def test_texto_no_formato_do_tester_inputs(tmp_path):
+    caminho = tmp_path / 'exemplo.set'
+    caminho.write_text("Lote=1\nStop=100||50\nAlvo=300||100||50||500||y\n", encoding='utf-8')
+
+    assert arquivos_set.tester_inputs(caminho) == {
+        'Lote': '1',
+        'Stop': '100||50||||||N',   # faixa incompleta completada com vazios
+        'Alvo': '300||100||50||500||Y',
+    }
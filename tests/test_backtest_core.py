@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Template INI compilado: encoding/BOM, quebra de linha, Report e [TesterInputs]."""
+import codecs
+
+import pytest
+
+from backtest_core import INIGenerator, JobINI, TemplateINI
+
+TEMPLATE = (
+    "; template de exemplo\n"
+    "[Tester]\n"
+    "Expert=Exemplo\\EA.ex5\n"
+    "Symbol=WIN$N\n"
+    "Period=M5\n"
+    "; datas trocadas por step\n"
+    "FromDate=2020.01.01\n"
+    "ToDate=2020.12.31\n"
+    "\n"
+    "[Common]\n"
+    "Login=123\n"
+)
+
+
+def _gerador(tmp_path, texto=TEMPLATE, encoding='utf-8', injetar_inputs=True):
+    template = tmp_path / 'template.ini'
+    template.write_bytes(texto.encode(encoding))
+    return INIGenerator(template, tmp_path / 'reports', injetar_inputs=injetar_inputs)
+
+
+def _job(de, ate, **kwargs):
+    return JobINI(de, ate, de.replace('.', ''), ate.replace('.', ''), **kwargs)
+
+
+def test_template_troca_valores_no_lugar_e_preserva_comentarios():
+    template = TemplateINI(TEMPLATE)
+    texto = template.renderizar({'tester': {'fromdate': '2024.01.02', 'Model': '1'},
+                                 'Extra': {'Chave': 'v'}})
+    linhas = texto.split('\n')
+    assert 'FromDate=2024.01.02' in linhas  # grafia do template mantida
+    assert '; datas trocadas por step' in linhas
+    assert linhas.index('Model=1') == linhas.index('ToDate=2020.12.31') + 1  # antes da linha vazia
+    assert linhas[-3:] == ['[Extra]', 'Chave=v', '']
+    assert template.valor('TESTER', 'symbol') == 'WIN$N'
+    assert template.valor('Tester', 'Model', 'padrao') == 'padrao'
+
+
+@pytest.mark.parametrize('encoding, bom', [('utf-16', codecs.BOM_UTF16_LE), ('utf-8-sig', codecs.BOM_UTF8)])
+def test_build_many_mantem_encoding_bom_e_crlf(tmp_path, encoding, bom):
+    gerador = _gerador(tmp_path, TEMPLATE.replace('\n', '\r\n'), encoding)
+    caminhos = gerador.build_many([_job('2024.01.02', '2024.01.31'), _job('2024.02.01', '2024.02.29')],
+                                  tmp_path / 'ini')
+
+    assert [c.name for c in caminhos] == ['OOS_20240102_20240131.ini', 'OOS_20240201_20240229.ini']
+    dados = caminhos[1].read_bytes()
+    assert dados.startswith(bom) and dados.count(bom) == 1
+    texto = dados.decode(encoding)
+    assert '\r\n' in texto and '\n' not in texto.replace('\r\n', '')
+    assert 'FromDate=2024.02.01\r\n' in texto and 'ToDate=2024.02.29\r\n' in texto
+
+
+def test_report_dedicado_so_sem_report_no_template(tmp_path):
+    gerador = _gerador(tmp_path)
+    texto, _ = gerador.build('2024.01.02', '2024.01.31', '02012024', '31012024')
+    assert f"Report={(tmp_path / 'reports' / 'OOS_02012024_31012024.html').as_posix()}" in texto
+    assert 'ReplaceReport=1' in texto
+
+    com_report = _gerador(tmp_path, TEMPLATE.replace('Period=M5\n', 'Period=M5\nReport=fixo.html\n'))
+    texto, _ = com_report.build('2024.01.02', '2024.01.31', '02012024', '31012024')
+    assert 'Report=fixo.html' in texto and 'ReplaceReport' not in texto
+
+
+def test_tester_inputs_do_set_e_chaves_por_job(tmp_path):
+    conjunto = tmp_path / 'exemplo.set'
+    conjunto.write_text('; comentário\nLote=2\nStop=100||50||10||200||Y\n', encoding='utf-16')
+    gerador = _gerador(tmp_path)
+
+    caminho, = gerador.build_many([_job('2024.01.02', '2024.01.31', set_file=conjunto, tester={'Model': '4'})],
+                                  tmp_path / 'ini')
+    linhas = caminho.read_text(encoding='utf-8').split('\n')
+    assert 'Model=4' in linhas
+    assert f"Set={conjunto.as_posix()}" in linhas
+    inputs = linhas[linhas.index('[TesterInputs]') + 1:]
+    assert inputs[:2] == ['Lote=2', 'Stop=100||50||10||200||Y']
+
+    sem_inputs = _gerador(tmp_path, injetar_inputs=False)
+    texto, _ = sem_inputs.build('2024.01.02', '2024.01.31', 'a', 'b', set_file=conjunto)
+    assert '[TesterInputs]' not in texto
+
+
+def test_extract_symbol_period(tmp_path):
+    assert _gerador(tmp_path).extract_symbol_period() == ('WIN$N', 'M5')
@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""Benchmark ponta a ponta: roda pelo DriverFake sem gravar nada no projeto."""
+import benchmark_e2e
+
+
+def _arquivos_gerados():
+    base = benchmark_e2e.BASE_DIR
+    return {p for padrao in ('logs/*', 'cache_resultados/*', 'historico_execucoes.sqlite*', 'delays_perfil.json')
+            for p in base.glob(padrao)}
+
+
+def test_benchmark_usa_so_pastas_temporarias():
+    antes = _arquivos_gerados()
+    resultado = benchmark_e2e.executar_benchmark(jobs=4, escala=0.0)
+    assert resultado['set_ms']['n'] == 4
+    assert set(resultado['fases_ms']) == {'carregar', 'iniciar', 'aguardar', 'exportar'}
+    assert _arquivos_gerados() == antes
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Chave de conteúdo e orçamento LRU do cache de resultados."""
+import pytest
+
+import cache_resultados
+from cache_resultados import CacheResultados, chave_backtest
+
+TESTER = {'Expert': 'EA.ex5', 'Symbol': 'WIN$N', 'Period': 'M5', 'Model': '1',
+          'FromDate': '2023.01.02', 'ToDate': '2023.06.30'}
+
+
+@pytest.fixture
+def set_path(tmp_path):
+    caminho = tmp_path / 'estrategia.set'
+    caminho.write_text('Lote=1\nStopLoss=100||50||10||500||Y\n', encoding='utf-16')
+    return caminho
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = CacheResultados(tmp_path / 'cache', limite_mb=1)
+    yield c
+    c.fechar()
+
+
+def _arquivo(pasta, nome, tamanho):
+    caminho = pasta / nome
+    caminho.write_bytes(b'x' * tamanho)
+    return caminho
+
+
+def test_chave_estavel_e_sem_caminhos_de_saida(set_path):
+    base = chave_backtest(set_path, TESTER, None, 'EA.ex5')
+    assert base == chave_backtest(set_path, {k.lower(): v for k, v in TESTER.items()}, None, 'EA.ex5')
+    com_report = dict(TESTER, Report='C:/x/outro.html', ReplaceReport='1', Visual='0')
+    assert base == chave_backtest(set_path, com_report, None, 'EA.ex5')
+
+
+@pytest.mark.parametrize('campo, valor', [('Symbol', 'WDO$N'), ('Period', 'H1'), ('Model', '4'),
+                                          ('Deposit', '50000')])
+def test_chave_muda_com_o_tester(set_path, campo, valor):
+    assert chave_backtest(set_path, TESTER, None) != chave_backtest(set_path, dict(TESTER, **{campo: valor}), None)
+
+
+def test_chave_muda_com_set_ea_e_datas(set_path, tmp_path):
+    base = chave_backtest(set_path, TESTER, None, 'EA.ex5')
+    assert base != chave_backtest(set_path, TESTER, None, 'EA.ex5', '2024.01.02', '2024.06.28')
+    assert base != chave_backtest(set_path, TESTER, None, 'Outro.ex5')
+    set_path.write_text('Lote=2\n', encoding='utf-16')
+    assert base != chave_backtest(set_path, TESTER, None, 'EA.ex5')
+
+
+def test_chave_usa_bytes_do_ex5(cache, set_path, tmp_path):
+    ea = _arquivo(tmp_path, 'EA.ex5', 10)
+    antes = cache.chave(set_path, TESTER, ea)
+    assert antes == cache.chave(set_path, TESTER, ea)
+    ea.write_bytes(b'recompilado')
+    assert antes != cache.chave(set_path, TESTER, ea)
+
+
+def test_armazenar_restaurar(cache, tmp_path):
+    csv = _arquivo(tmp_path, 'r.csv', 100)
+    relatorio = _arquivo(tmp_path, 'r.html', 50)
+    assert cache.armazenar('ab' * 32, csv, relatorio, descricao='teste')
+    destino = tmp_path / 'saida' / 'step.htm'
+    assert cache.restaurar('ab' * 32, destino, tmp_path / 'saida' / 'rel.html')
+    assert destino.read_bytes() == csv.read_bytes()
+    assert (tmp_path / 'saida' / 'rel.html').exists()
+    assert not cache.restaurar('cd' * 32, tmp_path / 'nada.csv')
+    assert (cache.acertos, cache.faltas) == (1, 1)
+
+
+def test_entrada_sem_csv_e_descartada(cache, tmp_path):
+    cache.armazenar('ab' * 32, _arquivo(tmp_path, 'r.csv', 10))
+    (cache._dir('ab' * 32) / 'resultado.csv').unlink()
+    assert cache.obter('ab' * 32) is None
+    assert cache.tamanho_total() == 0
+
+
+def test_despejo_lru_respeita_fixadas(cache, tmp_path):
+    meio_mb = 512 * 1024
+    chaves = [f"{i:02d}" * 32 for i in range(3)]
+    cache.armazenar(chaves[0], _arquivo(tmp_path, 'a.csv', meio_mb - 100))
+    cache.fixar(chaves[0])
+    cache.armazenar(chaves[1], _arquivo(tmp_path, 'b.csv', meio_mb - 100))
+    cache.obter(chaves[1])
+    cache.armazenar(chaves[2], _arquivo(tmp_path, 'c.csv', meio_mb - 100))
+    restantes = {chave for chave, *_ in cache.entradas()}
+    assert restantes == {chaves[0], chaves[2]}
+    assert cache.tamanho_total() <= cache.limite_bytes
+
+
+def test_secao_tester_do_ini():
+    ini = "[Tester]\nExpert=EA.ex5\nSymbol=WIN$N\n[TesterInputs]\nLote=1\n"
+    assert cache_resultados.tester_de_ini(ini) == {'expert': 'EA.ex5', 'symbol': 'WIN$N'}
+    assert cache_resultados.tester_de_ini("[Outra]\na=1\n") == {}
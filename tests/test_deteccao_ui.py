@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Template matching (NCC via FFT) e DetectorEstadoUI com imagens sintéticas."""
+import numpy as np
+import pytest
+
+from deteccao_ui import DetectorEstadoUI, TemplateUI, localizar
+
+
+def _imagem(altura=120, largura=160, semente=0):
+    return np.random.default_rng(semente).integers(0, 256, (altura, largura)).astype(np.float32)
+
+
+def test_localizar_encontra_recorte_exato():
+    img = _imagem()
+    template = img[40:60, 70:100].copy()
+    x, y, score = localizar(img, template)
+    assert (x, y) == (70, 40)
+    assert score == pytest.approx(1.0, abs=1e-4)
+
+
+def test_localizar_invariante_a_brilho_e_contraste():
+    img = _imagem(semente=1)
+    template = img[10:30, 20:50].copy()
+    x, y, score = localizar(img * 0.5 + 40, template)
+    assert (x, y) == (20, 10)
+    assert score == pytest.approx(1.0, abs=1e-4)
+
+
+def test_localizar_aceita_rgb():
+    img = np.stack([_imagem(semente=2)] * 3, axis=-1)
+    template = img[50:70, 5:25].copy()
+    assert localizar(img, template)[:2] == (5, 50)
+
+
+def test_localizar_template_maior_ou_constante():
+    img = _imagem(40, 40)
+    assert localizar(img, _imagem(50, 50)) == (0, 0, 0.0)
+    assert localizar(img, np.full((5, 5), 7.0)) == (0, 0, 0.0)
+
+
+def test_localizar_sem_o_template_tem_score_baixo():
+    img = _imagem(semente=3)
+    outro = _imagem(20, 20, semente=4)
+    assert localizar(img, outro)[2] < 0.5
+
+
+def test_fft_do_template_e_cacheada_por_tamanho():
+    template = TemplateUI('t', _imagem(10, 10))
+    assert template.fft((64, 64)) is template.fft((64, 64))
+    assert template.fft((32, 32)) is not template.fft((64, 64))
+
+
+def _detector(tela, origem=(100, 50)):
+    capturas = []
+
+    def capturar(regiao):
+        capturas.append(regiao)
+        if regiao is None:
+            return tela
+        x, y, w, h = regiao
+        return tela[y:y + h, x:x + w]
+
+    detector = DetectorEstadoUI(origem=lambda: origem, capturar=capturar, resolucao=lambda: 'teste')
+    return detector, capturas
+
+
+def test_detectar_com_regiao_devolve_coordenada_relativa_ao_cliente():
+    tela = _imagem(300, 400, semente=5)
+    detector, capturas = _detector(tela)
+    # Template a (30, 20) do cliente; região de busca (10, 10, 80, 60) relativa ao cliente
+    detector.registrar(TemplateUI('aba', tela[70:85, 130:160].copy(), regiao=(10, 10, 80, 60)), 'teste')
+    assert detector.detectar('aba')[:2] == (30, 20)
+    assert capturas == [(110, 60, 80, 60)]
+
+
+def test_detectar_tela_inteira_desconta_origem():
+    tela = _imagem(300, 400, semente=6)
+    detector, _ = _detector(tela)
+    detector.registrar(TemplateUI('dialogo', tela[200:220, 300:330].copy()), 'teste')
+    assert detector.detectar('dialogo')[:2] == (200, 150)
+
+
+def test_detectar_abaixo_do_limiar_e_estado_desconhecido():
+    tela = _imagem(100, 100, semente=7)
+    detector, _ = _detector(tela, origem=(0, 0))
+    detector.registrar(TemplateUI('ausente', _imagem(12, 12, semente=8)), 'teste')
+    assert detector.detectar('ausente') is None
+    assert detector.detectar('nao_registrado') is None
+    assert detector.estado_atual('nao_registrado', 'ausente') is None
+
+
+def test_estado_atual_respeita_a_ordem():
+    tela = _imagem(100, 100, semente=9)
+    detector, _ = _detector(tela, origem=(0, 0))
+    detector.registrar(TemplateUI('a', tela[0:10, 0:10].copy()), 'teste')
+    detector.registrar(TemplateUI('b', tela[50:60, 50:60].copy()), 'teste')
+    assert detector.estado_atual('b', 'a') == 'b'
+    assert detector.conhece('a') and not detector.conhece('c')
+
+
+def test_aguardar_expira_sem_o_estado():
+    tela = _imagem(60, 60, semente=10)
+    detector, _ = _detector(tela, origem=(0, 0))
+    detector.registrar(TemplateUI('x', _imagem(8, 8, semente=11)), 'teste')
+    assert detector.aguardar('x', timeout=0.05, intervalo=0.01) is False
+
+
+def test_templates_do_disco(tmp_path):
+    pytest.importorskip('PIL')
+    from PIL import Image
+    tela = _imagem(80, 80, semente=12).astype(np.uint8)
+    pasta = tmp_path / 'teste'
+    pasta.mkdir()
+    Image.fromarray(tela[20:36, 30:46]).save(pasta / 'botao.png')
+    (pasta / 'botao.json').write_text('{"limiar": 0.8}', encoding='utf-8')
+    detector = DetectorEstadoUI(tmp_path, origem=lambda: (0, 0), capturar=lambda regiao: tela,
+                                resolucao=lambda: 'teste')
+    assert detector.templates()['botao'].limiar == 0.8
+    assert detector.detectar('botao')[:2] == (30, 20)
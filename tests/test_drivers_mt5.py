@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Drivers: grafia das chaves no INI headless e datas do terminal simulado."""
+import time
+
+import drivers_mt5
+from drivers_mt5 import DriverFake, DriverINI, data_mt5, grafia_mt5
+
+
+def test_grafia_mt5_restaura_a_grafia_do_tester():
+    assert grafia_mt5('fromdate') == 'FromDate'
+    assert grafia_mt5('EXPERT') == 'Expert'
+    assert grafia_mt5('MinhaChave') == 'MinhaChave'
+    assert data_mt5('02/01/2024') == '2024.01.02'
+
+
+def test_driver_ini_grava_chaves_com_a_grafia_do_mt5(tmp_path, monkeypatch):
+    (tmp_path / 'MQL5').mkdir()
+    conjunto = tmp_path / 'exemplo.set'
+    conjunto.write_text('Lote=1\nStop=100||50||10||200||Y\n', encoding='utf-8')
+    monkeypatch.setattr(drivers_mt5.subprocess, 'Popen', lambda cmd: cmd)
+
+    # [Tester] do config.ini chega em minúsculas (configparser)
+    driver = DriverINI(tmp_path, {'expert': 'Exemplo\\EA.ex5', 'fromdate': '2024.01.02', 'report': 'x'},
+                       tmp_path / 'trabalho')
+    assert driver.abrir() and driver.carregar(conjunto) and driver.iniciar()
+
+    texto = (tmp_path / 'trabalho' / 'exemplo.ini').read_text(encoding='utf-16')
+    linhas = texto.splitlines()
+    assert 'Expert=Exemplo\\EA.ex5' in linhas
+    assert 'FromDate=2024.01.02' in linhas
+    assert 'ExpertParameters=exemplo.set' in linhas
+    assert sum(linha.lower().startswith('report=') for linha in linhas) == 1
+    assert linhas[linhas.index('[TesterInputs]') + 2] == 'Stop=100||50||10||200||Y'
+
+
+def test_driver_fake_reporta_as_datas_executadas(tmp_path):
+    ini = tmp_path / 'step.ini'
+    ini.write_text('[Tester]\nFromDate=2024.01.02\nToDate=2024.01.31\n', encoding='utf-16')
+    driver = DriverFake(dict.fromkeys(drivers_mt5.LATENCIAS_FAKE, 0.0), jitter=0.0, semente=1)
+
+    inicio = time.time()
+    assert driver.lancar(ini).pid == 1
+    assert driver.aguardar('step', 5)
+    assert driver.datas_executadas(inicio) == ('2024.01.02', '2024.01.31')
+
+    driver.aplicar_datas('01/02/2024', '29/02/2024')
+    assert driver.datas_executadas(time.time() + 1) is None
+    driver.aguardar('step', 5)
+    assert driver.datas_executadas(inicio) == ('2024.02.01', '2024.02.29')
+    assert driver.salvar_relatorio(tmp_path / 'r' / 'OOS.html')
+    assert '2024.02.01' in (tmp_path / 'r' / 'OOS.html').read_text(encoding='utf-8')
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Batch OOS pelo DriverFake: cada step vira um job no histórico de execuções."""
+import pytest
+
+import extracao_oos
+import rastreamento
+from automacao import logger
+from cache_resultados import CacheResultados
+from drivers_mt5 import LATENCIAS_FAKE, DriverFake
+from extracao_oos import OOSBatchRunner
+from historico_execucoes import HistoricoExecucoes
+from perfil_delays import PerfilDelays
+
+TEMPLATE = "[Tester]\nExpert=Exemplo\\EA.ex5\nSymbol=WIN$N\nPeriod=M5\nFromDate=2020.01.01\nToDate=2020.12.31\n"
+RANGES = [('02/01/2024', '31/01/2024'), ('01/02/2024', '29/02/2024')]
+
+
+@pytest.fixture
+def runner(tmp_path, monkeypatch):
+    # Logs e spans na pasta temporária: nada é gravado no projeto
+    logger.parar()
+    monkeypatch.setattr(logger, 'logs_folder', tmp_path / 'logs')
+    rastreamento.ativar(rastreamento.Rastreador(tmp_path / 'logs'))
+    monkeypatch.setattr(extracao_oos.time, 'sleep', lambda s: None)
+    (tmp_path / 'template.ini').write_text(TEMPLATE, encoding='utf-8')
+    (tmp_path / 'exemplo.set').write_text('Lote=1\n', encoding='utf-8')
+    driver = DriverFake(dict.fromkeys(LATENCIAS_FAKE, 0.0), jitter=0.0, semente=1)
+    auto = extracao_oos.MT5Automacao(curvas_folder=tmp_path / 'curvas', driver=driver,
+                                     cache=CacheResultados(tmp_path / 'cache'),
+                                     historico=HistoricoExecucoes(tmp_path / 'historico.sqlite'),
+                                     delays=PerfilDelays(caminho=tmp_path / 'delays.json'))
+    yield OOSBatchRunner(auto, tmp_path / 'template.ini', tmp_path / 'exemplo.set', tmp_path / 'oos',
+                         post_launch_wait=0, espera_pre_clique=0, terminal_standby='', reusar_terminal=False)
+    auto._historico.fechar()
+    auto._cache.fechar()
+    logger.parar()
+    rastreamento.ativar(None)
+
+
+def test_steps_oos_entram_no_historico(runner):
+    historico = runner.automacao._historico
+    runner.run(RANGES)
+    runner.run(RANGES[:1])  # mesmo step: restaurado do cache
+
+    execucoes = historico._consulta("SELECT * FROM execucoes ORDER BY id")
+    assert [(e['total'], e['sucessos'], e['falhas']) for e in execucoes] == [(2, 2, 0), (1, 1, 0)]
+    assert all(e['fim'] is not None for e in execucoes)
+    jobs = historico._consulta("SELECT * FROM jobs ORDER BY id")
+    assert [(j['execucao_id'], j['resultado']) for j in jobs] == [(1, 'sucesso'), (1, 'sucesso'), (2, 'cache')]
+    assert jobs[0]['set_nome'] == 'exemplo OOS 02/01/2024-31/01/2024'
+    assert (jobs[0]['simbolo'], jobs[0]['periodo']) == ('WIN$N', 'M5')
+    assert jobs[0]['chave'] and jobs[0]['chave'] == jobs[2]['chave']
+    assert jobs[1]['saida'].endswith('.csv') and jobs[1]['t_exportar'] is not None
+    assert jobs[1]['t_aguardar'] is not None
+    assert runner.automacao._execucao_id is None
+
+
+def test_espera_do_step_desenha_uma_linha_so(runner, monkeypatch):
+    linhas = []
+    monkeypatch.setattr(extracao_oos.console, 'atualizar', lambda worker, texto, forcar=False: linhas.append(worker))
+    processos = iter([[{'pid': 5, 'name': 'metatester64', 'cpu': 90.0}]] * 2 + [[]])
+    monitor = runner._monitor
+    monkeypatch.setattr(monitor, '_check_port_activity', lambda: (True, True, [{'pid': 5}]))
+    monkeypatch.setattr(monitor, '_get_metatester_processes', lambda: next(processos))
+    monitor.start()
+
+    assert runner._aguardar_termino('02/01/2024', '31/01/2024')
+    assert set(linhas) == {'OOS 02/01/2024-31/01/2024 (limite 240s)'}
+    assert monitor.rotulo == 'porta 3000'
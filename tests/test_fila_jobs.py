@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Fila persistente: ordem, lease, devolução, retomada e transações."""
+import time
+
+import pytest
+
+import fila_jobs
+from fila_jobs import FilaJobs
+
+
+@pytest.fixture
+def fila(tmp_path):
+    f = FilaJobs(tmp_path / 'fila.sqlite', lease_segundos=60)
+    yield f
+    f.fechar()
+
+
+def _caminhos(tmp_path, *nomes):
+    return [tmp_path / f"{nome}.set" for nome in nomes]
+
+
+def test_enfileirar_ignora_repetidos_e_mantem_ordem(fila, tmp_path):
+    assert fila.enfileirar(_caminhos(tmp_path, 'b', 'a')) == 2
+    assert fila.enfileirar(_caminhos(tmp_path, 'a', 'c')) == 1
+    assert [fila.proximo().caminho.stem for _ in range(3)] == ['b', 'a', 'c']
+    assert fila.proximo() is None
+
+
+def test_enfileirar_desfaz_a_transacao_em_erro(fila, tmp_path):
+    def caminhos():
+        yield tmp_path / 'a.set'
+        raise OSError('listagem interrompida')
+
+    with pytest.raises(OSError):
+        fila.enfileirar(caminhos())
+    assert not fila._con.in_transaction
+    assert fila.total() == 0
+    assert fila.enfileirar(_caminhos(tmp_path, 'a')) == 1
+
+
+def test_proximo_marca_lease_e_conta_tentativas(fila, tmp_path):
+    fila.enfileirar(_caminhos(tmp_path, 'a'))
+    job = fila.proximo()
+    assert job.tentativas == 1
+    assert fila.contagem()['em_execucao'] == 1
+    lease = fila._con.execute('SELECT lease_ate FROM jobs WHERE id = ?', (job.id,)).fetchone()[0]
+    assert lease == pytest.approx(time.time() + 60, abs=5)
+
+
+def test_renovar_estende_lease_so_do_dono(fila, tmp_path):
+    fila.enfileirar(_caminhos(tmp_path, 'a'))
+    job = fila.proximo()
+    fila._con.execute('UPDATE jobs SET lease_ate = 0')
+    fila.renovar(job)
+    assert fila.recuperar_leases() == 0  # lease renovado: continua com este processo
+    fila._con.execute("UPDATE jobs SET lease_ate = 0, dono = 'outro-host:1'")
+    fila.renovar(job)
+    assert fila._con.execute('SELECT lease_ate FROM jobs').fetchone()[0] == 0
+
+
+def test_devolver_so_afeta_job_em_execucao(fila, tmp_path):
+    fila.enfileirar(_caminhos(tmp_path, 'a', 'b'))
+    a, b = fila.proximo(), fila.proximo()
+    fila.concluir(a, tmp_path / 'a.csv')
+    fila.devolver(a)
+    fila.devolver(b)
+    assert fila.contagem() == {'pendente': 1, 'em_execucao': 0, 'concluido': 1, 'falha': 0}
+    assert fila.proximo().tentativas == 2
+
+
+def test_recuperar_leases_orfaos_e_falhas(fila, tmp_path, monkeypatch):
+    fila.enfileirar(_caminhos(tmp_path, 'vencido', 'vivo', 'falhou'))
+    vencido, vivo, falhou = fila.proximo(), fila.proximo(), fila.proximo()
+    fila.falhar(falhou, 'exportar/csv_ausente')
+    fila._con.execute('UPDATE jobs SET lease_ate = 0 WHERE id = ?', (vencido.id,))
+    fila._con.execute("UPDATE jobs SET dono = 'outro-host:1' WHERE id = ?", (vivo.id,))
+    monkeypatch.setattr(fila_jobs, '_dono_vivo', lambda dono: dono == 'outro-host:1')
+
+    assert fila.recuperar_leases() == 1
+    assert fila.contagem() == {'pendente': 2, 'em_execucao': 1, 'concluido': 0, 'falha': 0}
+
+
+def test_fila_sobrevive_a_reabertura(tmp_path):
+    caminho = tmp_path / 'fila.sqlite'
+    f = FilaJobs(caminho)
+    f.enfileirar(_caminhos(tmp_path, 'a', 'b'))
+    f.concluir(f.proximo())
+    f.fechar()
+    f = FilaJobs(caminho)
+    try:
+        assert f.contagem()['concluido'] == 1
+        assert f.proximo().caminho.stem == 'b'
+    finally:
+        f.fechar()
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""Registro de janelas e coordenadas relativas à área cliente do terminal."""
+import json
+from dataclasses import dataclass
+
+import automacao
+from automacao import MT5Automacao
+from janelas_mt5 import RegistroJanelasMT5, titulo_parece_mt5
+
+
+@dataclass
+class JanelaFake:
+    title: str = '123456 - XPMT5-PRD - Netting - XP'
+    left: int = 100
+    top: int = 50
+    width: int = 1200
+    height: int = 800
+    isMinimized: bool = False
+    isActive: bool = True
+
+
+def _automacao(tmp_path, monkeypatch, janelas, coords):
+    (tmp_path / 'coordenadas.json').write_text(json.dumps(coords), encoding='utf-8')
+    monkeypatch.setattr(automacao, 'BASE_DIR', tmp_path)
+    monkeypatch.setattr(automacao, 'chave_perfil_tela', lambda: '1920x1080@96')
+    auto = MT5Automacao.__new__(MT5Automacao)  # só o necessário para as coordenadas
+    auto.terminal_pid = None
+    auto._janelas = RegistroJanelasMT5(lambda: list(janelas))
+    auto._coords_absolutas = set()
+    auto.coords = auto._carregar_coordenadas()
+    return auto
+
+
+def test_titulos_de_terminal():
+    assert titulo_parece_mt5('12656329 - XPMT5-PRD - Netting - XP Investimentos')
+    assert titulo_parece_mt5('123456 - MetaTrader 5 - Hedging - Clear')
+    assert not titulo_parece_mt5('Documento - Bloco de Notas')
+
+
+def test_recarga_com_janela_deixa_de_tratar_coordenadas_como_absolutas(tmp_path, monkeypatch):
+    janelas = []
+    auto = _automacao(tmp_path, monkeypatch, janelas, {})
+    assert 'start_button' in auto._coords_absolutas  # padrão legado, sem janela para converter
+
+    # MT5 aberto depois (garantir_mt5_rodando) e calibração gravando o perfil e recarregando
+    janelas.append(JanelaFake())
+    perfil = {'perfis': {'1920x1080@96': {'start_button': [30, 40]}}}
+    (tmp_path / 'coordenadas.json').write_text(json.dumps(perfil), encoding='utf-8')
+    auto._janelas.invalidar()
+    auto.coords = auto._carregar_coordenadas()
+
+    assert auto._coords_absolutas == set()
+    assert auto.ponto('start_button') == (130, 90)
+    assert auto.ponto('graph_tab') == (474, 683)  # legado convertido e traduzido de volta
+
+
+def test_janela_minimizada_nao_converte_coordenadas_legadas(tmp_path, monkeypatch):
+    janelas = [JanelaFake(left=-32000, top=-32000, isMinimized=True)]
+    auto = _automacao(tmp_path, monkeypatch, janelas, {'start_button': [1336, 684]})
+
+    assert auto._janelas.minimizada()
+    assert auto.coords['start_button'] == (1336, 684)
+    assert auto.ponto('start_button') == (1336, 684)
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""Log assíncrono: registros JSON com contexto e traceback preservado."""
+import json
+
+import rastreamento
+from log_estruturado import LogAssincrono, agregar
+
+
+def _registros(log):
+    log.parar()
+    return [json.loads(linha) for linha in log.caminho.read_text(encoding='utf-8').splitlines()]
+
+
+def test_traceback_chega_ao_arquivo(tmp_path):
+    log = LogAssincrono('teste_traceback', tmp_path)
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        log.logger.exception("falhou %s", 'set_001')
+
+    registro, = _registros(log)
+    assert registro['msg'] == 'falhou set_001'
+    assert registro['nivel'] == 'ERROR'
+    assert 'Traceback' in registro['excecao']
+    assert 'ZeroDivisionError' in registro['excecao']
+
+
+def test_contexto_e_campos_do_job(tmp_path):
+    log = LogAssincrono('teste_contexto', tmp_path, worker='host:1')
+    with rastreamento.contexto(job='set_002'):
+        log.logger.warning("lento", extra={'campos': {'fase': 'exportar'}})
+    log.logger.info("fora do job")
+
+    primeiro, segundo = _registros(log)
+    assert (primeiro['job'], primeiro['fase'], primeiro['worker']) == ('set_002', 'exportar', 'host:1')
+    assert 'excecao' not in primeiro and 'job' not in segundo
+    assert [r['msg'] for r in agregar(tmp_path, job='set_002')] == ['lento']
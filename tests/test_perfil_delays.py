@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""Perfil de delays: a maior falha vira piso das sondagens; perfis antigos migram."""
+import json
+
+from perfil_delays import PerfilDelays
+
+
+def test_sondagem_nao_desce_abaixo_da_maior_falha(tmp_path):
+    delays = PerfilDelays(caminho=tmp_path / 'delays.json', host='h', sucessos_para_sondar=1)
+    for valor in (0.4, 1.0):
+        delays._passo('menu', valor)['atual'] = valor
+        delays.registrar_falha(['menu'])
+    assert delays._passos['menu']['maior_falha'] == 1.0
+
+    delays._passos['menu']['atual'] = 1.2
+    delays.registrar_sucesso(['menu'])
+    assert delays._passos['menu']['atual'] == 1.1  # 1.0 x margem 1.1, não 1.2 x 0.85
+
+
+def test_perfil_antigo_com_min_falha_migra(tmp_path):
+    caminho = tmp_path / 'delays.json'
+    antigo = {'atual': 0.5, 'seguro': 0.5, 'min_falha': 0.3, 'sucessos_seguidos': 0, 'sucessos': 4, 'falhas': 1}
+    caminho.write_text(json.dumps({'h': {'menu': antigo}}), encoding='utf-8')
+
+    delays = PerfilDelays(caminho=caminho, host='h')
+    assert delays._passos['menu']['maior_falha'] == 0.3 and 'min_falha' not in delays._passos['menu']
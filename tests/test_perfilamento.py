@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""Perfilador: percentil compartilhado e memória só de fases sem sobreposição."""
+import threading
+
+from perfilamento import Perfilador, percentil
+
+
+def test_percentil_interpola_e_ordena():
+    assert percentil([], 50) == 0.0
+    assert percentil([3.0, 1.0, 2.0], 50) == 2.0
+    assert percentil([0.0, 10.0], 95) == 9.5
+    assert percentil([1.0, 2.0], 100) == 2.0
+
+
+def test_fases_sobrepostas_nao_registram_memoria(tmp_path):
+    perfilador = Perfilador(tmp_path)
+    perfilador.iniciar()
+    try:
+        with perfilador.fase('sozinha'):
+            dados = [bytearray(1024) for _ in range(100)]
+
+        dentro, liberar = threading.Event(), threading.Event()
+
+        def _paralela():
+            with perfilador.fase('standby'):
+                dentro.set()
+                liberar.wait(5)
+
+        thread = threading.Thread(target=_paralela)
+        thread.start()
+        dentro.wait(5)
+        with perfilador.fase('exportar'):
+            liberar.set()
+        thread.join()
+    finally:
+        perfilador.finalizar()
+
+    memoria = {l['fase']: l for l in perfilador.resumo()}
+    assert memoria['sozinha']['pico_max'] >= 100 * 1024 and memoria['sozinha']['sobrepostas'] == 0
+    assert memoria['standby']['sobrepostas'] == memoria['exportar']['sobrepostas'] == 1
+    assert memoria['standby']['pico_max'] == memoria['exportar']['pico_max'] == 0
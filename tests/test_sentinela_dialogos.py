@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Sentinela: classificação estreita do download e poll sem bloqueio."""
+import sentinela_dialogos
+from sentinela_dialogos import Dialogo, SentinelaDialogos, classificar
+
+
+def test_download_so_no_dialogo_de_progresso():
+    assert classificar('Baixando histórico WIN$N') == 'download_historico'
+    assert classificar('MetaTrader 5', 'Downloading history for WINJ24') == 'download_historico'
+    assert classificar('Abrir', 'Downloads') == 'desconhecido'
+    assert classificar('Histórico de negociação') == 'desconhecido'
+    assert classificar('Salvar como', 'Downloads') == 'salvar_como'
+
+
+def _sentinela(monkeypatch, presentes):
+    sentinela = SentinelaDialogos(lambda: 1, timeout_download=10.0)
+    sentinela.dialogos = lambda: list(presentes)
+    fechados = []
+    monkeypatch.setattr(sentinela, '_fechar', lambda d: fechados.append(d.hwnd) or True)
+    monkeypatch.setattr(sentinela, '_aguardar_fechar', lambda d: 1 / 0)  # nunca bloquear no poll
+    return sentinela, fechados
+
+
+def test_poll_anota_download_e_reconfere_no_proximo_tick(monkeypatch):
+    download = Dialogo(7, 'Baixando histórico', '', 'download_historico')
+    presentes = [download]
+    sentinela, fechados = _sentinela(monkeypatch, presentes)
+    relogio = [1000.0]
+    monkeypatch.setattr(sentinela_dialogos.time, 'time', lambda: relogio[0])
+
+    assert sentinela.verificar(esperar=False) == [('download_historico', 'aguardar', True)]
+    relogio[0] += 5
+    assert sentinela.verificar(esperar=False) == []  # ainda baixando: sem repetir o aviso
+    relogio[0] += 6
+    assert sentinela.verificar(esperar=False) == [('download_historico', 'aguardar', False)]
+    assert sentinela.verificar(esperar=False) == []
+    assert fechados == []
+
+    presentes.clear()
+    sentinela.verificar(esperar=False)
+    assert sentinela._downloads == {}
+
+
+def test_desconhecido_so_fecha_sem_dialogo_esperado(monkeypatch):
+    save_as = Dialogo(9, 'Enregistrer sous', 'Nom du fichier', 'desconhecido')
+    sentinela, fechados = _sentinela(monkeypatch, [save_as])
+
+    assert sentinela.verificar(fechar_desconhecidos=False) == []
+    assert fechados == []
+    assert sentinela.verificar() == [('desconhecido', 'fechar', True)]
+    assert fechados == [9]
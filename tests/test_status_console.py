@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""Linha de status: mensagens permanentes acima do bloco e limite de quadros."""
+import contextlib
+import io
+
+from status_console import LIMPAR_LINHA, SUBIR_LINHAS, StatusConsole
+
+
+def test_escrever_apaga_o_bloco_e_redesenha_abaixo_da_mensagem():
+    saida = io.StringIO()
+    status = StatusConsole(fps=0, saida=saida, tty=True)
+    status.atualizar('OOS', '⏳ 10s')
+    inicio = saida.tell()
+
+    status.escrever('✅ Diálogo tratado')
+
+    escrito = saida.getvalue()[inicio:]
+    apagar = SUBIR_LINHAS.format(1) + LIMPAR_LINHA + '\n' + SUBIR_LINHAS.format(1)
+    assert escrito.startswith(apagar + '✅ Diálogo tratado\n')
+    assert escrito.endswith(f"{LIMPAR_LINHA}[OOS] ⏳ 10s\n")
+
+
+def test_sem_tty_linhas_simples_so_quando_o_texto_muda():
+    saida = io.StringIO()
+    status = StatusConsole(intervalo_linhas=0, saida=saida, tty=False)
+    for texto in ('a', 'a', 'b'):
+        status.atualizar('w', texto)
+    status.escrever('fim')
+    assert saida.getvalue() == '[w] a\n[w] b\nfim\n'
+
+
+def test_saida_padrao_segue_redirect_stdout():
+    status = StatusConsole(tty=False)
+    capturado = io.StringIO()
+    with contextlib.redirect_stdout(capturado):
+        status.escrever('silencioso')
+    assert capturado.getvalue() == 'silencioso\n'
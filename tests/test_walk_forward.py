@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Janelas walk-forward: alinhamento a pregões, sem deriva de calendário."""
+from datetime import date
+
+import pytest
+
+from walk_forward import Calendario, deslocar, gerar_janelas, ler_tamanho, somar_meses, texto_ranges
+
+SEM_FERIADOS = Calendario()
+
+
+def test_fim_de_mes_nao_deriva_entre_janelas():
+    janelas = gerar_janelas(date(2024, 1, 31), date(2024, 8, 31), '1M', '1M', calendario=SEM_FERIADOS)
+
+    assert janelas[0].is_de == date(2024, 1, 31)  # nunca antes do início do estudo
+    assert [j.oos_de for j in janelas] == [date(2024, 2, 29), date(2024, 4, 1), date(2024, 4, 30),
+                                           date(2024, 5, 31), date(2024, 7, 1), date(2024, 7, 31)]
+    # OOS contíguos: cada um começa no pregão seguinte ao fim do anterior
+    for anterior, atual in zip(janelas, janelas[1:]):
+        assert SEM_FERIADOS.avancar_pregoes(anterior.oos_ate, 1) == atual.oos_de
+        assert atual.is_de == anterior.oos_de
+
+
+def test_deslocar_soma_meses_antes_de_aplicar():
+    assert somar_meses(date(2024, 1, 31), 1) == date(2024, 2, 29)
+    assert deslocar(date(2024, 1, 31), [(1, 'M'), (1, 'M')], SEM_FERIADOS) == date(2024, 3, 31)
+    assert deslocar(date(2024, 1, 31), [(1, 'A'), (2, 'S')], SEM_FERIADOS) == date(2025, 2, 14)
+
+
+def test_janela_ancorada_e_limites_em_pregao():
+    cal = Calendario([date(2024, 4, 8)])
+    janelas = gerar_janelas(date(2024, 1, 6), date(2024, 12, 31), '3M', '3M', ancorada=True, calendario=cal)
+
+    assert {j.is_de for j in janelas} == {date(2024, 1, 8)}  # sábado -> segunda
+    assert janelas[0].oos_de == date(2024, 4, 9)  # 06/04 sábado, 08/04 feriado
+    assert janelas[0].is_ate == date(2024, 4, 5)
+    assert all(cal.eh_pregao(d) for j in janelas for d in (j.is_de, j.is_ate, j.oos_de, j.oos_ate))
+
+
+def test_ultima_janela_parcial_e_passo_em_pregoes():
+    completas = gerar_janelas(date(2024, 1, 2), date(2024, 3, 15), '20P', '10P', calendario=SEM_FERIADOS)
+    parciais = gerar_janelas(date(2024, 1, 2), date(2024, 3, 15), '20P', '10P', calendario=SEM_FERIADOS,
+                             parcial=True)
+
+    assert all(SEM_FERIADOS.avancar_pregoes(j.oos_de, 9) == j.oos_ate for j in completas)
+    assert len(parciais) == len(completas) + 1
+    assert parciais[-1].oos_ate == date(2024, 3, 15)
+    assert texto_ranges(completas[:1]) == '30/01/2024 - 12/02/2024\n'
+
+
+def test_calendario_avisa_anos_sem_feriados(capsys):
+    cal = Calendario.de_arquivo()
+    assert {2022, 2027} <= cal.anos
+    assert cal.anos_sem_feriados(date(2020, 1, 1), date(2023, 1, 1)) == [2020, 2021]
+    assert not cal.eh_pregao(date(2024, 2, 12))  # Carnaval
+    # Último dia útil do ano sem pregão, também quando 31/12 cai no fim de semana
+    assert not cal.eh_pregao(date(2022, 12, 30)) and not cal.eh_pregao(date(2023, 12, 29))
+    assert cal.avancar_pregoes(date(2022, 12, 29), 1) == date(2023, 1, 2)
+
+    gerar_janelas(date(2021, 1, 4), date(2022, 12, 30), '6M', '3M')
+    assert 'só fins de semana' in capsys.readouterr().out
+    gerar_janelas(date(2022, 1, 3), date(2022, 12, 30), '6M', '3M')
+    assert capsys.readouterr().out == ''
+
+
+@pytest.mark.parametrize('texto', ['0M', '12', 'M', '3X'])
+def test_tamanho_invalido(texto):
+    with pytest.raises(ValueError):
+        ler_tamanho(texto)
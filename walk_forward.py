@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""Gerador de janelas walk-forward (IS/OOS) alinhadas ao calendário da B3.
+
+Janelas definidas por início, fim, tamanho do IS, tamanho do OOS e passo:
+
+- móvel (rolling): o IS anda junto com o OOS;
+- ancorada (anchored): o IS sempre começa no início do estudo e só cresce.
+
+Tamanhos aceitam `D` (dias corridos), `S` (semanas), `M` (meses), `A` (anos)
+e `P` (pregões). Os limites caem sempre em dia de pregão: fins de semana e os
+feriados do arquivo local (`feriados_b3.txt`) são pulados; datas fora dos anos
+cobertos pelo arquivo geram aviso.
+
+As janelas viram ranges OOS para `OOSBatchRunner.run` e INIs de otimização
+do IS (`inis_otimizacao`, via `INIGenerator.build_many`):
+
+    python walk_forward.py --inicio 03/01/2022 --fim 30/12/2026 --is 12M --oos 3M
+    python walk_forward.py --inicio 03/01/2022 --fim 30/12/2026 --is 250P --oos 60P --ancorada \\
+        --saida ranges.txt --template exemplo.ini --set estrategia.set --inis ini_is
+"""
+from __future__ import annotations
+
+import argparse
+import calendar
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent
+FERIADOS_PADRAO = BASE_DIR / 'feriados_b3.txt'
+
+TAMANHO_REGEX = re.compile(r"^\s*(\d+)\s*([DSMAP])\s*$", re.IGNORECASE)
+DATA_REGEX = re.compile(r"(\d{2}/\d{2}/\d{4}|\d{4}-\d{2}-\d{2})")
+
+# Otimização do IS: algoritmo genético, critério do template
+TESTER_OTIMIZACAO = {'Optimization': '2'}
+
+
+def ler_data(texto: str) -> date:
+    """dd/mm/aaaa ou aaaa-mm-dd."""
+    texto = texto.strip()
+    formato = '%Y-%m-%d' if '-' in texto else '%d/%m/%Y'
+    return datetime.strptime(texto, formato).date()
+
+
+def para_br(data: date) -> str:
+    return data.strftime('%d/%m/%Y')
+
+
+def para_mt5(data: date) -> str:
+    return data.strftime('%Y.%m.%d 00:00:00')
+
+
+class Calendario:
+    """Dias de pregão: segunda a sexta, exceto os feriados informados."""
+
+    def __init__(self, feriados: Iterable[date] = ()):
+        self.feriados: Set[date] = set(feriados)
+        # Anos com feriados cadastrados: fora deles só fins de semana são excluídos
+        self.anos: Set[int] = {dia.year for dia in self.feriados}
+
+    @classmethod
+    def de_arquivo(cls, caminho: Path = None) -> 'Calendario':
+        """Feriados de um arquivo texto (uma data por linha; '#' e ';' são comentários).
+
+        Sem arquivo, só fins de semana são excluídos.
+        """
+        caminho = Path(caminho) if caminho else FERIADOS_PADRAO
+        feriados = []
+        if caminho.exists():
+            for linha in caminho.read_text(encoding='utf-8').splitlines():
+                linha = linha.strip()
+                if not linha or linha.startswith(('#', ';')):
+                    continue
+                m = DATA_REGEX.match(linha)
+                if m:
+                    feriados.append(ler_data(m.group(1)))
+        else:
+            print(f"⚠️ Arquivo de feriados não encontrado ({caminho}) - só fins de semana excluídos")
+        return cls(feriados)
+
+    def anos_sem_feriados(self, inicio: date, fim: date) -> List[int]:
+        """Anos do intervalo fora do calendário carregado (vazio se não há feriados cadastrados)."""
+        if not self.anos:
+            return []
+        return [ano for ano in range(inicio.year, fim.year + 1) if ano not in self.anos]
+
+    def eh_pregao(self, dia: date) -> bool:
+        return dia.weekday() < 5 and dia not in self.feriados
+
+    def proximo_pregao(self, dia: date) -> date:
+        """O próprio dia, se for pregão; senão o seguinte."""
+        while not self.eh_pregao(dia):
+            dia += timedelta(days=1)
+        return dia
+
+    def pregao_anterior(self, dia: date) -> date:
+        """O próprio dia, se for pregão; senão o anterior."""
+        while not self.eh_pregao(dia):
+            dia -= timedelta(days=1)
+        return dia
+
+    def avancar_pregoes(self, dia: date, n: int) -> date:
+        """n pregões depois de `dia` (antes, se n < 0), alinhado ao pregão seguinte antes de contar."""
+        dia = self.proximo_pregao(dia)
+        for _ in range(abs(n)):
+            if n > 0:
+                dia = self.proximo_pregao(dia + timedelta(days=1))
+            else:
+                dia = self.pregao_anterior(dia - timedelta(days=1))
+        return dia
+
+
+def ler_tamanho(texto: str) -> Tuple[int, str]:
+    """'12M' -> (12, 'M'). Unidades: D dias, S semanas, M meses, A anos, P pregões."""
+    m = TAMANHO_REGEX.match(texto)
+    if not m or int(m.group(1)) <= 0:
+        raise ValueError(f"Tamanho inválido: {texto!r} (ex.: 12M, 90D, 4S, 1A, 60P)")
+    return int(m.group(1)), m.group(2).upper()
+
+
+def somar_meses(dia: date, meses: int) -> date:
+    """Soma meses limitando ao último dia do mês (31/01 + 1M = 28/02)."""
+    total = dia.year * 12 + dia.month - 1 + meses
+    ano, mes = divmod(total, 12)
+    return date(ano, mes + 1, min(dia.day, calendar.monthrange(ano, mes + 1)[1]))
+
+
+def _canonico(tamanho: Tuple[int, str]) -> Tuple[int, str]:
+    """Anos em meses e semanas em dias, para somar quantidades da mesma natureza."""
+    n, unidade = tamanho
+    if unidade == 'A':
+        return n * 12, 'M'
+    if unidade == 'S':
+        return n * 7, 'D'
+    return n, unidade
+
+
+def deslocar(dia: date, tamanhos: Iterable[Tuple[int, str]], cal: Calendario) -> date:
+    """`dia` + soma dos tamanhos, somando as quantidades de cada unidade antes de aplicar.
+
+    31/01 + 1M + 1M = 31/03 (encadeando daria 29/03: o corte de fevereiro se propagaria).
+    Unidades diferentes são aplicadas na ordem meses, dias, pregões.
+    """
+    totais: Dict[str, int] = {}
+    for tamanho in tamanhos:
+        n, unidade = _canonico(tamanho)
+        totais[unidade] = totais.get(unidade, 0) + n
+    for unidade in ('M', 'D', 'P'):
+        if totais.get(unidade):
+            dia = avancar(dia, (totais[unidade], unidade), cal)
+    return dia
+
+
+def avancar(dia: date, tamanho: Tuple[int, str], cal: Calendario) -> date:
+    """Início do período seguinte (fim exclusivo) de um período de `tamanho` começando em `dia`.
+
+    Com quantidade negativa, o início de um período que termina em `dia`.
+    """
+    n, unidade = tamanho
+    if unidade == 'P':
+        return cal.avancar_pregoes(dia, n)
+    if unidade == 'D':
+        return dia + timedelta(days=n)
+    if unidade == 'S':
+        return dia + timedelta(weeks=n)
+    return somar_meses(dia, n * 12 if unidade == 'A' else n)
+
+
+@dataclass
+class Janela:
+    indice: int
+    is_de: date
+    is_ate: date
+    oos_de: date
+    oos_ate: date
+
+    @property
+    def oos_br(self) -> Tuple[str, str]:
+        """Range OOS no formato de `OOSBatchRunner.run`."""
+        return para_br(self.oos_de), para_br(self.oos_ate)
+
+    @property
+    def is_br(self) -> Tuple[str, str]:
+        return para_br(self.is_de), para_br(self.is_ate)
+
+
+def gerar_janelas(inicio: date, fim: date, tamanho_is: str, tamanho_oos: str, passo: str = None,
+                  ancorada: bool = False, calendario: Calendario = None, parcial: bool = False) -> List[Janela]:
+    """Janelas IS/OOS entre `inicio` e `fim` (inclusive).
+
+    O passo padrão é o tamanho do OOS (OOS contíguos, sem sobreposição). A última janela
+    só entra se o OOS couber inteiro antes de `fim`, a menos que `parcial=True` (aí o OOS
+    é cortado em `fim`). Sem `calendario`, usa os feriados de `feriados_b3.txt`.
+    """
+    cal = calendario or Calendario.de_arquivo()
+    t_is, t_oos = ler_tamanho(tamanho_is), ler_tamanho(tamanho_oos)
+    t_passo = ler_tamanho(passo) if passo else t_oos
+    if fim <= inicio:
+        raise ValueError("Fim deve ser posterior ao início")
+    fora = cal.anos_sem_feriados(inicio, fim)
+    if fora:
+        print(f"⚠️ Feriados da B3 cadastrados só para {min(cal.anos)}-{max(cal.anos)}: "
+              f"em {', '.join(map(str, fora))} só fins de semana são excluídos (atualize feriados_b3.txt)")
+
+    janelas: List[Janela] = []
+    base_is = cal.proximo_pregao(inicio)
+    ultimo_pregao = cal.pregao_anterior(fim)
+    k = 0
+    while True:
+        # Janela k medida a partir de `inicio` (k*passo, k*passo + IS, k*passo + IS + OOS), sem
+        # encadear datas já cortadas/alinhadas: meses curtos e pregões pulados não acumulam deriva
+        passos = (k * t_passo[0], t_passo[1])
+        oos_de = cal.proximo_pregao(deslocar(inicio, (passos, t_is), cal))
+        if oos_de > ultimo_pregao:
+            break
+        oos_ate = cal.pregao_anterior(deslocar(inicio, (passos, t_is, t_oos), cal) - timedelta(days=1))
+        if oos_ate > ultimo_pregao:
+            if not parcial:
+                break
+            oos_ate = ultimo_pregao
+        is_de = base_is if ancorada else max(cal.proximo_pregao(deslocar(inicio, (passos,), cal)), base_is)
+        is_ate = cal.pregao_anterior(oos_de - timedelta(days=1))
+        if is_de <= is_ate and oos_de <= oos_ate:
+            janelas.append(Janela(len(janelas) + 1, is_de, is_ate, oos_de, oos_ate))
+        k += 1
+    return janelas
+
+
+def ranges_oos(janelas: Iterable[Janela]) -> List[Tuple[str, str]]:
+    """Ranges OOS (dd/mm/aaaa) para `OOSBatchRunner.run`."""
+    return [j.oos_br for j in janelas]
+
+
+def texto_ranges(janelas: Iterable[Janela]) -> str:
+    """Um range por linha, no formato aceito por `parse_oos_from_text`."""
+    return ''.join(f"{de} - {ate}\n" for de, ate in ranges_oos(janelas))
+
+
+def inis_otimizacao(janelas: Iterable[Janela], gerador, pasta: Path, set_file: Path = None,
+                    tester: Dict[str, str] = None) -> List[Path]:
+    """INIs de otimização do IS de cada janela (IS_<n>_<de>_<ate>.ini) via `build_many`.
+
+    `gerador` é um `INIGenerator` do template; `tester` sobrescreve chaves do [Tester]
+    além de `TESTER_OTIMIZACAO`.
+    """
+    from backtest_core import JobINI
+
+    pasta = Path(pasta)
+    jobs = []
+    for j in janelas:
+        de, ate = j.is_de.strftime('%d%m%Y'), j.is_ate.strftime('%d%m%Y')
+        nome = f"IS_{j.indice:03d}_{de}_{ate}"
+        relatorio = gerador.reports_dir / f"{nome}.xml"
+        valores = {**TESTER_OTIMIZACAO, 'Report': str(relatorio).replace('\\', '/'), 'ReplaceReport': '1',
+                   **(tester or {})}
+        jobs.append(JobINI(para_mt5(j.is_de), para_mt5(j.is_ate), de, ate, set_file, valores,
+                           destino=pasta / f"{nome}.ini"))
+    return gerador.build_many(jobs, pasta)
+
+
+def imprimir_janelas(janelas: List[Janela]):
+    print(f"{'#':>4}  {'IS de':<11}{'IS até':<11}  {'OOS de':<11}{'OOS até':<11}")
+    for j in janelas:
+        print(f"{j.indice:>4}  {para_br(j.is_de):<11}{para_br(j.is_ate):<11}  "
+              f"{para_br(j.oos_de):<11}{para_br(j.oos_ate):<11}")
+
+
+def prompt_walk_forward(feriados: Path = None) -> List[Janela]:
+    """Prompt interativo (menu OOS): devolve as janelas geradas."""
+    try:
+        inicio = ler_data(input("Início do estudo (dd/mm/aaaa): "))
+        fim = ler_data(input("Fim do estudo (dd/mm/aaaa): "))
+        tamanho_is = input("Tamanho do IS (ex.: 12M, 250P): ").strip() or '12M'
+        tamanho_oos = input("Tamanho do OOS (ex.: 3M, 60P): ").strip() or '3M'
+        passo = input("Passo (ENTER = tamanho do OOS): ").strip() or None
+        ancorada = input("Janela ancorada? (s/N): ").strip().lower() == 's'
+        janelas = gerar_janelas(inicio, fim, tamanho_is, tamanho_oos, passo, ancorada,
+                                Calendario.de_arquivo(feriados))
+    except ValueError as e:
+        print(f"❌ {e}")
+        return []
+    print(f"\n📆 {len(janelas)} janela(s) {'ancorada(s)' if ancorada else 'móvel(is)'}:")
+    imprimir_janelas(janelas)
+    return janelas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera janelas walk-forward (IS/OOS) em dias de pregão")
+    parser.add_argument('--inicio', required=True, help="dd/mm/aaaa")
+    parser.add_argument('--fim', required=True, help="dd/mm/aaaa")
+    parser.add_argument('--is', dest='tamanho_is', required=True, help="tamanho do IS (ex.: 12M, 250P)")
+    parser.add_argument('--oos', dest='tamanho_oos', required=True, help="tamanho do OOS (ex.: 3M, 60P)")
+    parser.add_argument('--passo', help="avanço entre janelas (padrão: tamanho do OOS)")
+    parser.add_argument('--ancorada', action='store_true', help="IS sempre a partir do início")
+    parser.add_argument('--parcial', action='store_true', help="inclui a última janela com OOS cortado no fim")
+    parser.add_argument('--feriados', type=Path, default=FERIADOS_PADRAO)
+    parser.add_argument('--saida', type=Path, help="grava os ranges OOS (um por linha)")
+    parser.add_argument('--template', type=Path, help="template INI para os INIs de otimização do IS")
+    parser.add_argument('--set', dest='set_file', type=Path, help=".set das otimizações do IS")
+    parser.add_argument('--inis', type=Path, help="pasta dos INIs de otimização do IS (requer --template)")
+    args = parser.parse_args()
+
+    janelas = gerar_janelas(ler_data(args.inicio), ler_data(args.fim), args.tamanho_is, args.tamanho_oos,
+                            args.passo, args.ancorada, Calendario.de_arquivo(args.feriados), args.parcial)
+    imprimir_janelas(janelas)
+    print(f"\n📆 {len(janelas)} janela(s)")
+    if args.saida:
+        args.saida.write_text(texto_ranges(janelas), encoding='utf-8')
+        print(f"💾 Ranges OOS: {args.saida}")
+    if args.inis:
+        if not args.template:
+            parser.error("--inis requer --template")
+        from backtest_core import INIGenerator
+        gerador = INIGenerator(args.template, args.inis / 'reports')
+        caminhos = inis_otimizacao(janelas, gerador, args.inis, args.set_file)
+        print(f"🔧 {len(caminhos)} INIs de otimização do IS em {args.inis}")
+
+
+if __name__ == "__main__":
+    main()